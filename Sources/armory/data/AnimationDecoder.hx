@@ -0,0 +1,81 @@
+package armory.data;
+
+#if arm_anim_compact
+
+import kha.arrays.Float32Array;
+import kha.arrays.Int16Array;
+
+// Expands bone tracks exported as quantized translation, rotation and scale
+// streams (arm.lib.anim_compress) back to per-key transform matrices
+class AnimationDecoder {
+
+	// Decodes all tracks of a loaded action in place, decoded tracks are skipped
+	public static function decodeAction(raw: Dynamic) {
+		var objects: Array<Dynamic> = raw.objects;
+		if (objects == null) return;
+		for (o in objects) decodeObject(o);
+	}
+
+	static function decodeObject(o: Dynamic) {
+		if (o.anim != null) {
+			var tracks: Array<Dynamic> = o.anim.tracks;
+			for (track in tracks) if (track.encoding == "trs16") decodeTrack(track);
+		}
+		var children: Array<Dynamic> = o.children;
+		if (children != null) for (c in children) decodeObject(c);
+	}
+
+	public static function decodeTrack(track: Dynamic) {
+		var loc: Int16Array = track.translation;
+		var locCenter: Float32Array = track.translation_center;
+		var locExtent: Float32Array = track.translation_extent;
+		var rot: Int16Array = track.rotation;
+		var scl: Int16Array = track.scale;
+		var sclCenter: Float32Array = track.scale_center;
+		var sclExtent: Float32Array = track.scale_extent;
+
+		var n = Std.int(rot.length / 4);
+		var values = new Float32Array(n * 16);
+		for (i in 0...n) {
+			var tx = locCenter[0] + loc[i * 3] / 32767 * locExtent[0];
+			var ty = locCenter[1] + loc[i * 3 + 1] / 32767 * locExtent[1];
+			var tz = locCenter[2] + loc[i * 3 + 2] / 32767 * locExtent[2];
+			var sx = sclCenter[0] + scl[i * 3] / 32767 * sclExtent[0];
+			var sy = sclCenter[1] + scl[i * 3 + 1] / 32767 * sclExtent[1];
+			var sz = sclCenter[2] + scl[i * 3 + 2] / 32767 * sclExtent[2];
+			var x: Float = rot[i * 4];
+			var y: Float = rot[i * 4 + 1];
+			var z: Float = rot[i * 4 + 2];
+			var w: Float = rot[i * 4 + 3];
+			var l = Math.sqrt(x * x + y * y + z * z + w * w);
+			if (l > 0) { x /= l; y /= l; z /= l; w /= l; }
+
+			// Row-major translation * rotation * scale
+			var o = i * 16;
+			values[o] = (1 - 2 * (y * y + z * z)) * sx;
+			values[o + 1] = 2 * (x * y - w * z) * sy;
+			values[o + 2] = 2 * (x * z + w * y) * sz;
+			values[o + 3] = tx;
+			values[o + 4] = 2 * (x * y + w * z) * sx;
+			values[o + 5] = (1 - 2 * (x * x + z * z)) * sy;
+			values[o + 6] = 2 * (y * z - w * x) * sz;
+			values[o + 7] = ty;
+			values[o + 8] = 2 * (x * z - w * y) * sx;
+			values[o + 9] = 2 * (y * z + w * x) * sy;
+			values[o + 10] = (1 - 2 * (x * x + y * y)) * sz;
+			values[o + 11] = tz;
+			values[o + 12] = 0;
+			values[o + 13] = 0;
+			values[o + 14] = 0;
+			values[o + 15] = 1;
+		}
+
+		track.values = values;
+		track.encoding = null;
+		track.translation = null;
+		track.rotation = null;
+		track.scale = null;
+	}
+}
+
+#end
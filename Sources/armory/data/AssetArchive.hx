@@ -0,0 +1,109 @@
+package armory.data;
+
+#if arm_asset_archive
+
+import haxe.Constraints.IMap;
+import haxe.ds.StringMap;
+import haxe.io.Bytes;
+import iron.data.Data;
+import iron.system.ArmPack;
+
+// Loader of the asset archive of published builds (arm.lib.asset_archive).
+// Only the archive index is read on load, archived files are resolved by name
+// when iron.data.Data looks them up in its blob cache, so loading them by name
+// does not fetch files
+class AssetArchive {
+
+	public static inline var file = "assets.arp";
+
+	static var bytes: Bytes = null;
+	static var base = 0;
+	static var files: Dynamic = null;
+	static var payloads: Array<Dynamic> = null;
+
+	// Loads the archive index and resolves archived files through Data.cachedBlobs
+	public static function load(done: Void->Void) {
+		Data.getBlob(file, function(blob: kha.Blob) {
+			bytes = blob.toBytes();
+			if (bytes.getString(0, 4) != "ARMA") throw "Not an asset archive";
+			var indexSize = bytes.getInt32(8);
+			var index: Dynamic = ArmPack.decode(bytes.sub(16, indexSize));
+			base = 16 + indexSize + ((16 - indexSize % 16) % 16);
+			files = index.files;
+			payloads = index.payloads;
+			Data.cachedBlobs.remove(file);
+			Data.cachedBlobs = cast new ArchiveBlobs(Data.cachedBlobs);
+			done();
+		});
+	}
+
+	public static inline function exists(name: String): Bool {
+		return files != null && Reflect.hasField(files, name);
+	}
+
+	// Contents of the archived file, files with equal contents share a payload
+	public static function get(name: String): Bytes {
+		if (!exists(name)) return null;
+		var payload = payloads[Reflect.field(files, name)];
+		return bytes.sub(base + payload[0], payload[1]);
+	}
+}
+
+// Blob cache that creates the blob of an archived file on its first lookup
+class ArchiveBlobs implements IMap<String, kha.Blob> {
+
+	var blobs = new StringMap<kha.Blob>();
+
+	public function new(cached: Map<String, kha.Blob>) {
+		for (key in cached.keys()) blobs.set(key, cached.get(key));
+	}
+
+	public function get(key: String): Null<kha.Blob> {
+		var blob = blobs.get(key);
+		if (blob == null && AssetArchive.exists(key)) {
+			blob = kha.Blob.fromBytes(AssetArchive.get(key));
+			blobs.set(key, blob);
+		}
+		return blob;
+	}
+
+	public function set(key: String, value: kha.Blob) {
+		blobs.set(key, value);
+	}
+
+	public function exists(key: String): Bool {
+		return blobs.exists(key) || AssetArchive.exists(key);
+	}
+
+	public function remove(key: String): Bool {
+		return blobs.remove(key);
+	}
+
+	public function keys(): Iterator<String> {
+		return blobs.keys();
+	}
+
+	public function iterator(): Iterator<kha.Blob> {
+		return blobs.iterator();
+	}
+
+	public function keyValueIterator(): KeyValueIterator<String, kha.Blob> {
+		return blobs.keyValueIterator();
+	}
+
+	public function copy(): IMap<String, kha.Blob> {
+		var map = new ArchiveBlobs(new Map());
+		for (key in blobs.keys()) map.set(key, blobs.get(key));
+		return map;
+	}
+
+	public function toString(): String {
+		return blobs.toString();
+	}
+
+	public function clear() {
+		blobs.clear();
+	}
+}
+
+#end
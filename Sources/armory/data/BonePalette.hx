@@ -0,0 +1,60 @@
+package armory.data;
+
+#if arm_skin_palettes
+
+import kha.arrays.Float32Array;
+import kha.arrays.Int16Array;
+import iron.object.BoneAnimation;
+import iron.object.MeshObject;
+import iron.object.Object;
+
+// Skinned meshes of armatures with more bones than skinMaxBones are exported
+// as index arrays with their own bone_palette and material slot
+// (arm.lib.skinning), vertex bone indices of such an index array point into
+// its palette
+class BonePalette {
+
+	// Bones of the skinning uniform of shaders, BoneAnimation.skinMaxBones holds
+	// the bones of the largest armature
+	public static var paletteBones = 0;
+	static var paletteBuffer: Float32Array = null;
+
+	// Skinning data of the index array drawn with the current material slot of
+	// object, meshes that were not split get their first paletteBones bones
+	public static function getPalette(object: Object): Float32Array {
+		var mesh = Std.downcast(object, MeshObject);
+		if (mesh == null || mesh.animation == null) return null;
+		var skinBuffer = cast(mesh.animation, BoneAnimation).skinBuffer;
+		if (skinBuffer == null) return null;
+		if (paletteBuffer == null) paletteBuffer = new Float32Array(paletteBones * 8);
+
+		var arrays: Array<Dynamic> = mesh.data.raw.index_arrays;
+		for (ia in arrays) {
+			if (ia.material == mesh.materialIndex && ia.bone_palette != null) {
+				gather(skinBuffer, ia.bone_palette, paletteBuffer);
+				return paletteBuffer;
+			}
+		}
+		var count = paletteBuffer.length < skinBuffer.length ? paletteBuffer.length : skinBuffer.length;
+		for (i in 0...count) paletteBuffer[i] = skinBuffer[i];
+		return paletteBuffer;
+	}
+
+	// Copies the skinning data of the palette bones from the buffer of all bones
+	// of the armature to the per draw buffer, floatsPerBone matches the layout
+	// of BoneAnimation.skinBuffer
+	public static function gather(skinBuffer: Float32Array, palette: Int16Array, out: Float32Array, floatsPerBone = 8) {
+		for (i in 0...palette.length) {
+			var src = palette[i] * floatsPerBone;
+			var dst = i * floatsPerBone;
+			for (j in 0...floatsPerBone) out[dst + j] = skinBuffer[src + j];
+		}
+	}
+
+	public static inline function hasPalettes(mesh: Dynamic): Bool {
+		var arrays: Array<Dynamic> = mesh.index_arrays;
+		return arrays.length > 0 && arrays[0].bone_palette != null;
+	}
+}
+
+#end
@@ -0,0 +1,165 @@
+package armory.data;
+
+#if arm_indexed_data
+
+import haxe.io.Bytes;
+import kha.arrays.Float32Array;
+import kha.arrays.Int16Array;
+import kha.arrays.Int32Array;
+import kha.arrays.Int8Array;
+import kha.arrays.Uint16Array;
+import kha.arrays.Uint8Array;
+import iron.data.Data;
+import iron.system.ArmPack;
+
+// Reader of scene files written as indexed containers (arm.lib.armindex). Only
+// the scene block is decoded on load, datablocks are decoded when required and
+// appended to their section of the scene raw, where iron.data.Data finds them
+class IndexedData {
+
+	public static var active: IndexedData = null;
+
+	public var raw: Dynamic;
+	var bytes: Bytes;
+	var base: Int;
+	var blocks = new Map<String, Array<Int>>();
+	var arrays: Array<Dynamic>;
+
+	function new(bytes: Bytes) {
+		this.bytes = bytes;
+		if (bytes.getString(0, 4) != "ARMI") throw "Not an indexed data file";
+		var tocSize = bytes.getInt32(8);
+		var toc: Dynamic = ArmPack.decode(bytes.sub(16, tocSize));
+		base = 16 + tocSize + ((16 - tocSize % 16) % 16);
+		arrays = toc.arrays;
+		var entries: Array<Dynamic> = toc.blocks;
+		for (e in entries) blocks.set(e[0] + "/" + e[1], [e[2], e[3]]);
+		raw = decodeBlock("scene", "");
+	}
+
+	// Loads the scene container, decodes the datablocks referenced by the scene
+	// and caches the scene raw for iron.Scene.setActive(). iron looks datablocks
+	// up in the scene raw without a hook for misses, so the datablocks of objects
+	// that are not spawned on load (particle instances, collection instances,
+	// Scene.spawnObject()) are decoded as well, unreferenced ones are skipped
+	public static function load(file: String, done: IndexedData->Void) {
+		var ext = StringTools.endsWith(file, ".arm") ? "" : ".arm";
+		Data.getBlob(file + ext, function(blob: kha.Blob) {
+			active = new IndexedData(blob.toBytes());
+			active.requireScene();
+			Data.cachedSceneRaws.set(file, active.raw);
+			done(active);
+		});
+	}
+
+	public inline function has(type: String, name: String): Bool {
+		return blocks.exists(type + "/" + name);
+	}
+
+	// Decodes the named datablock into the scene raw once and returns it
+	public function require(type: String, name: String): Dynamic {
+		var section: Array<Dynamic> = Reflect.field(raw, type);
+		if (section == null) return null;
+		for (block in section) if (block.name == name) return block;
+		if (!has(type, name)) return null;
+		var block = decodeBlock(type, name);
+		if (type == "mesh_datas") MeshDecoder.decodeMesh(block);
+		section.push(block);
+
+		if (type == "material_datas") {
+			require("shader_datas", block.shader);
+		}
+		else if (type == "mesh_datas" && block.skin != null && block.skin.skeleton_ref != null) {
+			var skeleton = require("skeleton_datas", block.skin.skeleton_ref);
+			#if arm_skin
+			if (skeleton != null) SkeletonData.resolveSkin(block.skin, skeleton);
+			#end
+		}
+		return block;
+	}
+
+	// Decodes the datablocks referenced by the objects and terrains of the scene
+	public function requireScene() {
+		var objects: Array<Dynamic> = raw.objects;
+		if (objects != null) requireObjects(objects);
+		var terrains: Array<Dynamic> = raw.terrain_datas;
+		if (terrains != null) {
+			for (terrain in terrains) {
+				if (terrain.material_ref != null) require("material_datas", terrain.material_ref);
+			}
+		}
+	}
+
+	// Decodes the data of the given objects and of their children
+	public function requireObjects(objects: Array<Dynamic>) {
+		for (o in objects) {
+			if (o.type == "mesh_object") require("mesh_datas", o.data_ref);
+			var refs: Array<String> = o.material_refs;
+			if (refs != null) for (ref in refs) require("material_datas", ref);
+			if (o.children != null) requireObjects(o.children);
+		}
+	}
+
+	function decodeBlock(type: String, name: String): Dynamic {
+		var entry = blocks.get(type + "/" + name);
+		return resolveArrays(ArmPack.decode(bytes.sub(base + entry[0], entry[1])));
+	}
+
+	// Replaces {_array: index} references with the typed arrays they point to
+	function resolveArrays(o: Dynamic): Dynamic {
+		if (Std.isOfType(o, Array)) {
+			var a: Array<Dynamic> = o;
+			for (i in 0...a.length) a[i] = resolveArrays(a[i]);
+		}
+		else if (Type.typeof(o) == TObject) {
+			if (Reflect.hasField(o, "_array")) return readArray(arrays[o._array]);
+			for (field in Reflect.fields(o)) Reflect.setField(o, field, resolveArrays(Reflect.field(o, field)));
+		}
+		return o;
+	}
+
+	function readArray(entry: Array<Dynamic>): Dynamic {
+		var pos: Int = base + entry[1];
+		var count: Int = entry[2];
+		switch (entry[0]) {
+			case "f32": {
+				var a = new Float32Array(count);
+				for (i in 0...count) a[i] = bytes.getFloat(pos + i * 4);
+				return a;
+			}
+			case "i32": {
+				var a = new Int32Array(count);
+				for (i in 0...count) a[i] = bytes.getInt32(pos + i * 4);
+				return a;
+			}
+			case "i16": {
+				var a = new Int16Array(count);
+				for (i in 0...count) {
+					var v = bytes.getUInt16(pos + i * 2);
+					a[i] = v > 32767 ? v - 65536 : v;
+				}
+				return a;
+			}
+			case "u16": {
+				var a = new Uint16Array(count);
+				for (i in 0...count) a[i] = bytes.getUInt16(pos + i * 2);
+				return a;
+			}
+			case "i8": {
+				var a = new Int8Array(count);
+				for (i in 0...count) {
+					var v = bytes.get(pos + i);
+					a[i] = v > 127 ? v - 256 : v;
+				}
+				return a;
+			}
+			default: {
+				var a = new Uint8Array(count);
+				for (i in 0...count) a[i] = bytes.get(pos + i);
+				return a;
+			}
+		}
+	}
+}
+
+#end
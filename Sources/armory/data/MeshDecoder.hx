@@ -0,0 +1,76 @@
+package armory.data;
+
+import haxe.io.Bytes;
+import kha.arrays.Int16Array;
+import kha.arrays.Uint32Array;
+
+// Expands index arrays exported as 16-bit values or as varint encoded zigzag
+// deltas (arm.lib.index_codec) back to the 32-bit index arrays iron reads,
+// called by armory.data.SceneLoader for every loaded file
+class MeshDecoder {
+
+	// Decodes all index arrays of loaded mesh data in place, decoded arrays are skipped
+	public static function decodeMeshes(raw: Dynamic) {
+		var meshes: Array<Dynamic> = raw.mesh_datas;
+		if (meshes == null) return;
+		for (mesh in meshes) decodeMesh(mesh);
+	}
+
+	public static function decodeMesh(mesh: Dynamic) {
+		var arrays: Array<Dynamic> = mesh.index_arrays;
+		for (ia in arrays) decodeIndexArray(ia);
+		var lods: Array<Dynamic> = mesh.lods;
+		if (lods != null) {
+			for (lod in lods) {
+				var lodArrays: Array<Dynamic> = lod.index_arrays;
+				for (ia in lodArrays) decodeIndexArray(ia);
+			}
+		}
+	}
+
+	public static function decodeIndexArray(ia: Dynamic) {
+		#if arm_index_compact
+		if (ia.encoding == "varint") {
+			decodeVarint(ia);
+			return;
+		}
+		#end
+		#if arm_index_narrow
+		if (ia.data == "ushort") {
+			var values: Int16Array = ia.values;
+			var out = new Uint32Array(values.length);
+			for (i in 0...values.length) out[i] = values[i] & 0xffff;
+			ia.values = out;
+			ia.data = null;
+		}
+		#end
+	}
+
+	#if arm_index_compact
+	static function decodeVarint(ia: Dynamic) {
+		var bytes: Bytes = ia.values;
+		var count: Int = ia.count;
+		var values = new Uint32Array(count);
+
+		var pos = 0;
+		var index = 0;
+		for (i in 0...count) {
+			var z = 0;
+			var shift = 0;
+			var b = 0;
+			do {
+				b = bytes.get(pos++);
+				z |= (b & 0x7f) << shift;
+				shift += 7;
+			} while (b & 0x80 != 0);
+			index += (z >>> 1) ^ -(z & 1);
+			values[i] = index;
+		}
+
+		ia.values = values;
+		ia.encoding = null;
+		ia.count = null;
+		ia.data = null;
+	}
+	#end
+}
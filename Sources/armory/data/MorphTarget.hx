@@ -0,0 +1,117 @@
+package armory.data;
+
+#if arm_morph_target
+
+import haxe.io.Bytes;
+import kha.arrays.Float32Array;
+import kha.graphics4.TextureFormat;
+import iron.App;
+import iron.Scene;
+import iron.object.MeshObject;
+import iron.object.Object;
+
+// GPU morph targets exported from shape keys (arm.lib.morph). The sparse deltas
+// of a mesh are uploaded once as an RGBA float texture, key weights are kept
+// per object and played back from the exported weight tracks
+class MorphTarget {
+
+	public static inline var maxKeys = 32;
+
+	static var textures = new Map<String, kha.Image>();
+	static var targets = new Map<Object, MorphTarget>();
+	static var empty: kha.Image = null;
+	static var emptyWeights: Float32Array = null;
+
+	public var names: Array<String>;
+	public var weights: Float32Array;
+	public var texture: kha.Image;
+	public var paused = false;
+	var tracks: Array<Dynamic> = null;
+	var frame = 0.0;
+
+	function new(name: String, raw: Dynamic) {
+		names = raw.names;
+		weights = new Float32Array(maxKeys);
+		var defaults: Float32Array = raw.weights;
+		for (i in 0...defaults.length) weights[i] = defaults[i];
+
+		texture = textures.get(name);
+		if (texture == null) {
+			var deltas: Float32Array = raw.deltas;
+			var bytes = Bytes.alloc(deltas.length * 4);
+			for (i in 0...deltas.length) bytes.setFloat(i * 4, deltas[i]);
+			texture = kha.Image.fromBytes(bytes, raw.width, raw.height, TextureFormat.RGBA128);
+			textures.set(name, texture);
+		}
+
+		if (raw.action != null) tracks = raw.action.tracks;
+	}
+
+	// Morph target of a mesh object, null when its mesh has no shape keys
+	public static function get(object: Object): MorphTarget {
+		var target = targets.get(object);
+		if (target != null || !Std.isOfType(object, MeshObject)) return target;
+		var mesh = cast(object, MeshObject);
+		var raw: Dynamic = mesh.data.raw;
+		if (raw.morph_target == null) return null;
+
+		target = new MorphTarget(mesh.data.name, raw.morph_target);
+		targets.set(object, target);
+		if (target.tracks != null) {
+			App.notifyOnUpdate(target.update);
+			object.notifyOnRemove(function() {
+				App.removeUpdate(target.update);
+				targets.remove(object);
+			});
+		}
+		return target;
+	}
+
+	public function setWeight(name: String, value: Float) {
+		var i = names.indexOf(name);
+		if (i >= 0) weights[i] = value;
+	}
+
+	public function setFrame(f: Float) {
+		frame = f;
+		for (track in tracks) {
+			var i = names.indexOf(track.target);
+			if (i < 0) continue;
+			var frames: kha.arrays.Int32Array = track.frames;
+			var values: Float32Array = track.values;
+			var last = frames.length - 1;
+			var t = frames[0] + (frame % (frames[last] - frames[0] + 1));
+			var k = 0;
+			while (k < last && frames[k + 1] <= t) k++;
+			if (k == last) {
+				weights[i] = values[last];
+			}
+			else {
+				var s = (t - frames[k]) / (frames[k + 1] - frames[k]);
+				weights[i] = values[k] * (1.0 - s) + values[k + 1] * s;
+			}
+		}
+	}
+
+	function update() {
+		if (paused || tracks == null || tracks.length == 0) return;
+		setFrame(frame + iron.system.Time.delta / Scene.active.raw.frame_time);
+	}
+
+	// Bound to meshes without deltas that share a material with morphed meshes
+	public static function getTexture(object: Object): kha.Image {
+		var target = get(object);
+		if (target != null) return target.texture;
+		if (empty == null) empty = kha.Image.create(2, 1, TextureFormat.RGBA128);
+		return empty;
+	}
+
+	public static function getWeights(object: Object): Float32Array {
+		var target = get(object);
+		if (target != null) return target.weights;
+		if (emptyWeights == null) emptyWeights = new Float32Array(maxKeys);
+		return emptyWeights;
+	}
+}
+
+#end
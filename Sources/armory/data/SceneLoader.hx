@@ -0,0 +1,165 @@
+package armory.data;
+
+import haxe.Constraints.IMap;
+import haxe.ds.StringMap;
+import iron.data.Data;
+
+// Prepares exported data that iron does not read as is. Every file iron loads
+// is processed in place when it enters the scene raw cache of iron.data.Data,
+// so meshes loaded through Scene.setActive(), Scene.addScene() or
+// Data.getMesh() are ready before iron creates them. load() additionally
+// fetches the data files referenced by the objects of a scene up front
+class SceneLoader {
+
+	static var registered = false;
+
+	// Processes the files loaded from now on, called once on startup
+	public static function register() {
+		if (registered) return;
+		registered = true;
+		Data.cachedSceneRaws = cast new SceneRaws(Data.cachedSceneRaws);
+	}
+
+	// Prepares the scene, iron.Scene.setActive() can follow in done
+	public static function load(scene: String, done: Void->Void) {
+		#if arm_indexed_data
+		if (!Data.cachedSceneRaws.exists(scene)) {
+			IndexedData.load(scene, function(data: IndexedData) {
+				prepare(scene, done);
+			});
+			return;
+		}
+		#end
+		prepare(scene, done);
+	}
+
+	static function prepare(scene: String, done: Void->Void) {
+		Data.getSceneRaw(scene, function(raw: Dynamic) {
+			var raws: Array<Dynamic> = [raw];
+			var files = getFiles(scene, raw);
+			var pending = files.length + 1;
+			function loaded() {
+				if (--pending > 0) return;
+				#if arm_skin
+				resolveSkeletons(raws, done);
+				#else
+				done();
+				#end
+			}
+			for (file in files) {
+				Data.getSceneRaw(file, function(fileRaw: Dynamic) {
+					raws.push(fileRaw);
+					loaded();
+				});
+			}
+			loaded();
+		});
+	}
+
+	// Data files referenced by the objects of the scene, including objects
+	// that are not spawned on load
+	static function getFiles(scene: String, raw: Dynamic): Array<String> {
+		var files: Array<String> = [];
+		function add(file: String) {
+			if (file != scene && files.indexOf(file) == -1) files.push(file);
+		}
+		function traverse(objects: Array<Dynamic>) {
+			for (o in objects) {
+				var ref: String = o.data_ref;
+				if (ref != null && ref.indexOf("/") >= 0) add(ref.substr(0, ref.indexOf("/")));
+				var actions: Array<String> = o.bone_actions;
+				if (actions != null) for (action in actions) add(action);
+				if (o.children != null) traverse(o.children);
+			}
+		}
+		if (raw.objects != null) traverse(raw.objects);
+		return files;
+	}
+
+	#if arm_skin
+	// Loads the skeletons exported to their own file that are referenced by the
+	// skins of the loaded files and resolves the skins
+	static function resolveSkeletons(raws: Array<Dynamic>, done: Void->Void) {
+		var pending = 1;
+		function loaded() {
+			if (--pending == 0) done();
+		}
+		for (raw in raws) {
+			var meshes: Array<Dynamic> = raw.mesh_datas;
+			if (meshes == null) continue;
+			for (mesh in meshes) {
+				var skin: Dynamic = mesh.skin;
+				if (skin == null || skin.skeleton_ref == null || skin.transformsI != null) continue;
+				pending++;
+				SkeletonData.loadSkin(skin, function(skeleton: Dynamic) { loaded(); });
+			}
+		}
+		loaded();
+	}
+	#end
+
+	// Decodes the data of a loaded file in place, decoded data is skipped
+	public static function process(raw: Dynamic) {
+		if (raw == null) return;
+		MeshDecoder.decodeMeshes(raw);
+		#if arm_anim_compact
+		AnimationDecoder.decodeAction(raw);
+		#end
+		#if arm_skin
+		SkeletonData.resolveMeshes(raw);
+		#end
+	}
+}
+
+// Scene raw cache that processes each file iron puts into it
+class SceneRaws implements IMap<String, Dynamic> {
+
+	var raws = new StringMap<Dynamic>();
+
+	public function new(cached: Map<String, Dynamic>) {
+		for (key in cached.keys()) set(key, cached.get(key));
+	}
+
+	public function get(key: String): Null<Dynamic> {
+		return raws.get(key);
+	}
+
+	public function set(key: String, value: Dynamic) {
+		SceneLoader.process(value);
+		raws.set(key, value);
+	}
+
+	public function exists(key: String): Bool {
+		return raws.exists(key);
+	}
+
+	public function remove(key: String): Bool {
+		return raws.remove(key);
+	}
+
+	public function keys(): Iterator<String> {
+		return raws.keys();
+	}
+
+	public function iterator(): Iterator<Dynamic> {
+		return raws.iterator();
+	}
+
+	public function keyValueIterator(): KeyValueIterator<String, Dynamic> {
+		return raws.keyValueIterator();
+	}
+
+	public function copy(): IMap<String, Dynamic> {
+		var map = new SceneRaws(new Map());
+		for (key in raws.keys()) map.raws.set(key, raws.get(key));
+		return map;
+	}
+
+	public function toString(): String {
+		return raws.toString();
+	}
+
+	public function clear() {
+		raws.clear();
+	}
+}
@@ -0,0 +1,84 @@
+package armory.data;
+
+#if arm_skin
+
+import iron.data.Data;
+
+// Shared skeleton bind data of skinned meshes, exported with Shared Skeletons.
+// Meshes bound to the same armature reference a single skeleton through
+// skin.skeleton_ref, which is either the name of an entry of skeleton_datas or
+// a "file/name" reference
+class SkeletonData {
+
+	static var cache = new Map<String, Dynamic>();
+	static var boneIndices = new Map<String, Map<String, Int>>();
+
+	// Copies the bind data of the referenced skeleton into skin
+	public static function resolveSkin(skin: Dynamic, skeleton: Dynamic) {
+		skin.bone_ref_array = skeleton.bone_ref_array;
+		skin.bone_len_array = skeleton.bone_len_array;
+		skin.transformsI = skeleton.transformsI;
+	}
+
+	// Resolves the skins of the meshes of raw in place from its own skeletons, or
+	// from the already loaded file of a "file/name" reference
+	public static function resolveMeshes(raw: Dynamic) {
+		var meshes: Array<Dynamic> = raw.mesh_datas;
+		if (meshes == null) return;
+		for (mesh in meshes) {
+			var skin: Dynamic = mesh.skin;
+			if (skin == null || skin.skeleton_ref == null || skin.transformsI != null) continue;
+			var ref: String = skin.skeleton_ref;
+			var i = ref.indexOf("/");
+			var skeleton = i >= 0 ?
+				find(Data.cachedSceneRaws.get(ref.substr(0, i)), ref.substr(i + 1)) :
+				find(raw, ref);
+			if (skeleton != null) resolveSkin(skin, skeleton);
+		}
+	}
+
+	static function find(raw: Dynamic, name: String): Dynamic {
+		if (raw == null) return null;
+		var skeletons: Array<Dynamic> = raw.skeleton_datas;
+		if (skeletons == null) return null;
+		for (skeleton in skeletons) if (skeleton.name == name) return skeleton;
+		return null;
+	}
+
+	// Loads the skeleton referenced by skin and resolves the skin
+	public static function loadSkin(skin: Dynamic, done: Dynamic->Void) {
+		var ref: String = skin.skeleton_ref;
+		var cached = cache.get(ref);
+		if (cached != null) {
+			resolveSkin(skin, cached);
+			done(cached);
+			return;
+		}
+		var i = ref.indexOf("/");
+		var file = i >= 0 ? ref.substr(0, i) : ref;
+		var name = i >= 0 ? ref.substr(i + 1) : ref;
+		Data.getSceneRaw(file, function(format: Dynamic) {
+			var skeleton = find(format, name);
+			if (skeleton != null) {
+				cache.set(ref, skeleton);
+				resolveSkin(skin, skeleton);
+			}
+			done(skeleton);
+		});
+	}
+
+	// Index of the named bone in the skeleton, -1 if not skinned
+	public static function getBoneIndex(skeleton: Dynamic, name: String): Int {
+		var indices = boneIndices.get(skeleton.name);
+		if (indices == null) {
+			indices = new Map<String, Int>();
+			var refs: Array<String> = skeleton.bone_ref_array;
+			for (i in 0...refs.length) if (!indices.exists(refs[i])) indices.set(refs[i], i);
+			boneIndices.set(skeleton.name, indices);
+		}
+		var index = indices.get(name);
+		return index != null ? index : -1;
+	}
+}
+
+#end
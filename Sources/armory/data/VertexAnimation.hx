@@ -0,0 +1,83 @@
+package armory.data;
+
+#if arm_vertex_animation
+
+import haxe.io.Bytes;
+import kha.arrays.Int32Array;
+import kha.graphics4.TextureFormat;
+import iron.Scene;
+import iron.math.Vec4;
+import iron.object.MeshObject;
+import iron.object.Object;
+
+// Vertex animation textures baked from armature actions (arm.lib.vat). All
+// objects of a mesh, including its instances, share the textures and play the
+// animation from the shader, instances start at a frame hashed from their position
+class VertexAnimation {
+
+	static var animations = new Map<String, VertexAnimation>();
+	static var empty: kha.Image = null;
+	static var emptyParams = new Vec4(1.0, 1.0, 0.0);
+
+	public var positions: kha.Image;
+	public var normals: kha.Image;
+	public var params: Vec4;
+
+	function new(raw: Dynamic) {
+		var frames: Int = raw.frames;
+		var rows: Int = raw.rows;
+		var width: Int = raw.width;
+
+		positions = kha.Image.fromBytes(toBytes(raw.positions), width, frames * rows, TextureFormat.RGBA64);
+		normals = kha.Image.fromBytes(toBytes(raw.normals), width, frames * rows, TextureFormat.RGBA32);
+
+		params = new Vec4(frames, rows, 1.0 / Scene.active.raw.frame_time);
+	}
+
+	// Texels are exported as Int32 arrays holding their bytes
+	static function toBytes(values: Int32Array): Bytes {
+		var bytes = Bytes.alloc(values.length * 4);
+		for (i in 0...values.length) bytes.setInt32(i * 4, values[i]);
+		return bytes;
+	}
+
+	// Vertex animation of a mesh object, null when its mesh has none
+	public static function get(object: Object): VertexAnimation {
+		if (!Std.isOfType(object, MeshObject)) return null;
+		var mesh = cast(object, MeshObject).data;
+		var animation = animations.get(mesh.name);
+		if (animation != null) return animation;
+		var raw: Dynamic = mesh.raw;
+		if (raw.vertex_animation == null) return null;
+		animation = new VertexAnimation(raw.vertex_animation);
+		animations.set(mesh.name, animation);
+		return animation;
+	}
+
+	// Bound to meshes without animation that share a material with animated meshes
+	public static function getPositions(object: Object): kha.Image {
+		var animation = get(object);
+		return animation != null ? animation.positions : getEmpty();
+	}
+
+	public static function getNormals(object: Object): kha.Image {
+		var animation = get(object);
+		return animation != null ? animation.normals : getEmpty();
+	}
+
+	public static function getParams(object: Object): Vec4 {
+		var animation = get(object);
+		return animation != null ? animation.params : emptyParams;
+	}
+
+	public static inline function getTime(): Float {
+		return iron.system.Time.time();
+	}
+
+	static function getEmpty(): kha.Image {
+		if (empty == null) empty = kha.Image.create(1, 1, TextureFormat.RGBA32);
+		return empty;
+	}
+}
+
+#end
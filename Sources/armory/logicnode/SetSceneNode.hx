@@ -13,9 +13,11 @@ class SetSceneNode extends LogicNode {
 	override function run(from: Int) {
 		var sceneName: String = inputs[1].get();
 
-		iron.Scene.setActive(sceneName, function(o: iron.object.Object) {
-			root = o;
-			runOutput(0);
+		armory.data.SceneLoader.load(sceneName, function() {
+			iron.Scene.setActive(sceneName, function(o: iron.object.Object) {
+				root = o;
+				runOutput(0);
+			});
 		});
 	}
 
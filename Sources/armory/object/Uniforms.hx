@@ -12,6 +12,9 @@ class Uniforms {
 		iron.object.Uniforms.externalTextureLinks = [textureLink];
 		iron.object.Uniforms.externalVec3Links = [vec3Link];
 		iron.object.Uniforms.externalFloatLinks = [floatLink];
+		#if (arm_morph_target || arm_skin_palettes)
+		iron.object.Uniforms.externalFloatsLinks = [floatsLink];
+		#end
 	}
 
 	public static function textureLink(object: Object, mat: MaterialData, link: String): kha.Image {
@@ -25,6 +28,19 @@ class Uniforms {
 			return armory.data.ConstData.ltcMagTex;
 		}
 		#end
+		#if arm_morph_target
+		if (link == "_morphDataTex") {
+			return armory.data.MorphTarget.getTexture(object);
+		}
+		#end
+		#if arm_vertex_animation
+		if (link == "_vatPos") {
+			return armory.data.VertexAnimation.getPositions(object);
+		}
+		else if (link == "_vatNor") {
+			return armory.data.VertexAnimation.getNormals(object);
+		}
+		#end
 		return null;
 	}
 
@@ -155,6 +171,11 @@ class Uniforms {
 			v.set(Math.floor(v.x / f) * f, Math.floor(v.y / f) * f, Math.floor(v.z / f) * f);
 		}
 		#end
+		#if arm_vertex_animation
+		if (link == "_vatParams") {
+			v = armory.data.VertexAnimation.getParams(object);
+		}
+		#end
 
 		return v;
 	}
@@ -170,6 +191,11 @@ class Uniforms {
 			return armory.trait.internal.DebugConsole.debugFloat;
 		}
 		#end
+		#if arm_vertex_animation
+		if (link == "_vatTime") {
+			return armory.data.VertexAnimation.getTime();
+		}
+		#end
 		#if rp_voxelao
 		if (link == "_voxelBlend") { // Blend current and last voxels
 			var freq = armory.renderpath.RenderPathCreator.voxelFreq;
@@ -178,4 +204,20 @@ class Uniforms {
 		#end
 		return null;
 	}
+
+	#if (arm_morph_target || arm_skin_palettes)
+	public static function floatsLink(object: Object, mat: MaterialData, link: String): kha.arrays.Float32Array {
+		#if arm_morph_target
+		if (link == "_morphWeights") {
+			return armory.data.MorphTarget.getWeights(object);
+		}
+		#end
+		#if arm_skin_palettes
+		if (link == "_skinPalette") {
+			return armory.data.BonePalette.getPalette(object);
+		}
+		#end
+		return null;
+	}
+	#end
 }
@@ -0,0 +1,114 @@
+package armory.renderpath;
+
+#if arm_auto_lod
+
+import kha.arrays.Uint32Array;
+import kha.graphics4.IndexBuffer;
+import kha.graphics4.Usage;
+import iron.Scene;
+import iron.data.Geometry;
+import iron.math.Vec4;
+import iron.object.CameraObject;
+import iron.object.MeshObject;
+
+// Level of detail selection of meshes exported with generated LOD levels
+// (arm.lib.simplify). Levels are index arrays into the vertex buffer of the
+// full mesh, the index buffers of the selected level are swapped into the
+// geometry, so all users of a mesh are drawn at the most detailed level any
+// of them needs
+class AutoLod {
+
+	static var levels = new Map<Geometry, Array<Array<IndexBuffer>>>();
+	static var selected = new Map<Geometry, Int>();
+	static var screenSizes = new Map<Geometry, Float>();
+	static var users = new Map<Geometry, MeshObject>();
+	static var eye = new Vec4();
+
+	// Selects the level of each mesh from the screen size of its users, called
+	// once per frame before meshes are drawn
+	public static function update(camera: CameraObject) {
+		if (camera == null || Scene.active == null) return;
+		// Fraction of the screen height covered by a unit size at unit distance
+		var scale = 1 / (2 * Math.tan(camera.data.raw.fov / 2));
+		eye.setFrom(camera.transform.world.getLoc());
+
+		screenSizes.clear();
+		users.clear();
+		for (object in Scene.active.meshes) {
+			var lods: Array<Float> = object.raw != null ? object.raw.auto_lods : null;
+			if (lods == null || !object.visible) continue;
+			var geom = object.data.geom;
+			if (geom.instanced || geom.indexBuffers == null) continue;
+			var dim = object.transform.dim;
+			var size = Math.max(Math.max(dim.x, dim.y), dim.z);
+			var distance = Vec4.distance(eye, object.transform.world.getLoc());
+			var screenSize = distance > 0 ? size * scale / distance : 1.0;
+			var current = screenSizes.get(geom);
+			if (current == null || screenSize > current) {
+				screenSizes.set(geom, screenSize);
+				users.set(geom, object);
+			}
+		}
+
+		for (geom in screenSizes.keys()) {
+			var object = users.get(geom);
+			var lods: Array<Float> = object.raw.auto_lods;
+			var screenSize = screenSizes.get(geom);
+			var level = 0;
+			while (level < lods.length && screenSize < lods[level]) level++;
+			var last = selected.get(geom);
+			if (last == null) last = 0;
+			if (level != last) {
+				geom.indexBuffers = getLevel(object, level);
+				selected.set(geom, level);
+			}
+		}
+	}
+
+	// Whether the geometry is drawn with a generated level instead of the full mesh
+	public static inline function isReduced(geom: Geometry): Bool {
+		var level = selected.get(geom);
+		return level != null && level > 0;
+	}
+
+	// Index buffers of the level, level 0 holds the buffers of the full mesh
+	static function getLevel(object: MeshObject, level: Int): Array<IndexBuffer> {
+		var geom = object.data.geom;
+		var buffers = levels.get(geom);
+		if (buffers == null) {
+			buffers = [geom.indexBuffers];
+			levels.set(geom, buffers);
+		}
+		if (buffers[level] == null) {
+			var arrays: Array<Dynamic> = object.data.raw.index_arrays;
+			var lods: Array<Dynamic> = (object.data.raw: Dynamic).lods;
+			var lodArrays: Array<Dynamic> = lods[level - 1].index_arrays;
+			var levelBuffers: Array<IndexBuffer> = [];
+			for (ia in arrays) {
+				var values: Uint32Array = null;
+				for (lodIa in lodArrays) {
+					if (lodIa.material == ia.material) {
+						values = lodIa.values;
+						break;
+					}
+				}
+				levelBuffers.push(createBuffer(values));
+			}
+			buffers[level] = levelBuffers;
+		}
+		return buffers[level];
+	}
+
+	// Material slots without triangles at a level are drawn as a degenerate triangle
+	static function createBuffer(values: Uint32Array): IndexBuffer {
+		var empty = values == null || values.length == 0;
+		var count = empty ? 3 : values.length;
+		var buffer = new IndexBuffer(count, Usage.StaticUsage);
+		var data = buffer.lock();
+		for (i in 0...count) data[i] = empty ? 0 : values[i];
+		buffer.unlock();
+		return buffer;
+	}
+}
+
+#end
@@ -0,0 +1,162 @@
+package armory.renderpath;
+
+#if arm_meshlets
+
+import kha.arrays.Float32Array;
+import kha.arrays.Int32Array;
+import kha.arrays.Uint32Array;
+import kha.graphics4.IndexBuffer;
+import kha.graphics4.Usage;
+import iron.Scene;
+import iron.data.Geometry;
+import iron.math.Mat4;
+import iron.math.Vec4;
+import iron.object.CameraObject;
+import iron.object.MeshObject;
+
+// Cluster culling of index arrays exported with meshlets (arm.lib.meshlets)
+// Meshlets are contiguous index ranges with an object space bounding sphere
+// and normal cone, visible ranges can be drawn from the existing index buffer
+class MeshletCulling {
+
+	static var center = new Vec4();
+	static var eye = new Vec4();
+	static var dir = new Vec4();
+	static var invWorld = Mat4.identity();
+
+	static var culledBuffers = new Map<Geometry, Array<IndexBuffer>>();
+	static var userCount = new Map<Geometry, Int>();
+	static var swapped: Array<Geometry> = [];
+	static var originals: Array<Array<IndexBuffer>> = [];
+	static var ranges: Array<Int> = [];
+
+	// Swaps the index buffers of meshes with meshlets for buffers holding their
+	// visible meshlets, the remainder is filled with degenerate triangles.
+	// Meshes shared by several objects, instanced meshes and meshes drawn at a
+	// generated LOD level are drawn as is. end() restores the buffers
+	public static function begin(camera: CameraObject) {
+		if (camera == null || Scene.active == null) return;
+		userCount.clear();
+		for (object in Scene.active.meshes) {
+			var geom = object.data.geom;
+			var count = userCount.get(geom);
+			userCount.set(geom, count == null ? 1 : count + 1);
+		}
+
+		for (object in Scene.active.meshes) {
+			var geom = object.data.geom;
+			if (!object.visible || geom.instanced || geom.indexBuffers == null || userCount.get(geom) > 1) continue;
+			#if arm_auto_lod
+			if (AutoLod.isReduced(geom)) continue;
+			#end
+			var buffers = getCulledBuffers(object);
+			if (buffers == null) continue;
+
+			var arrays: Array<Dynamic> = object.data.raw.index_arrays;
+			for (i in 0...arrays.length) {
+				var ia = arrays[i];
+				if (ia.meshlets == null) continue;
+				ranges.resize(0);
+				visibleRanges(ia, object, camera, ranges);
+				var values: Uint32Array = ia.values;
+				var data = buffers[i].lock();
+				var pos = 0;
+				var r = 0;
+				while (r < ranges.length) {
+					for (j in ranges[r]...ranges[r] + ranges[r + 1]) data[pos++] = values[j];
+					r += 2;
+				}
+				for (j in pos...values.length) data[j] = 0;
+				buffers[i].unlock();
+			}
+			swapped.push(geom);
+			originals.push(geom.indexBuffers);
+			geom.indexBuffers = buffers;
+		}
+	}
+
+	public static function end() {
+		for (i in 0...swapped.length) swapped[i].indexBuffers = originals[i];
+		swapped.resize(0);
+		originals.resize(0);
+	}
+
+	// Dynamic index buffers of the index arrays with meshlets, null if the mesh has none
+	static function getCulledBuffers(object: MeshObject): Array<IndexBuffer> {
+		var geom = object.data.geom;
+		if (culledBuffers.exists(geom)) return culledBuffers.get(geom);
+		var arrays: Array<Dynamic> = object.data.raw.index_arrays;
+		var buffers: Array<IndexBuffer> = null;
+		for (i in 0...arrays.length) {
+			if (arrays[i].meshlets == null) continue;
+			if (buffers == null) buffers = geom.indexBuffers.copy();
+			var values: Uint32Array = arrays[i].values;
+			buffers[i] = new IndexBuffer(values.length, Usage.DynamicUsage);
+		}
+		culledBuffers.set(geom, buffers);
+		return buffers;
+	}
+
+	// Appends the [start, count] index ranges of visible meshlets of index array ia
+	// to ranges, adjacent ranges are merged. Returns the number of culled meshlets
+	public static function visibleRanges(ia: Dynamic, object: MeshObject, camera: CameraObject, ranges: Array<Int>): Int {
+		var meshlets: Dynamic = ia.meshlets;
+		var indexRanges: Int32Array = meshlets.ranges;
+		var bounds: Float32Array = meshlets.bounds;
+		var cones: Float32Array = meshlets.cones;
+
+		var world = object.transform.world;
+		var scale = world.getScale();
+		var maxScale = Math.max(Math.max(Math.abs(scale.x), Math.abs(scale.y)), Math.abs(scale.z));
+		// Cones are not preserved by non-uniform scale
+		var cullBackfaces = Math.abs(scale.x - scale.y) < 1e-4 && Math.abs(scale.y - scale.z) < 1e-4;
+		invWorld.getInverse(world);
+		eye.setFrom(camera.transform.world.getLoc());
+		eye.applymat4(invWorld);
+
+		var culled = 0;
+		var count = Std.int(indexRanges.length / 2);
+		for (i in 0...count) {
+			var radius = bounds[i * 4 + 3];
+
+			// Backface, triangles of the meshlet all face away from the eye
+			if (cullBackfaces) {
+				dir.set(bounds[i * 4] - eye.x, bounds[i * 4 + 1] - eye.y, bounds[i * 4 + 2] - eye.z);
+				var d = dir.x * cones[i * 4] + dir.y * cones[i * 4 + 1] + dir.z * cones[i * 4 + 2];
+				if (d >= cones[i * 4 + 3] * dir.length() + radius) {
+					culled++;
+					continue;
+				}
+			}
+
+			// Frustum
+			center.set(bounds[i * 4], bounds[i * 4 + 1], bounds[i * 4 + 2]);
+			center.applymat4(world);
+			var inside = true;
+			for (plane in camera.frustumPlanes) {
+				if (plane.distanceToSphere(center, radius * maxScale) + radius * maxScale * 2 < 0) {
+					inside = false;
+					break;
+				}
+			}
+			if (!inside) {
+				culled++;
+				continue;
+			}
+
+			var start = indexRanges[i * 2];
+			var length = indexRanges[i * 2 + 1];
+			var last = ranges.length - 2;
+			if (last >= 0 && ranges[last] + ranges[last + 1] == start) {
+				ranges[last + 1] += length;
+			}
+			else {
+				ranges.push(start);
+				ranges.push(length);
+			}
+		}
+		return culled;
+	}
+}
+
+#end
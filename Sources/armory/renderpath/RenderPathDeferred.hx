@@ -26,7 +26,13 @@ class RenderPathDeferred {
 	}
 
 	public static function drawMeshes() {
+		#if arm_meshlets
+		MeshletCulling.begin(iron.Scene.active.camera);
 		path.drawMeshes("mesh");
+		MeshletCulling.end();
+		#else
+		path.drawMeshes("mesh");
+		#end
 	}
 
 	public static function applyConfig() {
@@ -391,6 +397,10 @@ class RenderPathDeferred {
 	@:access(iron.RenderPath)
 	public static function commands() {
 
+		#if arm_auto_lod
+		AutoLod.update(iron.Scene.active.camera);
+		#end
+
 		path.setTarget("gbuffer0"); // Only clear gbuffer0
 		#if (rp_background == "Clear")
 		{
@@ -30,7 +30,13 @@ class RenderPathForward {
 	}
 
 	public static function drawMeshes() {
+		#if arm_meshlets
+		MeshletCulling.begin(iron.Scene.active.camera);
 		path.drawMeshes("mesh");
+		MeshletCulling.end();
+		#else
+		path.drawMeshes("mesh");
+		#end
 
 		#if (rp_background == "World")
 		{
@@ -285,6 +291,10 @@ class RenderPathForward {
 
 	public static function commands() {
 
+		#if arm_auto_lod
+		AutoLod.update(iron.Scene.active.camera);
+		#end
+
 		#if rp_shadowmap
 		{
 			Inc.drawShadowMap();
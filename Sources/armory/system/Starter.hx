@@ -30,6 +30,7 @@ class Starter {
 			if (c.window_vsync == null) c.window_vsync = vsync;
 
 			armory.object.Uniforms.register();
+			armory.data.SceneLoader.register();
 
 			var windowMode = c.window_mode == 0 ? kha.WindowMode.Windowed : kha.WindowMode.Fullscreen;
 			var windowFeatures = None;
@@ -51,15 +52,25 @@ class Starter {
 	                }
 	                iron.App.notifyOnRender2D(load);
 	                #end
-					iron.Scene.setActive(scene, function(object: iron.object.Object) {
-						iron.RenderPath.setActive(getRenderPath());
-						#if arm_patch
-						iron.Scene.getRenderPath = getRenderPath;
-						#end
-						#if arm_draworder_shader
-						iron.RenderPath.active.drawOrder = iron.RenderPath.DrawOrder.Shader;
-						#end // else Distance
-					});
+					function setActive() {
+						iron.Scene.setActive(scene, function(object: iron.object.Object) {
+							iron.RenderPath.setActive(getRenderPath());
+							#if arm_patch
+							iron.Scene.getRenderPath = getRenderPath;
+							#end
+							#if arm_draworder_shader
+							iron.RenderPath.active.drawOrder = iron.RenderPath.DrawOrder.Shader;
+							#end // else Distance
+						});
+					}
+					function loadScene() {
+						armory.data.SceneLoader.load(scene, setActive);
+					}
+					#if arm_asset_archive
+					armory.data.AssetArchive.load(loadScene);
+					#else
+					loadScene();
+					#end
 				});
 			});
 
@@ -11,11 +11,13 @@ This software is licensed under the Creative Commons
 Attribution-ShareAlike 3.0 Unported License:
 http://creativecommons.org/licenses/by-sa/3.0/deed.en_US
 """
+import concurrent.futures
 from enum import Enum, unique
 import math
+import multiprocessing
 import os
 import time
-from typing import Any, Dict, List, Tuple, Union, Optional
+from typing import Any, Dict, List, Set, Tuple, Union, Optional
 
 import numpy as np
 
@@ -24,6 +26,19 @@ from mathutils import *
 
 import arm.assets as assets
 import arm.exporter_opt as exporter_opt
+import arm.lib.anim_compress as anim_compress
+import arm.lib.anim_sample as anim_sample
+import arm.lib.arm_file as arm_file
+import arm.lib.instancing as instancing
+import arm.lib.mesh_encode as mesh_encode
+import arm.lib.morph as morph
+import arm.lib.vat as vat
+import arm.lib.profiler as profiler
+import arm.lib.quantize as quantize
+import arm.lib.simplify as simplify
+import arm.lib.skinning as skinning
+import arm.lib.static_batch as static_batch
+from arm.lib.build_cache import BuildCache, Hasher
 import arm.log as log
 import arm.make_renderpath as make_renderpath
 import arm.material.cycles as cycles
@@ -102,6 +117,14 @@ class ArmoryExporter:
 
     # Class names of referenced traits
     import_traits: List[str] = []
+    # Instanced types of objects that are drawn by auto instancing
+    instancing_modes: Dict[bpy.types.Object, str] = {}
+    # Quantization profiles of exported meshes and their materials
+    vertex_profiles: Dict[bpy.types.ID, Tuple[str, str, str, str]] = {}
+    # Meshes exported with morph targets and the materials they use
+    morph_targets: Set[bpy.types.ID] = set()
+    # Meshes exported with vertex animation textures and their materials
+    vertex_animations: Set[bpy.types.ID] = set()
 
     def __init__(self, context: bpy.types.Context, filepath: str, scene: bpy.types.Scene = None, depsgraph: bpy.types.Depsgraph = None):
         global current_output
@@ -118,6 +141,10 @@ class ArmoryExporter:
         # ("structName") in a dict for each object
         self.bobject_array: Dict[bpy.types.Object, Dict[str, Union[NodeType, str]]] = {}
         self.bobject_bone_array = {}
+        # Bone name -> first exported bone with that name
+        self.bone_names: Dict[str, bpy.types.Bone] = {}
+        # (Armature, bind transform) -> shared skeleton reference
+        self.skeletons: Dict[Tuple[bpy.types.Object, Tuple], str] = {}
         self.mesh_array = {}
         self.light_array = {}
         self.probe_array = {}
@@ -141,6 +168,21 @@ class ArmoryExporter:
 
         self.bone_tracks = []
 
+        # Content hash cache of exported mesh files
+        self.mesh_cache: Optional[BuildCache] = None
+        # Meshes extracted from bpy, waiting to be encoded
+        self.mesh_jobs: List[Tuple[List[bpy.types.Object], Optional[str], Dict]] = []
+        # Instance transforms of auto instanced objects, keyed by the
+        # object that draws them
+        self.auto_instances: Dict[bpy.types.Object, Tuple] = {}
+        # Objects drawn as an instance of another object
+        self.auto_instanced_skip = set()
+        # Instanced objects and instance transforms of collection and
+        # geometry node instancers
+        self.depsgraph_instances: Dict[bpy.types.Object, List[Tuple]] = {}
+        # Objects whose meshes are merged into static batches
+        self.static_batched: List[bpy.types.Object] = []
+
         ArmoryExporter.preprocess()
 
     @classmethod
@@ -160,6 +202,10 @@ class ArmoryExporter:
         if wrd.arm_navigation == 'Enabled':
             cls.export_navigation = True
         cls.export_ui = False
+        cls.instancing_modes = {}
+        cls.vertex_profiles = {}
+        cls.morph_targets = set()
+        cls.vertex_animations = set()
 
     @staticmethod
     def write_matrix(matrix):
@@ -168,15 +214,18 @@ class ArmoryExporter:
                 matrix[2][0], matrix[2][1], matrix[2][2], matrix[2][3],
                 matrix[3][0], matrix[3][1], matrix[3][2], matrix[3][3]]
 
-    def get_meshes_file_path(self, object_id: str, compressed=False) -> str:
+    def get_meshes_path(self) -> str:
         index = self.filepath.rfind('/')
         mesh_fp = self.filepath[:(index + 1)] + 'meshes/'
 
         if not os.path.exists(mesh_fp):
             os.makedirs(mesh_fp)
 
+        return mesh_fp
+
+    def get_meshes_file_path(self, object_id: str, compressed=False) -> str:
         ext = '.lz4' if compressed else '.arm'
-        return mesh_fp + object_id + ext
+        return self.get_meshes_path() + object_id + ext
 
     @staticmethod
     def get_shape_keys(mesh):
@@ -192,10 +241,10 @@ class ArmoryExporter:
     def find_bone(self, name: str) -> Optional[Tuple[bpy.types.Bone, Dict]]:
         """Finds the bone reference (a tuple containing the bone object
         and its data) by the given name and returns it."""
-        for bone_ref in self.bobject_bone_array.items():
-            if bone_ref[0].name == name:
-                return bone_ref
-        return None
+        bone = self.bone_names.get(name)
+        if bone is None:
+            return None
+        return bone, self.bobject_bone_array[bone]
 
     @staticmethod
     def collect_bone_animation(armature: bpy.types.Object, name: str) -> List[bpy.types.FCurve]:
@@ -260,19 +309,33 @@ class ArmoryExporter:
 
         return int(start), int(end)
 
+    @staticmethod
+    def sample_fcurve(fcurve: bpy.types.FCurve, frames: np.ndarray) -> np.ndarray:
+        """Evaluates the fcurve at all given frames at once."""
+        keyframes = fcurve.keyframe_points
+        num_keys = len(keyframes)
+        ipo = np.empty(num_keys, dtype='<i4')
+        if num_keys > 0:
+            keyframes.foreach_get('interpolation', ipo)
+
+        # Modifiers and easing interpolations are left to Blender
+        if num_keys == 0 or len(fcurve.modifiers) > 0 or (ipo > anim_sample.IPO_BEZIER).any():
+            return np.array([fcurve.evaluate(frame) for frame in frames.tolist()], dtype='<f4')
+
+        co = np.empty(num_keys * 2, dtype='<f4')
+        handle_left = np.empty(num_keys * 2, dtype='<f4')
+        handle_right = np.empty(num_keys * 2, dtype='<f4')
+        keyframes.foreach_get('co', co)
+        keyframes.foreach_get('handle_left', handle_left)
+        keyframes.foreach_get('handle_right', handle_right)
+        values = anim_sample.eval_keyframes(co, handle_left, handle_right, ipo, fcurve.extrapolation == 'LINEAR', frames)
+        return np.array(values, dtype='<f4')
+
     @staticmethod
     def export_animation_track(fcurve: bpy.types.FCurve, frame_range: Tuple[int, int], target: str) -> Dict:
         """This function exports a single animation track."""
-        out_track = {'target': target, 'frames': [], 'values': []}
-
-        start = frame_range[0]
-        end = frame_range[1]
-
-        for frame in range(start, end + 1):
-            out_track['frames'].append(frame)
-            out_track['values'].append(fcurve.evaluate(frame))
-
-        return out_track
+        frames = np.arange(frame_range[0], frame_range[1] + 1, dtype='<i4')
+        return {'target': target, 'frames': frames, 'values': ArmoryExporter.sample_fcurve(fcurve, frames)}
 
     def export_object_transform(self, bobject: bpy.types.Object, o):
         # Static transform
@@ -295,6 +358,7 @@ class ArmoryExporter:
                     o['object_actions'] = []
                 o['object_actions'].append('action_' + action_name + ext)
 
+                profile_event = profiler.begin('Action ' + action_name, 'action')
                 frame_range = self.calculate_anim_frame_range(action)
                 out_anim = {
                     'begin': frame_range[0],
@@ -319,6 +383,8 @@ class ArmoryExporter:
 
                     out_anim['tracks'].append(out_track)
 
+                anim_compress.reduce_object_tracks(out_anim['tracks'], bpy.data.worlds['Arm'].arm_anim_tolerance)
+
                 if True:  # not action.arm_cached or not os.path.exists(fp):
                     wrd = bpy.data.worlds['Arm']
                     if wrd.arm_verbose_output:
@@ -333,6 +399,7 @@ class ArmoryExporter:
                     }
                     action_file = {'objects': [out_object_action]}
                     arm.utils.write_arm(fp, action_file)
+                profiler.end(profile_event)
 
     def process_bone(self, bone: bpy.types.Bone) -> None:
         if ArmoryExporter.export_all_flag or bone.select:
@@ -340,6 +407,7 @@ class ArmoryExporter:
                 "objectType": NodeType.BONE,
                 "structName": bone.name
             }
+            self.bone_names.setdefault(bone.name, bone)
 
         for subbobject in bone.children:
             self.process_bone(subbobject)
@@ -386,6 +454,540 @@ class ArmoryExporter:
                             # force its type to be a bone
                             bone_ref[1]["objectType"] = NodeType.BONE
 
+    @staticmethod
+    def is_static_mesh(bobject: bpy.types.Object) -> bool:
+        """Returns `True` if the mesh object has no animation, logic or
+        simulation, so that it can be drawn as an instance."""
+        if bobject.type != 'MESH' or bobject.arm_instanced != 'Off' or len(bobject.constraints) > 0:
+            return False
+        anim = bobject.animation_data
+        if anim is not None and (anim.action is not None or len(anim.nla_tracks) > 0 or len(anim.drivers) > 0):
+            return False
+        if len(bobject.arm_traitlist) > 0 or len(bobject.arm_propertylist) > 0 or bobject.arm_tilesheet != '':
+            return False
+        if bobject.rigid_body is not None or bobject.rigid_body_constraint is not None or len(bobject.particle_systems) > 0:
+            return False
+        for mod in bobject.modifiers:
+            if mod.type == 'CLOTH' or mod.type == 'SOFT_BODY':
+                return False
+        mesh = bobject.data
+        # Vertex animation textures replace skinning
+        if (bobject.find_armature() is not None and arm.utils.get_vertex_animation_armature(bobject) is None) or mesh.shape_keys is not None or len(mesh.arm_lodlist) > 0 or mesh.arm_lod_auto:
+            return False
+        return True
+
+    @staticmethod
+    def is_static_scenery(bobject: bpy.types.Object) -> bool:
+        """Returns `True` if the object is a visible static mesh that is
+        not transformed at runtime, so its drawing can be merged with
+        other objects."""
+        if not bobject.arm_export or not ArmoryExporter.is_static_mesh(bobject):
+            return False
+        # Meshes with vertex animation are usually parented to their armature
+        if bobject.parent is not None and bobject.parent != arm.utils.get_vertex_animation_armature(bobject):
+            return False
+        if bobject.arm_mobile or not bobject.arm_spawn or not bobject.arm_visible or bobject.hide_render:
+            return False
+        if not bobject.cycles_visibility.camera or not bobject.cycles_visibility.shadow:
+            return False
+        return True
+
+    @staticmethod
+    def can_auto_instance(bobject: bpy.types.Object) -> bool:
+        """Returns `True` if the object is static and plain enough to be
+        drawn as an instance of another object."""
+        return bobject.arm_auto_instance and len(bobject.children) == 0 and ArmoryExporter.is_static_scenery(bobject)
+
+    @staticmethod
+    def get_pinned_objects() -> set:
+        """Objects referenced by instancers and particles, these have to
+        stay separate objects."""
+        pinned = set()
+        for bobject in bpy.data.objects:
+            if bobject.instance_type == 'COLLECTION' and bobject.instance_collection is not None:
+                pinned.update(bobject.instance_collection.all_objects)
+        for psys in bpy.data.particles:
+            if psys.instance_object is not None:
+                pinned.add(psys.instance_object)
+            if psys.instance_collection is not None:
+                pinned.update(psys.instance_collection.all_objects)
+        return pinned
+
+    def collect_auto_instances(self, scene_objects: List[bpy.types.Object]):
+        """Folds static objects that share a mesh and materials into
+        instances of a single object. Meshes are folded only if all of
+        their users qualify, and materials only if all of their users are
+        folded, because instancing changes the vertex shader."""
+        wrd = bpy.data.worlds['Arm']
+        if not wrd.arm_auto_instancing or ArmoryExporter.option_mesh_only:
+            return
+
+        pinned = self.get_pinned_objects()
+
+        mesh_users = {}
+        mat_users = {}
+        for bobject in scene_objects:
+            bobject_ref = self.bobject_array.get(bobject)
+            if bobject_ref is None or bobject_ref["objectType"] is not NodeType.MESH:
+                continue
+            mesh_users.setdefault(bobject.data, []).append(bobject)
+            for slot in bobject.material_slots:
+                mat_users.setdefault(self.slot_to_material(bobject, slot), set()).add(bobject)
+        for bobject in pinned:
+            for slot in bobject.material_slots:
+                mat_users.setdefault(self.slot_to_material(bobject, slot), set()).add(bobject)
+
+        groups = {}
+        for mesh, users in mesh_users.items():
+            if len(users) < wrd.arm_auto_instancing_threshold:
+                continue
+            host = users[0]
+            materials = tuple(self.slot_to_material(host, slot) for slot in host.material_slots)
+            if len(materials) == 0 or any(mat is None or mat.arm_decal for mat in materials):
+                continue
+            if not all(user not in pinned and self.can_auto_instance(user) and self.mod_equal_stack(host, user)
+                       and tuple(self.slot_to_material(user, slot) for slot in user.material_slots) == materials for user in users):
+                continue
+
+            # Transforms relative to the host, shear can not be instanced
+            host_inv = np.array(host.matrix_world.inverted_safe())
+            matrices = np.array([host_inv @ np.array(user.matrix_world) for user in users])
+            loc, rot, scale, error = instancing.decompose(matrices)
+            if error > 1e-4 * max(1.0, float(scale.max())):
+                if wrd.arm_verbose_output:
+                    print('Auto instancing skipped for ' + arm.utils.asset_name(mesh) + ', transforms are sheared')
+                continue
+            groups[mesh] = [users, materials, instancing.instancing_mode(rot, scale), loc, rot, scale]
+
+        # Drop groups sharing materials with objects that are not folded
+        changed = True
+        while changed:
+            changed = False
+            folded = {user for group in groups.values() for user in group[0]}
+            for mesh in list(groups.keys()):
+                if any(not mat_users[mat] <= folded for mat in groups[mesh][1]):
+                    del groups[mesh]
+                    changed = True
+
+        # Groups sharing a material share its shader inputs
+        modes = instancing.unify_modes([group[2] for group in groups.values()], [group[1] for group in groups.values()])
+        for group, mode in zip(groups.values(), modes):
+            group[2] = mode
+
+        saved_draws = 0
+        for mesh, (users, materials, mode, loc, rot, scale) in groups.items():
+            self.auto_instances[users[0]] = (mode, loc, rot, scale)
+            self.auto_instanced_skip.update(users[1:])
+            for user in users:
+                ArmoryExporter.instancing_modes[user] = mode
+            draws = (len(users) - 1) * len(materials)
+            saved_draws += draws
+            if wrd.arm_verbose_output:
+                print('Auto instancing {0}: {1} objects, {2}, {3} draw calls saved'.format(arm.utils.asset_name(mesh), len(users), mode, draws))
+        if len(groups) > 0:
+            print('Auto instancing: {0} meshes, {1} draw calls saved'.format(len(groups), saved_draws))
+
+    def collect_depsgraph_instances(self, scene_objects: List[bpy.types.Object]) -> List[bpy.types.Material]:
+        """Reads the instances of collection instancers and geometry node
+        modifiers from the depsgraph and groups them by instanced object,
+        each group is exported as one instanced mesh. Instancers are
+        converted only if all of their instances can be drawn this way.
+        Returns the created material variants."""
+        wrd = bpy.data.worlds['Arm']
+        if not wrd.arm_gpu_instancing or ArmoryExporter.option_mesh_only:
+            return []
+
+        instancers = {bobject for bobject in scene_objects if bobject.arm_export and bobject in self.bobject_array}
+        unsupported = set()
+        # instancer => instanced object => world matrices
+        instances: Dict[bpy.types.Object, Dict[bpy.types.Object, List]] = {}
+        for inst in self.depsgraph.object_instances:
+            if not inst.is_instance or inst.particle_system is not None:
+                continue
+            instancer = inst.instance_object.original
+            if instancer not in instancers or instancer in unsupported:
+                continue
+            source = inst.object.original
+            if source.type == 'EMPTY' and len(source.arm_traitlist) == 0:
+                continue
+            # Realized geometry instances have no object to export
+            if source.is_evaluated or source == instancer or not source.arm_export or not self.is_static_mesh(source):
+                unsupported.add(instancer)
+                continue
+            instances.setdefault(instancer, {}).setdefault(source, []).append(np.array(inst.matrix_world))
+
+        groups = []
+        for instancer, sources in instances.items():
+            if instancer in unsupported:
+                continue
+            instancer_groups = []
+            world_inv = np.linalg.inv(np.array(instancer.matrix_world))
+            for source, matrices in sources.items():
+                materials = tuple(self.slot_to_material(source, slot) for slot in source.material_slots)
+                if len(materials) == 0 or any(mat is None or mat.arm_decal for mat in materials):
+                    break
+                loc, rot, scale, error = instancing.decompose(world_inv @ np.array(matrices))
+                if error > 1e-4 * max(1.0, float(scale.max())):
+                    break
+                instancer_groups.append([instancer, source, materials, instancing.instancing_mode(rot, scale), loc, rot, scale])
+            else:
+                groups += instancer_groups
+                continue
+            if wrd.arm_verbose_output:
+                print('Instances of ' + instancer.name + ' are exported as objects')
+
+        # Instanced material variants, one per material
+        modes = instancing.unify_modes([group[3] for group in groups], [group[2] for group in groups])
+        matvars = []
+        variants = {}
+        for group, mode in zip(groups, modes):
+            instancer, source, materials, _, loc, rot, scale = group
+            for mat in materials:
+                if mat in variants:
+                    continue
+                mat_name = mat.name + '_arminst'
+                variant = bpy.data.materials.get(mat_name)
+                if variant is None:
+                    variant = mat.copy()
+                    variant.name = mat_name
+                    matvars.append(variant)
+                variant.arm_instanced_flag = mode
+                variants[mat] = variant
+            self.depsgraph_instances.setdefault(instancer, []).append((source, [variants[mat] for mat in materials], (mode, loc, rot, scale)))
+
+        if len(groups) > 0:
+            num_instances = sum(len(group[4]) for group in groups)
+            print('GPU instancing: {0} instances in {1} draws'.format(num_instances, len(groups)))
+        return matvars
+
+    def export_depsgraph_instances(self, bobject: bpy.types.Object, out_object):
+        """Adds an instanced mesh object per instanced object to the
+        children of the instancer."""
+        if 'children' not in out_object:
+            out_object['children'] = []
+        for source, variants, source_instances in self.depsgraph_instances[bobject]:
+            objname = arm.utils.asset_name(source.data) + '_' + arm.utils.asset_name(bobject)
+            key = (bobject, source)
+            self.mesh_array[key] = {"structName": objname, "objectTable": [source], "instances": source_instances}
+
+            out_child = {
+                'name': arm.utils.asset_name(bobject) + '_' + arm.utils.asset_name(source),
+                'type': 'mesh_object',
+                'data_ref': self.get_mesh_data_ref(arm.utils.safestr(objname)),
+                'material_refs': [],
+                'transform': {'values': [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]},
+                'traits': [],
+                'mobile': bobject.arm_mobile
+            }
+            for i, mat in enumerate(variants):
+                self.export_material_ref(source, mat, i, out_child)
+                if mat in self.material_to_object_dict:
+                    self.material_to_object_dict[mat].append(source)
+                else:
+                    self.material_to_object_dict[mat] = [source]
+
+            aabb = source.data.arm_aabb
+            if aabb[0] == 0 and aabb[1] == 0 and aabb[2] == 0:
+                self.calc_aabb(source)
+            source_instances = self.split_instance_cells(source, out_child, key, source_instances, aabb)
+            self.mesh_array[key]["instances"] = source_instances
+            out_child['dimensions'] = instancing.instance_dimensions(aabb, source_instances[1], source_instances[3])
+            out_object['children'].append(out_child)
+
+    def get_object_instances(self, bobject: bpy.types.Object) -> Optional[Tuple]:
+        """Returns the instanced type and instance transforms drawn by
+        the object, or `None` if it is not instanced."""
+        if bobject in self.auto_instances:
+            return self.auto_instances[bobject]
+        if bobject.arm_instanced == 'Off':
+            return None
+        # Instanced children, the object itself is the first instance
+        children = [child for child in bobject.children if child.arm_export and not child.hide_render]
+        loc = np.zeros((len(children) + 1, 3))
+        rot = np.zeros((len(children) + 1, 3))
+        scale = np.ones((len(children) + 1, 3))
+        for i, child in enumerate(children, 1):
+            loc[i] = child.matrix_local.to_translation() # Without parent matrix
+            rot[i] = child.matrix_local.to_euler()
+            scale[i] = child.matrix_local.to_scale()
+        return bobject.arm_instanced, loc, rot, scale
+
+    def split_instance_cells(self, bobject: bpy.types.Object, out_object, mesh_key, instances: Tuple, aabb) -> Tuple:
+        """Partitions instances into cells of arm_instance_cell_size, so
+        that cells are culled separately. Every cell but the one of the
+        first instance becomes a child object with its own copy of the
+        mesh. Returns the instances left to the object."""
+        wrd = bpy.data.worlds['Arm']
+        mode, loc, rot, scale = instances
+        if wrd.arm_instance_cell_size <= 0 or len(loc) < 2:
+            return instances
+        cells = instancing.partition(loc, wrd.arm_instance_cell_size)
+        if len(cells) == 1:
+            return instances
+
+        if 'children' not in out_object:
+            out_object['children'] = []
+        struct_name = self.mesh_array[mesh_key]["structName"]
+        for i, cell in enumerate(cells[1:], 1):
+            center = (loc[cell].min(axis=0) + loc[cell].max(axis=0)) / 2
+            cell_instances = (mode, loc[cell] - center, rot[cell], scale[cell])
+            objname = struct_name + '_cell' + str(i)
+            self.mesh_array[(mesh_key, i)] = {"structName": objname, "objectTable": [bobject], "instances": cell_instances}
+            out_object['children'].append({
+                'name': out_object['name'] + '_cell' + str(i),
+                'type': 'mesh_object',
+                'data_ref': self.get_mesh_data_ref(arm.utils.safestr(objname)),
+                'material_refs': list(out_object['material_refs']),
+                'transform': {'values': [1.0, 0.0, 0.0, center[0], 0.0, 1.0, 0.0, center[1], 0.0, 0.0, 1.0, center[2], 0.0, 0.0, 0.0, 1.0]},
+                'dimensions': instancing.instance_dimensions(aabb, cell_instances[1], cell_instances[3]),
+                'traits': [],
+                'mobile': bobject.arm_mobile
+            })
+
+        if wrd.arm_verbose_output:
+            print('Instances of {0} split into {1} cells'.format(out_object['name'], len(cells)))
+        return mode, loc[cells[0]], rot[cells[0]], scale[cells[0]]
+
+    def get_mesh_data_ref(self, oid: str, prefix='mesh_') -> str:
+        wrd = bpy.data.worlds['Arm']
+        if wrd.arm_single_data_file:
+            return oid
+        ext = '' if not ArmoryExporter.compress_enabled else '.lz4'
+        if ext == '' and not wrd.arm_minimize:
+            ext = '.json'
+        return prefix + oid + ext + '/' + oid
+
+    def collect_static_batches(self, scene_objects: List[bpy.types.Object]):
+        """Selects static objects whose meshes are merged by
+        export_static_batches(). Batched objects are exported as empties,
+        so that their names still resolve at runtime."""
+        wrd = bpy.data.worlds['Arm']
+        if not wrd.arm_static_batching or ArmoryExporter.option_mesh_only:
+            return
+
+        pinned = self.get_pinned_objects()
+        batched = []
+        for bobject in scene_objects:
+            bobject_ref = self.bobject_array.get(bobject)
+            if bobject_ref is None or bobject_ref["objectType"] is not NodeType.MESH:
+                continue
+            if not bobject.arm_static_batch or not self.is_static_scenery(bobject) or bobject in pinned:
+                continue
+            # Baked animation is stored in object space
+            if arm.utils.get_vertex_animation_armature(bobject) is not None:
+                continue
+            if bobject in self.auto_instances or bobject in self.auto_instanced_skip or bobject in self.depsgraph_instances:
+                continue
+            materials = [self.slot_to_material(bobject, slot) for slot in bobject.material_slots]
+            if len(materials) == 0 or any(mat is None or mat.arm_decal for mat in materials):
+                continue
+            batched.append(bobject)
+
+        if len(batched) < 2:
+            return
+        for bobject in batched:
+            self.bobject_array[bobject]["objectType"] = NodeType.EMPTY
+        self.static_batched = batched
+
+    def export_static_batches(self):
+        """Merges the meshes of the objects selected by
+        collect_static_batches() in world space. A batch is created per
+        material and spatial cell of arm_static_batch_cell_size, so that
+        batches are still culled."""
+        if len(self.static_batched) == 0:
+            return
+        wrd = bpy.data.worlds['Arm']
+
+        # Triangles grouped by material and vertex layout
+        groups = {}
+        for bobject in self.static_batched:
+            bobject_eval = bobject.evaluated_get(self.depsgraph)
+            export_mesh = bobject_eval.to_mesh()
+            out_mesh = {}
+            raw = self.export_mesh_data(export_mesh, bobject, out_mesh)
+            bobject_eval.to_mesh_clear()
+
+            world = np.array(bobject.matrix_world)
+            raw = static_batch.transform(raw, world)
+            flip = np.linalg.det(world[:3, :3]) < 0
+            for ia in out_mesh['index_arrays']:
+                mat = self.slot_to_material(bobject, bobject.material_slots[ia['material']])
+                groups.setdefault((mat, static_batch.layout(raw)), []).append((bobject, raw, ia['values'], flip))
+
+        self.output['static_batches'] = []
+        scene_name = arm.utils.safestr(self.scene.name)
+        for (mat, _), parts in groups.items():
+            if wrd.arm_static_batch_cell_size > 0:
+                centers = np.array([(raw['pos'][indices].min(axis=0) + raw['pos'][indices].max(axis=0)) / 2 for _, raw, indices, _ in parts])
+                cells = instancing.partition(centers, wrd.arm_static_batch_cell_size)
+            else:
+                cells = [np.arange(len(parts))]
+
+            for cell in cells:
+                cell_parts = [parts[i] for i in cell]
+                raw, indices = static_batch.merge([(raw, indices, flip) for _, raw, indices, flip in cell_parts])
+                if ArmoryExporter.has_morph_target(mat):
+                    raw['morph'] = np.zeros((len(raw['pos']), 2), dtype='<f4')
+                if ArmoryExporter.has_vertex_animation(mat):
+                    raw['vat'] = np.full((len(raw['pos']), 2), -1.0, dtype='<f4')
+                lo = raw['pos'].min(axis=0)
+                hi = raw['pos'].max(axis=0)
+                center = (lo + hi) / 2
+                raw['pos'] = np.array(raw['pos'] - center, dtype='<f4')
+                dims = [float(d) for d in hi - lo]
+
+                name = arm.utils.safestr(scene_name + '_' + arm.utils.asset_name(mat)) + '_batch' + str(len(self.output['static_batches']))
+                maxdim = max(dims)
+                out_mesh = {
+                    'name': name,
+                    'scale_pos': maxdim / 2 if maxdim > 2 else 1.0,
+                    'index_arrays': [{'values': indices, 'material': 0}]
+                }
+                self.add_static_batch_job(name, out_mesh, raw, ArmoryExporter.get_vertex_profile(mat))
+
+                out_object = {
+                    'name': name,
+                    'type': 'mesh_object',
+                    'data_ref': self.get_mesh_data_ref(name),
+                    'material_refs': [],
+                    'transform': {'values': [1.0, 0.0, 0.0, center[0], 0.0, 1.0, 0.0, center[1], 0.0, 0.0, 1.0, center[2], 0.0, 0.0, 0.0, 1.0]},
+                    'dimensions': dims,
+                    'traits': [],
+                    'mobile': False
+                }
+                self.export_material_ref(cell_parts[0][0], mat, 0, out_object)
+                self.output['objects'].append(out_object)
+
+                # Batched objects stay addressable by name
+                object_refs = list(dict.fromkeys(arm.utils.asset_name(part[0]) for part in cell_parts))
+                self.output['static_batches'].append({'name': name, 'object_refs': object_refs})
+
+        print('Static batching: {0} objects merged into {1} batches'.format(len(self.static_batched), len(self.output['static_batches'])))
+
+    def add_static_batch_job(self, name: str, out_mesh: Dict, raw: Dict, profile: Tuple[str, str, str, str]):
+        wrd = bpy.data.worlds['Arm']
+        if wrd.arm_single_data_file:
+            fp = None
+        else:
+            fp = self.get_meshes_file_path('mesh_' + name, compressed=ArmoryExporter.compress_enabled)
+            assets.add(fp)
+
+        digest = None
+        if self.mesh_cache is not None and fp is not None:
+            hasher = Hasher()
+            for attrib in sorted(raw.keys()):
+                if raw[attrib] is not None:
+                    hasher.update_value(attrib)
+                    hasher.update_array(raw[attrib])
+            hasher.update_array(out_mesh['index_arrays'][0]['values'])
+            hasher.update_value([out_mesh['scale_pos'], profile, ArmoryExporter.optimize_enabled, ArmoryExporter.compress_enabled, wrd.arm_minimize, self.get_narrow_indices(), self.get_compact_indices(), self.get_meshlet_threshold()])
+            digest = hasher.hexdigest()
+            if self.mesh_cache.is_cached(arm_file.output_path(fp, wrd.arm_minimize), digest):
+                return
+
+        self.mesh_jobs.append(([], digest, {
+            'mesh': out_mesh,
+            'raw': raw,
+            'filepath': fp,
+            'minimize': wrd.arm_minimize,
+            'optimize': ArmoryExporter.optimize_enabled,
+            'profile': profile,
+            'narrow_indices': self.get_narrow_indices(),
+            'compact_indices': self.get_compact_indices(),
+            'meshlets': self.get_meshlet_threshold()
+        }))
+
+    @classmethod
+    def get_instancing_mode(cls, bobject: bpy.types.Object) -> str:
+        """Returns the instanced type the object is drawn with."""
+        return cls.instancing_modes.get(bobject, bobject.arm_instanced)
+
+    @staticmethod
+    def get_variant_base(mat: bpy.types.Material) -> bpy.types.Material:
+        """Returns the material a variant was created from."""
+        if mat.name[-8:] in ('_armskin', '_armtile', '_armpart', '_arminst'):
+            return bpy.data.materials.get(mat.name[:-8], mat)
+        return mat
+
+    def collect_vertex_profiles(self, scene_objects: List[bpy.types.Object]):
+        """Resolves the quantization profile of each exported mesh. Meshes
+        sharing a material are exported with the same vertex formats,
+        using the most precise option of each attribute."""
+        meshes = {}
+        for bobject in scene_objects:
+            if bobject.type == 'MESH' and bobject in self.bobject_array:
+                meshes[bobject.data] = bobject
+        for sources in self.depsgraph_instances.values():
+            for source, _, _ in sources:
+                meshes[source.data] = source
+
+        profiles = []
+        materials = []
+        for mesh, bobject in meshes.items():
+            profiles.append((mesh.arm_quant_pos, mesh.arm_quant_nor, 'Short', 'Short'))
+            mats = [self.slot_to_material(bobject, slot) for slot in bobject.material_slots]
+            materials.append(tuple(self.get_variant_base(mat) for mat in mats if mat is not None))
+        profiles = quantize.unify_profiles(profiles, materials)
+
+        for mesh, mats, profile in zip(meshes, materials, profiles):
+            ArmoryExporter.vertex_profiles[mesh] = profile
+            for mat in mats:
+                ArmoryExporter.vertex_profiles[mat] = profile
+
+    def collect_morph_targets(self, scene_objects: List[bpy.types.Object]):
+        """Marks meshes whose shape keys are exported as morph targets.
+        Their materials read the morph attribute, so other meshes using
+        them are exported with an empty one."""
+        for bobject in scene_objects:
+            if bobject.type != 'MESH' or bobject not in self.bobject_array:
+                continue
+            if not bobject.data.arm_morph_target or ArmoryExporter.get_shape_keys(bobject.data) is None:
+                continue
+            ArmoryExporter.morph_targets.add(bobject.data)
+            for slot in bobject.material_slots:
+                mat = self.slot_to_material(bobject, slot)
+                if mat is not None:
+                    ArmoryExporter.morph_targets.add(self.get_variant_base(mat))
+        if len(ArmoryExporter.morph_targets) > 0:
+            assets.add_khafile_def('arm_morph_target')
+
+    @classmethod
+    def has_morph_target(cls, data: bpy.types.ID) -> bool:
+        """Returns whether a mesh or material uses the morph attribute."""
+        if isinstance(data, bpy.types.Material):
+            data = cls.get_variant_base(data)
+        return data in cls.morph_targets
+
+    def collect_vertex_animations(self, scene_objects: List[bpy.types.Object]):
+        """Marks meshes whose armature action is baked to a vertex
+        animation texture. Other meshes using their materials are exported
+        with an empty vat attribute."""
+        for bobject in scene_objects:
+            if bobject not in self.bobject_array or arm.utils.get_vertex_animation_armature(bobject) is None:
+                continue
+            ArmoryExporter.vertex_animations.add(bobject.data)
+            for slot in bobject.material_slots:
+                mat = self.slot_to_material(bobject, slot)
+                if mat is not None:
+                    ArmoryExporter.vertex_animations.add(self.get_variant_base(mat))
+        if len(ArmoryExporter.vertex_animations) > 0:
+            assets.add_khafile_def('arm_vertex_animation')
+
+    @classmethod
+    def has_vertex_animation(cls, data: bpy.types.ID) -> bool:
+        """Returns whether a mesh or material uses the vat attribute."""
+        if isinstance(data, bpy.types.Material):
+            data = cls.get_variant_base(data)
+        return data in cls.vertex_animations
+
+    @classmethod
+    def get_vertex_profile(cls, data: bpy.types.ID) -> Tuple[str, str, str, str]:
+        """Returns the (pos, nor, tex, col) quantization profile a mesh or
+        material is exported with."""
+        if isinstance(data, bpy.types.Material):
+            data = cls.get_variant_base(data)
+        return cls.vertex_profiles.get(data, quantize.DEFAULT_PROFILE)
+
     def export_bone_transform(self, armature: bpy.types.Object, bone: bpy.types.Bone, o, action: bpy.types.Action):
         pose_bone = armature.pose.bones.get(bone.name)
         # if pose_bone is not None:
@@ -404,13 +1006,11 @@ class ArmoryExporter:
         if fcurve_list and pose_bone:
             begin_frame, end_frame = int(action.frame_range[0]), int(action.frame_range[1])
 
-            out_track = {'target': "transform", 'frames': [], 'values': []}
+            # Values are sampled for all bones at once in write_bone_matrices()
+            out_track = {'target': "transform", 'frames': np.arange(end_frame - begin_frame + 1, dtype='<i4'), 'values': None}
             o['anim'] = {'tracks': [out_track]}
 
-            for i in range(begin_frame, end_frame + 1):
-                out_track['frames'].append(i - begin_frame)
-
-            self.bone_tracks.append((out_track['values'], pose_bone))
+            self.bone_tracks.append((out_track, pose_bone))
 
     def use_default_material(self, bobject: bpy.types.Object, o):
         if arm.utils.export_bone_data(bobject):
@@ -489,15 +1089,30 @@ class ArmoryExporter:
         # profile_time = time.time()
         begin_frame, end_frame = int(action.frame_range[0]), int(action.frame_range[1])
         if len(self.bone_tracks) > 0:
-            for i in range(begin_frame, end_frame + 1):
-                scene.frame_set(i)
-                for track in self.bone_tracks:
-                    values, pose_bone = track[0], track[1]
-                    parent = pose_bone.parent
-                    if parent:
-                        values += ArmoryExporter.write_matrix((parent.matrix.inverted_safe() @ pose_bone.matrix))
-                    else:
-                        values += ArmoryExporter.write_matrix(pose_bone.matrix)
+            pose_bones = self.bone_tracks[0][1].id_data.pose.bones
+            num_bones = len(pose_bones)
+            num_frames = end_frame - begin_frame + 1
+
+            # Armature space matrices of all bones, fetched once per frame
+            matrices = np.empty((num_frames, num_bones * 16), dtype='<f4')
+            for i in range(num_frames):
+                scene.frame_set(begin_frame + i)
+                pose_bones.foreach_get('matrix', matrices[i])
+            # Column-major to row-major
+            matrices = matrices.reshape(num_frames, num_bones, 4, 4).transpose(0, 1, 3, 2)
+
+            bone_index = {pose_bone.name: i for i, pose_bone in enumerate(pose_bones)}
+            parents = [bone_index[b.parent.name] if b.parent else -1 for b in pose_bones]
+            relative, singular = anim_sample.relative_bone_matrices(matrices, parents)
+            for frame, bone in zip(*np.nonzero(singular)):
+                parent = Matrix(matrices[frame, parents[bone]].tolist())
+                relative[frame, bone] = np.array(parent.inverted_safe() @ Matrix(matrices[frame, bone].tolist()))
+
+            for out_track, pose_bone in self.bone_tracks:
+                out_track['values'] = np.array(relative[:, bone_index[pose_bone.name]].reshape(-1), dtype='<f4')
+
+            wrd = bpy.data.worlds['Arm']
+            anim_compress.compress_bone_tracks([track for track, _ in self.bone_tracks], wrd.arm_anim_tolerance, wrd.arm_anim_compact)
         # print('Bone matrices exported in ' + str(time.time() - profile_time))
 
     @staticmethod
@@ -671,7 +1286,7 @@ class ArmoryExporter:
         meshes), and transform.
         Subobjects are then exported recursively.
         """
-        if not bobject.arm_export:
+        if not bobject.arm_export or bobject in self.auto_instanced_skip:
             return
 
         bobject_ref = self.bobject_array.get(bobject)
@@ -707,7 +1322,7 @@ class ArmoryExporter:
 
             out_object['mobile'] = bobject.arm_mobile
 
-            if bobject.instance_type == 'COLLECTION' and bobject.instance_collection is not None:
+            if bobject.instance_type == 'COLLECTION' and bobject.instance_collection is not None and bobject not in self.depsgraph_instances:
                 out_object['group_ref'] = bobject.instance_collection.name
 
             if bobject.arm_tilesheet != '':
@@ -748,15 +1363,7 @@ class ArmoryExporter:
                     self.mesh_array[objref]["objectTable"].append(bobject)
 
                 oid = arm.utils.safestr(self.mesh_array[objref]["structName"])
-
-                wrd = bpy.data.worlds['Arm']
-                if wrd.arm_single_data_file:
-                    out_object['data_ref'] = oid
-                else:
-                    ext = '' if not ArmoryExporter.compress_enabled else '.lz4'
-                    if ext == '' and not bpy.data.worlds['Arm'].arm_minimize:
-                        ext = '.json'
-                    out_object['data_ref'] = 'mesh_' + oid + ext + '/' + oid
+                out_object['data_ref'] = self.get_mesh_data_ref(oid)
 
                 out_object['material_refs'] = []
                 for i in range(len(bobject.material_slots)):
@@ -781,6 +1388,13 @@ class ArmoryExporter:
                     self.calc_aabb(bobject)
                 out_object['dimensions'] = [aabb[0], aabb[1], aabb[2]]
 
+                # Instanced rendering, bounds cover all instances
+                instances = self.get_object_instances(bobject)
+                if instances is not None and "instances" not in self.mesh_array[objref]:
+                    instances = self.split_instance_cells(bobject, out_object, objref, instances, aabb)
+                    self.mesh_array[objref]["instances"] = instances
+                    out_object['dimensions'] = instancing.instance_dimensions(aabb, instances[1], instances[3])
+
                 # shapeKeys = ArmoryExporter.get_shape_keys(objref)
                 # if shapeKeys:
                 #     self.ExportMorphWeights(bobject, shapeKeys, scene, out_object)
@@ -925,6 +1539,7 @@ class ArmoryExporter:
                     fp = self.get_meshes_file_path('action_' + armatureid + '_' + aname, compressed=ArmoryExporter.compress_enabled)
                     assets.add(fp)
                     if not bdata.arm_cached or not os.path.exists(fp):
+                        profile_event = profiler.begin('Action ' + armatureid + '_' + aname, 'action')
                         # Handle autobake
                         if bdata.arm_autobake:
                             sel = bpy.context.selected_objects[:]
@@ -954,6 +1569,7 @@ class ArmoryExporter:
                         # Save action separately
                         action_obj = {'name': aname, 'objects': bones}
                         arm.utils.write_arm(fp, action_obj)
+                        profiler.end(profile_event)
 
                 # Restore settings
                 skelobj.animation_data.action = orig_action
@@ -974,103 +1590,152 @@ class ArmoryExporter:
 
             self.post_export_object(bobject, out_object, object_type)
 
-            if not hasattr(out_object, 'children') and len(bobject.children) > 0:
+            if 'children' not in out_object and len(bobject.children) > 0:
                 out_object['children'] = []
 
+            if bobject in self.depsgraph_instances:
+                self.export_depsgraph_instances(bobject, out_object)
+
         if bobject.arm_instanced == 'Off':
             for subbobject in bobject.children:
                 self.export_object(subbobject, scene, out_object)
 
-    def export_skin(self, bobject: bpy.types.Object, armature, export_mesh: bpy.types.Mesh, out_mesh):
-        """This function exports all skinning data, which includes the
-        skeleton and per-vertex bone influence data"""
-        oskin = {}
-        out_mesh['skin'] = oskin
+    @staticmethod
+    def get_skeleton_bones(armature: bpy.types.Object) -> Dict[str, int]:
+        """Returns the name -> index table of the skinned bones of the
+        armature, bones above the maximum bone count are left out unless
+        meshes are split into bone palettes."""
+        rpdat = arm.utils.get_rp()
+        bones = armature.data.bones
+        if not rpdat.arm_skin_palettes:
+            bones = bones[:rpdat.arm_skin_max_bones]
+        return {bone.name: i for i, bone in enumerate(bones)}
 
-        # Write the skin bind pose transform
-        otrans = {'values': ArmoryExporter.write_matrix(bobject.matrix_world)}
-        oskin['transform'] = otrans
+    @staticmethod
+    def get_bone_palette_size(armature: Optional[bpy.types.Object]) -> Optional[int]:
+        """Bones per palette of meshes skinned to the armature, None
+        when its bones fit the skinning uniforms."""
+        rpdat = arm.utils.get_rp()
+        if armature is None or not rpdat.arm_skin_palettes:
+            return None
+        if len(armature.data.bones) <= rpdat.arm_skin_max_bones:
+            return None
+        return rpdat.arm_skin_max_bones
 
+    @staticmethod
+    def use_shared_skeletons() -> bool:
+        """Bind data is written once per armature and referenced by
+        skin.skeleton_ref instead of being written into each skin."""
+        return arm.utils.get_rp().arm_skin_shared_skeletons
+
+    def get_skeleton(self, bobject: bpy.types.Object, armature: bpy.types.Object) -> Dict:
+        """Returns the bind data of the armature for meshes bound with
+        the transform of bobject."""
+        oskel = {}
         bone_array = armature.data.bones
-        bone_count = len(bone_array)
-        rpdat = arm.utils.get_rp()
-        max_bones = rpdat.arm_skin_max_bones
-        if bone_count > max_bones:
-            bone_count = max_bones
+        bone_count = len(self.get_skeleton_bones(armature))
 
         # Write the bone object reference array
-        oskin['bone_ref_array'] = np.empty(bone_count, dtype=object)
-        oskin['bone_len_array'] = np.empty(bone_count, dtype='<f4')
+        oskel['bone_ref_array'] = np.empty(bone_count, dtype=object)
+        oskel['bone_len_array'] = np.empty(bone_count, dtype='<f4')
 
         for i in range(bone_count):
             bone_ref = self.find_bone(bone_array[i].name)
             if bone_ref:
-                oskin['bone_ref_array'][i] = bone_ref[1]["structName"]
-                oskin['bone_len_array'][i] = bone_array[i].length
+                oskel['bone_ref_array'][i] = bone_ref[1]["structName"]
+                oskel['bone_len_array'][i] = bone_array[i].length
             else:
-                oskin['bone_ref_array'][i] = ""
-                oskin['bone_len_array'][i] = 0.0
+                oskel['bone_ref_array'][i] = ""
+                oskel['bone_len_array'][i] = 0.0
 
         # Write the bind pose transform array
-        oskin['transformsI'] = []
+        oskel['transformsI'] = []
         for i in range(bone_count):
             skeleton_inv = (armature.matrix_world @ bone_array[i].matrix_local).inverted_safe()
             skeleton_inv = (skeleton_inv @ bobject.matrix_world)
-            oskin['transformsI'].append(ArmoryExporter.write_matrix(skeleton_inv))
+            oskel['transformsI'].append(ArmoryExporter.write_matrix(skeleton_inv))
+        return oskel
+
+    def get_skeleton_ref(self, bobject: bpy.types.Object, armature: bpy.types.Object) -> str:
+        """Exports the bind data of the armature once for all meshes
+        bound with the same transform and returns its reference."""
+        bind = tuple(tuple(row) for row in bobject.matrix_world)
+        skeleton_ref = self.skeletons.get((armature, bind))
+        if skeleton_ref is not None:
+            return skeleton_ref
+
+        count = sum(1 for key in self.skeletons if key[0] == armature)
+        sid = arm.utils.safestr(armature.name) + ('' if count == 0 else '_' + str(count))
+        oskel = {'name': sid}
+        oskel.update(self.get_skeleton(bobject, armature))
 
-        # Export the per-vertex bone influence data
-        group_remap = []
-        for group in bobject.vertex_groups:
-            for i in range(bone_count):
-                if bone_array[i].name == group.name:
-                    group_remap.append(i)
-                    break
-            else:
-                group_remap.append(-1)
-
-        bone_count_array = np.empty(len(export_mesh.loops), dtype='<i2')
-        bone_index_array = np.empty(len(export_mesh.loops) * 4, dtype='<i2')
-        bone_weight_array = np.empty(len(export_mesh.loops) * 4, dtype='<f4')
-
-        vertices = bobject.data.vertices
-        count = 0
-        for index, l in enumerate(export_mesh.loops):
-            bone_count = 0
-            total_weight = 0.0
-            bone_values = []
-            for g in vertices[l.vertex_index].groups:
-                bone_index = group_remap[g.group]
-                bone_weight = g.weight
-                if bone_index >= 0:  #and bone_weight != 0.0:
-                    bone_values.append((bone_weight, bone_index))
-                    total_weight += bone_weight
-                    bone_count += 1
-
-            if bone_count > 4:
-                bone_count = 4
-                bone_values.sort(reverse=True)
-                bone_values = bone_values[:4]
-
-            bone_count_array[index] = bone_count
-            for bv in bone_values:
-                bone_weight_array[count] = bv[0]
-                bone_index_array[count] = bv[1]
-                count += 1
-
-            if total_weight != 0.0 and total_weight != 1.0:
-                normalizer = 1.0 / total_weight
-                for i in range(bone_count):
-                    bone_weight_array[count - i - 1] *= normalizer
-
-        bone_index_array = bone_index_array[:count]
-        bone_weight_array = bone_weight_array[:count]
-        bone_weight_array *= 32767
-        bone_weight_array = np.array(bone_weight_array, dtype='<i2')
+        wrd = bpy.data.worlds['Arm']
+        if wrd.arm_single_data_file:
+            if 'skeleton_datas' not in self.output:
+                self.output['skeleton_datas'] = []
+            self.output['skeleton_datas'].append(oskel)
+        else:
+            fp = self.get_meshes_file_path('skeleton_' + sid, compressed=ArmoryExporter.compress_enabled)
+            assets.add(fp)
+            arm.utils.write_arm(fp, {'skeleton_datas': [oskel]})
+
+        skeleton_ref = self.get_mesh_data_ref(sid, prefix='skeleton_')
+        self.skeletons[(armature, bind)] = skeleton_ref
+        return skeleton_ref
+
+    @staticmethod
+    def get_vertex_groups(mesh: bpy.types.Mesh) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the vertex group count of each vertex together with the
+        flat group indices and weights. Vertex groups can not be read for
+        all vertices at once, the memberships of each vertex are read in
+        bulk into its range of the flat arrays."""
+        vertices = mesh.vertices
+        counts = np.fromiter((len(v.groups) for v in vertices), dtype=np.int64, count=len(vertices))
+        offsets = np.cumsum(counts) - counts
+        groups = np.empty(int(counts.sum()), dtype=np.int32)
+        weights = np.empty(int(counts.sum()), dtype=np.float32)
+        for i in np.flatnonzero(counts).tolist():
+            start = offsets[i]
+            end = start + counts[i]
+            vertex_groups = vertices[i].groups
+            vertex_groups.foreach_get('group', groups[start:end])
+            vertex_groups.foreach_get('weight', weights[start:end])
+        return counts, groups.astype(np.int64), weights.astype(np.float64)
+
+    def export_skin_weights(self, bobject: bpy.types.Object, armature, vertex_map, oskin):
+        """Writes the bone influences of the exported vertices, vertex_map
+        holds the index of the mesh vertex each one was created from."""
+        bones = self.get_skeleton_bones(armature)
+        group_remap = [bones.get(group.name, -1) for group in bobject.vertex_groups]
+        counts, groups, weights = self.get_vertex_groups(bobject.data)
+        influences = skinning.influences(counts, groups, weights, group_remap)
+        bone_count_array, bone_index_array, bone_weight_array = skinning.gather(*influences, vertex_map)
 
         oskin['bone_count_array'] = bone_count_array
         oskin['bone_index_array'] = bone_index_array
         oskin['bone_weight_array'] = bone_weight_array
 
+    def export_skin(self, bobject: bpy.types.Object, armature, export_mesh: bpy.types.Mesh, out_mesh):
+        """This function exports all skinning data, which includes the
+        skeleton reference and per-vertex bone influence data"""
+        oskin = {}
+        out_mesh['skin'] = oskin
+
+        if self.use_shared_skeletons():
+            # Bind data is shared by all meshes of the armature
+            oskin['skeleton_ref'] = self.get_skeleton_ref(bobject, armature)
+        else:
+            oskin.update(self.get_skeleton(bobject, armature))
+
+        # Write the skin bind pose transform
+        otrans = {'values': ArmoryExporter.write_matrix(bobject.matrix_world)}
+        oskin['transform'] = otrans
+
+        # Export the per-vertex bone influence data
+        loop_vertices = np.empty(len(export_mesh.loops), dtype='<i4')
+        export_mesh.loops.foreach_get('vertex_index', loop_vertices)
+        self.export_skin_weights(bobject, armature, loop_vertices, oskin)
+
         # Bone constraints
         if not armature.data.arm_autobake:
             for bone in armature.pose.bones:
@@ -1079,15 +1744,137 @@ class ArmoryExporter:
                         oskin['constraints'] = []
                     self.add_constraints(bone, oskin, bone=True)
 
-    def write_mesh(self, bobject: bpy.types.Object, fp, out_mesh):
-        if bpy.data.worlds['Arm'].arm_single_data_file:
-            self.output['mesh_datas'].append(out_mesh)
+    @staticmethod
+    def create_encode_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+        ctx = multiprocessing.get_context('spawn')
+        # Blender before 2.91 reports its own binary as sys.executable
+        if hasattr(bpy.app, 'binary_path_python'):
+            ctx.set_executable(bpy.app.binary_path_python)
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
 
-        # One mesh data per file
-        else:
-            mesh_obj = {'mesh_datas': [out_mesh]}
-            arm.utils.write_arm(fp, mesh_obj)
-            bobject.data.arm_cached = True
+    @staticmethod
+    def get_encode_workers() -> int:
+        wrd = bpy.data.worlds['Arm']
+        return wrd.arm_export_workers or os.cpu_count() or 1
+
+    def write_scene(self):
+        workers = self.get_encode_workers()
+        if self.filepath.endswith('.lz4') and workers > 1:
+            try:
+                with self.create_encode_pool(workers) as pool:
+                    arm.utils.write_arm(self.filepath, self.output, executor=pool)
+                return
+            except (OSError, concurrent.futures.BrokenExecutor) as e:
+                log.warn('Compression workers failed (' + str(e) + '), compressing on main thread')
+        arm.utils.write_arm(self.filepath, self.output, indexed=arm.utils.use_indexed_data())
+
+    def encode_meshes(self):
+        """Encodes and writes the meshes collected by export_mesh(),
+        in parallel worker processes when there is more than one."""
+        wrd = bpy.data.worlds['Arm']
+        jobs = [job for _, _, job in self.mesh_jobs]
+        workers = min(self.get_encode_workers(), len(jobs))
+        results = None
+        if workers > 1:
+            try:
+                with self.create_encode_pool(workers) as pool:
+                    results = list(pool.map(mesh_encode.encode_job, jobs))
+            except (OSError, concurrent.futures.BrokenExecutor) as e:
+                log.warn('Mesh encoding workers failed (' + str(e) + '), encoding on main thread')
+        if results is None:
+            results = [mesh_encode.encode_job(job) for job in jobs]
+
+        # Join in export order
+        max_errors = {}
+        for (users, digest, job), (out_mesh, filepath, stats) in zip(self.mesh_jobs, results):
+            if out_mesh is not None:
+                self.output['mesh_datas'].append(out_mesh)
+            else:
+                if len(users) > 0:
+                    users[0].data.arm_cached = True
+                profiler.record_asset(filepath)
+            if job.get('lod') is not None:
+                self.export_auto_lods(users, stats['lod_errors'])
+            self.export_material_slots(users, stats['material_slots'])
+            if digest is not None:
+                self.mesh_cache.store(filepath, digest, {'lod_errors': stats['lod_errors'], 'material_slots': stats['material_slots']})
+            acmr = stats['acmr']
+            if acmr is not None and wrd.arm_verbose_output:
+                print('Mesh {0} ACMR: {1:.3f} -> {2:.3f}'.format(job['mesh']['name'], acmr[0], acmr[1]))
+            for attrib, error in stats['quant_errors'].items():
+                max_errors[attrib] = max(max_errors.get(attrib, 0.0), error)
+            if wrd.arm_verbose_output:
+                print('Mesh {0} quantization error: {1}'.format(job['mesh']['name'], self.format_quant_errors(stats['quant_errors'])))
+        if len(max_errors) > 0:
+            print('Max quantization error: ' + self.format_quant_errors(max_errors))
+        self.mesh_jobs = []
+
+    @staticmethod
+    def format_quant_errors(errors: Dict[str, float]) -> str:
+        """Positions and texture coordinates in units, directions in
+        degrees."""
+        out = []
+        for attrib in ('pos', 'nor', 'tang', 'tex', 'tex1', 'col'):
+            if attrib in errors:
+                unit = ' deg' if attrib in ('nor', 'tang') else ''
+                out.append('{0} {1:.3g}{2}'.format(attrib, errors[attrib], unit))
+        return ', '.join(out)
+
+    @staticmethod
+    def get_narrow_indices() -> bool:
+        """Index arrays are stored as 16-bit values in binary mesh files
+        when all vertices are addressable."""
+        wrd = bpy.data.worlds['Arm']
+        return wrd.arm_narrow_indices and (wrd.arm_minimize or ArmoryExporter.compress_enabled)
+
+    @staticmethod
+    def get_compact_indices() -> bool:
+        """Index arrays are varint encoded in binary mesh files."""
+        wrd = bpy.data.worlds['Arm']
+        return wrd.arm_compact_indices and (wrd.arm_minimize or ArmoryExporter.compress_enabled)
+
+    @staticmethod
+    def get_meshlet_threshold() -> Optional[int]:
+        """Triangle count from which index arrays are split into
+        meshlets, `None` if meshlets are disabled."""
+        wrd = bpy.data.worlds['Arm']
+        return wrd.arm_meshlet_threshold if wrd.arm_meshlets else None
+
+    @staticmethod
+    def get_auto_lod_settings(bobject: bpy.types.Object) -> Optional[Dict]:
+        """LOD levels generated while encoding the mesh, LODs set up
+        by hand take precedence. Skinned meshes keep their full detail."""
+        mesh = bobject.data
+        if not getattr(mesh, 'arm_lod_auto', False) or len(mesh.arm_lodlist) > 0 or arm.utils.export_bone_data(bobject):
+            return None
+        wrd = bpy.data.worlds['Arm']
+        return {'levels': wrd.arm_lod_gen_levels, 'ratio': wrd.arm_lod_gen_ratio}
+
+    def export_auto_lods(self, users: List[bpy.types.Object], lod_errors: List[float]):
+        """Stores the screen sizes at which the users of a mesh switch
+        to its generated LOD levels, where the simplification error
+        becomes visible. Read by armory.renderpath.AutoLod."""
+        if len(users) == 0 or len(lod_errors) == 0:
+            return
+        wrd = bpy.data.worlds['Arm']
+        size = max(users[0].data.arm_aabb)
+        screen_sizes = simplify.screen_sizes(lod_errors, size, wrd.arm_lod_gen_pixel_error)
+        for user in users:
+            out_object = self.object_to_arm_object_dict.get(user)
+            if out_object is not None:
+                out_object['auto_lods'] = [float(s) for s in screen_sizes]
+        assets.add_khafile_def('arm_auto_lod')
+
+    def export_material_slots(self, users: List[bpy.types.Object], material_slots: Optional[List[int]]):
+        """Gives the users of a mesh split into bone palettes the
+        material of the original slot for each slot of the split."""
+        if material_slots is None:
+            return
+        for user in users:
+            out_object = self.object_to_arm_object_dict.get(user)
+            if out_object is not None and len(out_object['material_refs']) > 0:
+                refs = out_object['material_refs']
+                out_object['material_refs'] = [refs[min(slot, len(refs) - 1)] for slot in material_slots]
 
     @staticmethod
     def calc_aabb(bobject):
@@ -1099,6 +1886,8 @@ class ArmoryExporter:
         ]
 
     def export_mesh_data(self, exportMesh, bobject: bpy.types.Object, o, has_armature=False):
+        """Extracts one vertex per loop and the index arrays into o,
+        returns the raw buffers for arm.lib.mesh_encode."""
         exportMesh.calc_normals_split()
         exportMesh.calc_loop_triangles()
 
@@ -1112,11 +1901,19 @@ class ArmoryExporter:
         has_col = self.get_export_vcols(bobject.data) and num_colors > 0
         has_tang = self.has_tangents(bobject.data)
 
-        pdata = np.empty(num_verts * 4, dtype='<f4') # p.xyz, n.z
-        ndata = np.empty(num_verts * 2, dtype='<f4') # n.xy
+        # Fetch loop data in bulk, avoids per-element Python access
+        vertex_indices = np.empty(num_verts, dtype='<i4')
+        loops.foreach_get('vertex_index', vertex_indices)
+        co = np.empty(len(exportMesh.vertices) * 3, dtype='<f4')
+        exportMesh.vertices.foreach_get('co', co)
+        co = co.reshape(-1, 3)[vertex_indices]
+        normals = np.empty(num_verts * 3, dtype='<f4')
+        loops.foreach_get('normal', normals)
+        normals = normals.reshape(-1, 3)
+
+        raw = {'pos': co, 'nor': normals, 'tex': None, 'tex1': None, 'col': None, 'tang': None}
         if has_tex:
             t0map = 0 # Get active uvmap
-            t0data = np.empty(num_verts * 2, dtype='<f4')
             uv_layers = exportMesh.uv_layers
             if uv_layers is not None:
                 if 'UVMap_baked' in uv_layers:
@@ -1129,34 +1926,24 @@ class ArmoryExporter:
                         if uv_layers[i].active_render:
                             t0map = i
                             break
+            lay0 = uv_layers[t0map]
+            t0data = np.empty(num_verts * 2, dtype='<f4')
+            lay0.data.foreach_get('uv', t0data)
+            raw['tex'] = t0data.reshape(-1, 2)
             if has_tex1:
                 t1map = 1 if t0map == 0 else 0
                 t1data = np.empty(num_verts * 2, dtype='<f4')
-            # Scale for packed coords
-            maxdim = 1.0
-            lay0 = uv_layers[t0map]
-            for v in lay0.data:
-                if abs(v.uv[0]) > maxdim:
-                    maxdim = abs(v.uv[0])
-                if abs(v.uv[1]) > maxdim:
-                    maxdim = abs(v.uv[1])
-            if has_tex1:
-                lay1 = uv_layers[t1map]
-                for v in lay1.data:
-                    if abs(v.uv[0]) > maxdim:
-                        maxdim = abs(v.uv[0])
-                    if abs(v.uv[1]) > maxdim:
-                        maxdim = abs(v.uv[1])
-            if maxdim > 1:
-                o['scale_tex'] = maxdim
-                invscale_tex = (1 / o['scale_tex']) * 32767
-            else:
-                invscale_tex = 1 * 32767
+                uv_layers[t1map].data.foreach_get('uv', t1data)
+                raw['tex1'] = t1data.reshape(-1, 2)
             if has_tang:
                 exportMesh.calc_tangents(uvmap=lay0.name)
                 tangdata = np.empty(num_verts * 3, dtype='<f4')
+                loops.foreach_get('tangent', tangdata)
+                raw['tang'] = tangdata.reshape(-1, 3)
         if has_col:
-            cdata = np.empty(num_verts * 3, dtype='<f4')
+            vcol0 = np.empty(num_verts * 4, dtype='<f4')
+            exportMesh.vertex_colors[0].data.foreach_get('color', vcol0)
+            raw['col'] = np.ascontiguousarray(vcol0.reshape(-1, 4)[:, :3])
 
         # Scale for packed coords
         maxdim = max(bobject.data.arm_aabb[0], max(bobject.data.arm_aabb[1], bobject.data.arm_aabb[2]))
@@ -1167,82 +1954,24 @@ class ArmoryExporter:
         if has_armature: # Allow up to 2x bigger bounds for skinned mesh
             o['scale_pos'] *= 2.0
 
-        scale_pos = o['scale_pos']
-        invscale_pos = (1 / scale_pos) * 32767
-
-        verts = exportMesh.vertices
-        if has_tex:
-            lay0 = exportMesh.uv_layers[t0map]
-            if has_tex1:
-                lay1 = exportMesh.uv_layers[t1map]
-        if has_col:
-            vcol0 = exportMesh.vertex_colors[0].data
-
-        for i, loop in enumerate(loops):
-            v = verts[loop.vertex_index]
-            co = v.co
-            normal = loop.normal
-            tang = loop.tangent
-
-            i4 = i * 4
-            i2 = i * 2
-            pdata[i4    ] = co[0]
-            pdata[i4 + 1] = co[1]
-            pdata[i4 + 2] = co[2]
-            pdata[i4 + 3] = normal[2] * scale_pos # Cancel scale
-            ndata[i2    ] = normal[0]
-            ndata[i2 + 1] = normal[1]
-            if has_tex:
-                uv = lay0.data[loop.index].uv
-                t0data[i2    ] = uv[0]
-                t0data[i2 + 1] = 1.0 - uv[1] # Reverse Y
-                if has_tex1:
-                    uv = lay1.data[loop.index].uv
-                    t1data[i2    ] = uv[0]
-                    t1data[i2 + 1] = 1.0 - uv[1]
-                if has_tang:
-                    i3 = i * 3
-                    tangdata[i3    ] = tang[0]
-                    tangdata[i3 + 1] = tang[1]
-                    tangdata[i3 + 2] = tang[2]
-            if has_col:
-                col = vcol0[loop.index].color
-                i3 = i * 3
-                cdata[i3    ] = col[0]
-                cdata[i3 + 1] = col[1]
-                cdata[i3 + 2] = col[2]
-
+        # Triangle loops grouped by material, in polygon order
         mats = exportMesh.materials
-        poly_map = []
-        for i in range(max(len(mats), 1)):
-            poly_map.append([])
-        for poly in exportMesh.polygons:
-            poly_map[poly.material_index].append(poly)
+        num_tris = len(exportMesh.loop_triangles)
+        tri_loops = np.empty(num_tris * 3, dtype='<i4')
+        exportMesh.loop_triangles.foreach_get('loops', tri_loops)
+        tri_loops = tri_loops.reshape(-1, 3)
+        tri_polys = np.empty(num_tris, dtype='<i4')
+        exportMesh.loop_triangles.foreach_get('polygon_index', tri_polys)
+        poly_mats = np.empty(len(exportMesh.polygons), dtype='<i4')
+        exportMesh.polygons.foreach_get('material_index', poly_mats)
+        tri_mats = np.minimum(poly_mats[tri_polys], max(len(mats), 1) - 1)
 
         o['index_arrays'] = []
 
-        # map polygon indices to triangle loops
-        tri_loops = {}
-        for loop in exportMesh.loop_triangles:
-            if loop.polygon_index not in tri_loops:
-                tri_loops[loop.polygon_index] = []
-            tri_loops[loop.polygon_index].append(loop)
-
-        for index, polys in enumerate(poly_map):
-            tris = 0
-            for poly in polys:
-                tris += poly.loop_total - 2
-            if tris == 0: # No face assigned
+        for index in range(max(len(mats), 1)):
+            prim = tri_loops[tri_mats == index].reshape(-1)
+            if len(prim) == 0: # No face assigned
                 continue
-            prim = np.empty(tris * 3, dtype='<i4')
-
-            i = 0
-            for poly in polys:
-                for loop in tri_loops[poly.index]:
-                    prim[i    ] = loops[loop.loops[0]].index
-                    prim[i + 1] = loops[loop.loops[1]].index
-                    prim[i + 2] = loops[loop.loops[2]].index
-                    i += 3
 
             ia = {}
             ia['values'] = prim
@@ -1254,37 +1983,6 @@ class ArmoryExporter:
                         break
             o['index_arrays'].append(ia)
 
-        # Pack
-        pdata *= invscale_pos
-        ndata *= 32767
-        pdata = np.array(pdata, dtype='<i2')
-        ndata = np.array(ndata, dtype='<i2')
-        if has_tex:
-            t0data *= invscale_tex
-            t0data = np.array(t0data, dtype='<i2')
-            if has_tex1:
-                t1data *= invscale_tex
-                t1data = np.array(t1data, dtype='<i2')
-        if has_col:
-            cdata *= 32767
-            cdata = np.array(cdata, dtype='<i2')
-        if has_tang:
-            tangdata *= 32767
-            tangdata = np.array(tangdata, dtype='<i2')
-
-        # Output
-        o['vertex_arrays'] = []
-        o['vertex_arrays'].append({ 'attrib': 'pos', 'values': pdata, 'data': 'short4norm' })
-        o['vertex_arrays'].append({ 'attrib': 'nor', 'values': ndata, 'data': 'short2norm' })
-        if has_tex:
-            o['vertex_arrays'].append({ 'attrib': 'tex', 'values': t0data, 'data': 'short2norm' })
-            if has_tex1:
-                o['vertex_arrays'].append({ 'attrib': 'tex1', 'values': t1data, 'data': 'short2norm' })
-        if has_col:
-            o['vertex_arrays'].append({ 'attrib': 'col', 'values': cdata, 'data': 'short4norm', 'padding': 1 })
-        if has_tang:
-            o['vertex_arrays'].append({ 'attrib': 'tang', 'values': tangdata, 'data': 'short4norm', 'padding': 1 })
-
         # If there are multiple morph targets, export them here.
         # if (shapeKeys):
         #     shapeKeys.key_blocks[0].value = 0.0
@@ -1331,9 +2029,246 @@ class ArmoryExporter:
 
         #         bpy.data.meshes.remove(morphMesh)
 
+        return raw
+
     def has_tangents(self, exportMesh):
         return self.get_export_uvs(exportMesh) and self.get_export_tangents(exportMesh) and len(exportMesh.uv_layers) > 0
 
+    @staticmethod
+    def restore_morph_state(bobject: bpy.types.Object, mesh, shape_keys, active_shape_key_index, show_only_shape_key, current_morph_value):
+        if shape_keys:
+            bobject.active_shape_key_index = active_shape_key_index
+            bobject.show_only_shape_key = show_only_shape_key
+
+            for m in range(len(current_morph_value)):
+                shape_keys.key_blocks[m].value = current_morph_value[m]
+
+            mesh.update()
+
+    def export_morph_targets(self, mesh: bpy.types.Mesh, export_mesh: bpy.types.Mesh, out_mesh, morph_values: List[float]) -> np.ndarray:
+        """Writes the shape keys of the mesh as sparse morph targets and
+        returns the (start, count) delta range of each vertex. morph_values
+        holds the values of the key blocks before they were reset for
+        export."""
+        shape_keys = mesh.shape_keys
+        num_verts = len(export_mesh.vertices)
+        ranges = np.zeros((num_verts, 2), dtype='<f4')
+        if not shape_keys.use_relative:
+            log.warn(mesh.name + ' - absolute shape keys are not exported as morph targets')
+            return ranges
+        if len(mesh.vertices) != num_verts:
+            log.warn(mesh.name + ' - modifiers change the vertex count, shape keys are not exported as morph targets')
+            return ranges
+
+        blocks = [block for block in shape_keys.key_blocks if block != shape_keys.reference_key]
+        if len(blocks) > morph.max_keys:
+            log.warn(mesh.name + ' - ' + str(len(blocks)) + ' shape keys found, only the first ' + str(morph.max_keys) + ' are exported')
+            blocks = blocks[:morph.max_keys]
+
+        shapes = {}
+
+        def get_shape(block):
+            if block.name not in shapes:
+                co = np.empty(num_verts * 3, dtype='<f4')
+                block.data.foreach_get('co', co)
+                nor = np.array(block.normals_vertex_get(), dtype='<f4')
+                shapes[block.name] = (co.reshape(-1, 3), nor.reshape(-1, 3))
+            return shapes[block.name]
+
+        key_pos, key_nor = zip(*[get_shape(block) for block in blocks])
+        base_pos, base_nor = zip(*[get_shape(block.relative_key) for block in blocks])
+        deltas = morph.sparse_deltas(np.stack(base_pos), np.stack(base_nor), np.stack(key_pos), np.stack(key_nor))
+        ranges, texture = morph.pack(num_verts, *deltas)
+
+        key_blocks = list(shape_keys.key_blocks)
+        out_morph = {
+            'names': [block.name for block in blocks],
+            'weights': np.array([morph_values[key_blocks.index(block)] for block in blocks], dtype='<f4'),
+            'deltas': texture['values'],
+            'width': texture['width'],
+            'height': texture['height']
+        }
+        action = ArmoryExporter.export_morph_action(shape_keys, blocks)
+        if action is not None:
+            out_morph['action'] = action
+        out_mesh['morph_target'] = out_morph
+        return ranges
+
+    @staticmethod
+    def export_morph_action(shape_keys: bpy.types.Key, blocks: List[bpy.types.ShapeKey]) -> Optional[Dict]:
+        """Samples a weight track for each of the key blocks animated by
+        the action of the shape keys."""
+        anim = shape_keys.animation_data
+        if anim is None or anim.action is None:
+            return None
+        action = anim.action
+        frame_range = (int(action.frame_range[0]), int(action.frame_range[1]))
+        tracks = []
+        for block in blocks:
+            fcurve = action.fcurves.find('key_blocks["' + block.name + '"].value')
+            if fcurve is not None:
+                tracks.append(ArmoryExporter.export_animation_track(fcurve, frame_range, block.name))
+        return {'name': arm.utils.safestr(action.name), 'tracks': tracks}
+
+    def export_vertex_animation(self, bobject: bpy.types.Object, armature: bpy.types.Object, out_mesh) -> Optional[np.ndarray]:
+        """Bakes the deformation of the object by the action of its armature
+        to a vertex animation texture. Returns the texel of each mesh
+        vertex, `None` if the animation can not be baked."""
+        action = armature.animation_data.action
+        begin_frame, end_frame = int(action.frame_range[0]), int(action.frame_range[1])
+        num_frames = end_frame - begin_frame + 1
+        num_verts = len(bobject.data.vertices)
+        width, rows = vat.layout(num_verts)
+        if num_frames * rows > vat.max_height:
+            log.warn('{0} - {1} frames of {2} vertices exceed the vertex animation texture size, skinning is not baked'.format(bobject.name, num_frames, num_verts))
+            return None
+
+        pos = np.empty((num_frames, num_verts, 3), dtype='<f4')
+        nor = np.empty((num_frames, num_verts, 3), dtype='<f4')
+        current_frame, current_subframe = self.scene.frame_current, self.scene.frame_subframe
+        try:
+            for i in range(num_frames):
+                self.scene.frame_set(begin_frame + i)
+                bobject_eval = bobject.evaluated_get(self.depsgraph)
+                deformed = bobject_eval.to_mesh()
+                valid = len(deformed.vertices) == num_verts
+                if valid:
+                    deformed.vertices.foreach_get('co', pos[i].reshape(-1))
+                    deformed.vertices.foreach_get('normal', nor[i].reshape(-1))
+                bobject_eval.to_mesh_clear()
+                if not valid:
+                    log.warn(bobject.name + ' - modifiers change the vertex count, skinning is not baked')
+                    return None
+        finally:
+            self.scene.frame_set(current_frame, subframe=current_subframe)
+
+        texture, error = vat.pack(pos, nor, out_mesh['scale_pos'])
+        texture['name'] = arm.utils.safestr(action.name)
+        out_mesh['vertex_animation'] = texture
+        if bpy.data.worlds['Arm'].arm_verbose_output:
+            print('Vertex animation {0}: {1} frames, {2}x{3} texels, max error {4:.6f}'.format(bobject.name, num_frames, width, num_frames * rows, error))
+        return vat.coords(num_verts)
+
+    def get_mesh_export_settings(self, bobject: bpy.types.Object, armature, table) -> List:
+        """Collects everything besides the evaluated mesh buffers that
+        affects the exported mesh file."""
+        wrd = bpy.data.worlds['Arm']
+        settings = [
+            ArmoryExporter.optimize_enabled,
+            ArmoryExporter.compress_enabled,
+            wrd.arm_minimize,
+            self.get_narrow_indices(),
+            self.get_compact_indices(),
+            self.get_meshlet_threshold(),
+            bobject.data.arm_dynamic_usage,
+            ArmoryExporter.get_auto_lod_settings(bobject),
+            ArmoryExporter.get_vertex_profile(bobject.data),
+            [tuple(v) for v in bobject.bound_box],
+            self.has_baked_material(bobject, bobject.data.materials)
+        ]
+        for mat in bobject.data.materials:
+            if mat is None:
+                settings.append(None)
+            else:
+                settings.append((mat.name, mat.export_uvs, mat.export_vcols, mat.export_tangents, ArmoryExporter.has_morph_target(mat), ArmoryExporter.has_vertex_animation(mat)))
+
+        # Instanced children
+        for user in table:
+            settings.append(user.arm_instanced)
+            if user.arm_instanced != 'Off':
+                for child in user.children:
+                    settings.append((child.arm_export, child.hide_render, [tuple(row) for row in child.matrix_local]))
+
+        # Skin
+        if armature is not None:
+            settings.append(arm.utils.get_rp().arm_skin_max_bones)
+            settings.append(ArmoryExporter.get_bone_palette_size(armature))
+            if self.use_shared_skeletons():
+                settings.append(self.get_skeleton_ref(bobject, armature))
+            else:
+                skeleton = self.get_skeleton(bobject, armature)
+                settings.append((skeleton['bone_ref_array'].tolist(), skeleton['bone_len_array'].tolist(), skeleton['transformsI']))
+            settings.append([tuple(row) for row in armature.matrix_world])
+            settings.append([tuple(row) for row in bobject.matrix_world])
+            for bone in armature.data.bones:
+                bone_ref = self.find_bone(bone.name)
+                settings.append((bone.name, bone.length, [tuple(row) for row in bone.matrix_local], bone_ref[1]["structName"] if bone_ref else ''))
+            settings.append([group.name for group in bobject.vertex_groups])
+            if not armature.data.arm_autobake:
+                constraints = {'constraints': []}
+                for bone in armature.pose.bones:
+                    self.add_constraints(bone, constraints, bone=True)
+                settings.append(constraints)
+
+        return settings
+
+    def get_mesh_digest(self, bobject: bpy.types.Object, export_mesh: bpy.types.Mesh, armature, table, instances=None, morph_values=None) -> str:
+        """Hashes the evaluated mesh buffers together with the export
+        settings of the mesh. morph_values holds the shape key values
+        before they were reset for export."""
+        hasher = Hasher()
+
+        def update_buffer(collection, attr, size, dtype='<f4'):
+            ar = np.empty(size, dtype=dtype)
+            collection.foreach_get(attr, ar)
+            hasher.update_array(ar)
+
+        export_mesh.calc_normals_split()
+        loops = export_mesh.loops
+        num_loops = len(loops)
+        update_buffer(export_mesh.vertices, 'co', len(export_mesh.vertices) * 3)
+        update_buffer(loops, 'vertex_index', num_loops, '<i4')
+        update_buffer(loops, 'normal', num_loops * 3)
+        update_buffer(export_mesh.polygons, 'loop_start', len(export_mesh.polygons), '<i4')
+        update_buffer(export_mesh.polygons, 'loop_total', len(export_mesh.polygons), '<i4')
+        update_buffer(export_mesh.polygons, 'material_index', len(export_mesh.polygons), '<i4')
+        for layer in export_mesh.uv_layers:
+            hasher.update_value((layer.name, layer.active_render))
+            update_buffer(layer.data, 'uv', num_loops * 2)
+        for layer in export_mesh.vertex_colors:
+            update_buffer(layer.data, 'color', num_loops * 4)
+
+        # Morph targets
+        if ArmoryExporter.has_morph_target(bobject.data):
+            shape_keys = bobject.data.shape_keys
+            hasher.update_value((shape_keys.use_relative, morph_values))
+            for block in shape_keys.key_blocks:
+                hasher.update_value((block.name, block.relative_key.name))
+                update_buffer(block.data, 'co', len(block.data) * 3)
+            action = ArmoryExporter.export_morph_action(shape_keys, shape_keys.key_blocks)
+            if action is not None:
+                hasher.update_value(action['name'])
+                for track in action['tracks']:
+                    hasher.update_value(track['target'])
+                    hasher.update_array(track['frames'])
+                    hasher.update_array(track['values'])
+
+        # Bone weights
+        vat_armature = arm.utils.get_vertex_animation_armature(bobject) if ArmoryExporter.has_vertex_animation(bobject.data) else None
+        if armature is not None or vat_armature is not None:
+            for ar in self.get_vertex_groups(bobject.data):
+                hasher.update_array(ar)
+
+        # Baked vertex animation
+        if vat_armature is not None:
+            action = vat_armature.animation_data.action
+            render = self.scene.render
+            hasher.update_value((action.name, tuple(action.frame_range), render.fps, render.fps_base))
+            hasher.update_value(([tuple(row) for row in vat_armature.matrix_world], [tuple(row) for row in bobject.matrix_world]))
+            for bone in vat_armature.data.bones:
+                hasher.update_value((bone.name, [tuple(row) for row in bone.matrix_local]))
+            for fcurve in action.fcurves:
+                hasher.update_value((fcurve.data_path, fcurve.array_index))
+                update_buffer(fcurve.keyframe_points, 'co', len(fcurve.keyframe_points) * 2)
+
+        hasher.update_value(self.get_mesh_export_settings(bobject, armature, table))
+        if instances is not None:
+            mode, loc, rot, scale = instances
+            hasher.update_value(mode)
+            for ar in (loc, rot, scale):
+                hasher.update_array(ar)
+        return hasher.hexdigest()
+
     def export_mesh(self, object_ref):
         """Exports a single mesh object."""
         # profile_time = time.time()
@@ -1347,9 +2282,6 @@ class ArmoryExporter:
         else:
             fp = self.get_meshes_file_path('mesh_' + oid, compressed=ArmoryExporter.compress_enabled)
             assets.add(fp)
-            # No export necessary
-            if bobject.data.arm_cached and os.path.exists(fp):
-                return
 
         # Mesh users have different modifier stack
         for i in range(1, len(table)):
@@ -1357,11 +2289,8 @@ class ArmoryExporter:
                 log.warn('{0} users {1} and {2} differ in modifier stack - use Make Single User - Object & Data for now'.format(oid, bobject.name, table[i].name))
                 break
 
-        if wrd.arm_verbose_output:
-            print('Exporting mesh ' + arm.utils.asset_name(bobject.data))
-
         out_mesh = {'name': oid}
-        mesh = object_ref[0]
+        mesh = bobject.data
         struct_flag = False
 
         # Save the morph state if necessary
@@ -1415,6 +2344,11 @@ class ArmoryExporter:
         armature = bobject.find_armature()
         apply_modifiers = not armature
 
+        # Baked vertex animation replaces skinning, the rest pose is exported
+        vat_armature = arm.utils.get_vertex_animation_armature(bobject) if ArmoryExporter.has_vertex_animation(mesh) else None
+        if vat_armature is not None:
+            armature = None
+
         bobject_eval = bobject.evaluated_get(self.depsgraph) if apply_modifiers else bobject
         export_mesh = bobject_eval.to_mesh()
 
@@ -1428,39 +2362,76 @@ class ArmoryExporter:
         # Update aabb
         self.calc_aabb(bobject)
 
-        # Process meshes
+        # No export necessary, inputs did not change since the file was written
+        digest = None
+        if self.mesh_cache is not None and fp is not None:
+            digest = self.get_mesh_digest(bobject, export_mesh, armature, table, object_ref[1].get("instances"), current_morph_value)
+            cached_fp = arm_file.output_path(fp, wrd.arm_minimize)
+            if self.mesh_cache.is_cached(cached_fp, digest):
+                meta = self.mesh_cache.get_meta(cached_fp)
+                if self.get_auto_lod_settings(bobject) is not None:
+                    self.export_auto_lods(table, meta['lod_errors'])
+                self.export_material_slots(table, meta['material_slots'])
+                self.restore_morph_state(bobject, mesh, shape_keys, active_shape_key_index, show_only_shape_key, current_morph_value)
+                bobject_eval.to_mesh_clear()
+                return
+
+        if wrd.arm_verbose_output:
+            print('Exporting mesh ' + arm.utils.asset_name(bobject.data))
+
+        # Process meshes, encoding is deferred to encode_meshes()
         if ArmoryExporter.optimize_enabled:
-            vert_list = exporter_opt.export_mesh_data(self, export_mesh, bobject, out_mesh, has_armature=armature is not None)
+            raw, vert_indices = exporter_opt.export_mesh_data(self, export_mesh, bobject, out_mesh, has_armature=armature is not None or vat_armature is not None)
             if armature:
-                exporter_opt.export_skin(self, bobject, armature, vert_list, out_mesh)
+                exporter_opt.export_skin(self, bobject, armature, vert_indices, out_mesh)
         else:
-            self.export_mesh_data(export_mesh, bobject, out_mesh, has_armature=armature is not None)
+            raw = self.export_mesh_data(export_mesh, bobject, out_mesh, has_armature=armature is not None or vat_armature is not None)
             if armature:
                 self.export_skin(bobject, armature, export_mesh, out_mesh)
 
-        # Restore the morph state
-        if shape_keys:
-            bobject.active_shape_key_index = active_shape_key_index
-            bobject.show_only_shape_key = show_only_shape_key
+        if not ArmoryExporter.optimize_enabled and (ArmoryExporter.has_morph_target(mesh) or vat_armature is not None):
+            vert_indices = np.empty(len(export_mesh.loops), dtype='<i4')
+            export_mesh.loops.foreach_get('vertex_index', vert_indices)
 
-            for m in range(len(current_morph_value)):
-                shape_keys.key_blocks[m].value = current_morph_value[m]
+        # Morph targets, deltas are stored once per mesh vertex
+        if ArmoryExporter.has_morph_target(mesh):
+            ranges = self.export_morph_targets(mesh, export_mesh, out_mesh, current_morph_value)
+            raw['morph'] = ranges[np.asarray(vert_indices, dtype=np.int64)]
+        elif any(ArmoryExporter.has_morph_target(mat) for mat in mesh.materials if mat is not None):
+            raw['morph'] = np.zeros((len(raw['pos']), 2), dtype='<f4')
 
-            mesh.update()
+        self.restore_morph_state(bobject, mesh, shape_keys, active_shape_key_index, show_only_shape_key, current_morph_value)
 
-        # Check if mesh is using instanced rendering
-        instanced_type, instanced_data = self.object_process_instancing(table, out_mesh['scale_pos'])
+        # Vertex animation, baked once per mesh vertex
+        texels = self.export_vertex_animation(bobject, vat_armature, out_mesh) if vat_armature is not None else None
+        if texels is not None:
+            raw['vat'] = texels[np.asarray(vert_indices, dtype=np.int64)]
+        elif any(ArmoryExporter.has_vertex_animation(mat) for mat in mesh.materials if mat is not None):
+            raw['vat'] = np.full((len(raw['pos']), 2), -1.0, dtype='<f4')
 
         # Save offset data for instanced rendering
-        if instanced_type > 0:
-            out_mesh['instanced_data'] = instanced_data
-            out_mesh['instanced_type'] = instanced_type
+        if "instances" in object_ref[1]:
+            mode, loc, rot, scale = object_ref[1]["instances"]
+            out_mesh['instanced_data'] = instancing.instanced_data(mode, loc, rot, scale, out_mesh['scale_pos'])
+            out_mesh['instanced_type'] = instancing.INSTANCED_TYPES[mode]
 
         # Export usage
         if bobject.data.arm_dynamic_usage:
             out_mesh['dynamic_usage'] = bobject.data.arm_dynamic_usage
 
-        self.write_mesh(bobject, fp, out_mesh)
+        self.mesh_jobs.append((table, digest, {
+            'mesh': out_mesh,
+            'raw': raw,
+            'filepath': fp,
+            'minimize': wrd.arm_minimize,
+            'optimize': ArmoryExporter.optimize_enabled,
+            'lod': self.get_auto_lod_settings(bobject),
+            'profile': ArmoryExporter.get_vertex_profile(bobject.data),
+            'narrow_indices': self.get_narrow_indices(),
+            'compact_indices': self.get_compact_indices(),
+            'meshlets': self.get_meshlet_threshold(),
+            'bone_palette': ArmoryExporter.get_bone_palette_size(armature)
+        }))
         # print('Mesh exported in ' + str(time.time() - profile_time))
 
         if hasattr(bobject, 'evaluated_get'):
@@ -1548,7 +2519,7 @@ class ArmoryExporter:
 
             # Add unparented objects only, then instantiate full object
             # child tree
-            if bobject.parent is None and bobject.arm_export:
+            if bobject.parent is None and bobject.arm_export and bobject not in self.auto_instanced_skip:
 
                 # This object is controlled by proxy
                 has_proxy_user = False
@@ -1775,6 +2746,18 @@ class ArmoryExporter:
 
             # Recache material
             signature = self.get_signature(material)
+            if signature is not None and material in self.material_to_object_dict:
+                # Auto instancing adds vertex inputs
+                modes = {ArmoryExporter.instancing_modes.get(bo) for bo in self.material_to_object_dict[material]}
+                modes.add(material.arm_instanced_flag)
+                modes.discard(None)
+                modes.discard('Off')
+                if len(modes) > 0:
+                    signature += '_inst' + ''.join(sorted(modes))
+            # Quantized vertex formats
+            profile = ArmoryExporter.get_vertex_profile(material)
+            if signature is not None and profile != quantize.DEFAULT_PROFILE:
+                signature += '_quant' + ''.join(profile)
             if signature != material.signature:
                 material.arm_cached = False
             if signature is not None:
@@ -1798,7 +2781,8 @@ class ArmoryExporter:
 
             mat_users = self.material_to_object_dict
             mat_armusers = self.material_to_arm_object_dict
-            sd, rpasses = make_material.parse(material, o, mat_users, mat_armusers)
+            with profiler.span('Material ' + o['name'], 'material'):
+                sd, rpasses = make_material.parse(material, o, mat_users, mat_armusers)
 
             # Attach MovieTexture
             for con in o['contexts']:
@@ -1988,7 +2972,14 @@ class ArmoryExporter:
 
         self.output['mesh_datas'] = []
         for mesh_ref in self.mesh_array.items():
-            self.export_mesh(mesh_ref)
+            with profiler.span('Mesh ' + mesh_ref[1]['structName'], 'mesh'):
+                self.export_mesh(mesh_ref)
+        with profiler.span('Encode meshes', 'mesh') as args:
+            args['count'] = len(self.mesh_jobs)
+            self.encode_meshes()
+
+        if self.mesh_cache is not None:
+            self.mesh_cache.save()
 
     def execute(self):
         """Exports the scene."""
@@ -2016,6 +3007,11 @@ class ArmoryExporter:
                         ArmoryExporter.optimize_enabled = True
 
         self.process_skinned_meshes()
+        self.collect_auto_instances(scene_objects)
+
+        wrd = bpy.data.worlds['Arm']
+        if wrd.arm_cache_build and not wrd.arm_single_data_file:
+            self.mesh_cache = BuildCache(self.get_meshes_path() + '.arm_cache.json')
 
         self.output['name'] = arm.utils.safestr(self.scene.name)
         if self.filepath.endswith('.lz4'):
@@ -2025,11 +3021,19 @@ class ArmoryExporter:
 
         # Create unique material variants for skinning, tilesheets and particles
         matvars, matslots = self.create_material_variants(self.scene)
+        matvars += self.collect_depsgraph_instances(scene_objects)
+        self.collect_static_batches(scene_objects)
+        self.collect_vertex_profiles(scene_objects)
+        self.collect_morph_targets(scene_objects)
+        self.collect_vertex_animations(scene_objects)
 
         # Auto-bones
         wrd = bpy.data.worlds['Arm']
         rpdat = arm.utils.get_rp()
-        if rpdat.arm_skin_max_bones_auto:
+        if rpdat.arm_skin_palettes:
+            # Palettes hold at least the bones of a single triangle
+            rpdat.arm_skin_max_bones = max(rpdat.arm_skin_max_bones, skinning.min_palette_size)
+        elif rpdat.arm_skin_max_bones_auto:
             max_bones = 8
             for armature in bpy.data.armatures:
                 if max_bones < len(armature.bones):
@@ -2070,11 +3074,14 @@ class ArmoryExporter:
 
         # Export objects
         self.output['objects'] = []
-        for bobject in scene_objects:
-            # Skip objects that have a parent because children are
-            # exported recursively
-            if not bobject.parent:
-                self.export_object(bobject, self.scene)
+        with profiler.span('Objects'):
+            for bobject in scene_objects:
+                # Skip objects that have a parent because children are
+                # exported recursively
+                if not bobject.parent:
+                    self.export_object(bobject, self.scene)
+        with profiler.span('Static batches'):
+            self.export_static_batches()
 
         # Export collections
         if bpy.data.collections:
@@ -2104,7 +3111,8 @@ class ArmoryExporter:
             if len(self.default_part_material_objects) > 0:
                 self.make_default_mat('armdefaultpart', self.default_part_material_objects, is_particle=True)
 
-            self.export_materials()
+            with profiler.span('Materials'):
+                self.export_materials()
             self.export_particle_systems()
             self.output['world_datas'] = []
             self.export_worlds()
@@ -2124,7 +3132,8 @@ class ArmoryExporter:
             else:
                 self.output['gravity'] = [0.0, 0.0, 0.0]
 
-        self.export_objects(self.scene)
+        with profiler.span('Object data'):
+            self.export_objects(self.scene)
 
         # Create Viewport camera
         if bpy.data.worlds['Arm'].arm_play_camera != 'Scene':
@@ -2149,8 +3158,8 @@ class ArmoryExporter:
             for file in assets.embedded_data:
                 self.output['embedded_datas'].append(file)
 
-        # Write scene file
-        arm.utils.write_arm(self.filepath, self.output)
+        # Write scene file, blocks of a compressed scene are encoded in parallel
+        self.write_scene()
 
         # Remove created material variants
         for slot in matslots: # Set back to original material
@@ -2167,6 +3176,9 @@ class ArmoryExporter:
         if self.scene.frame_current != current_frame:
             self.scene.frame_set(current_frame, subframe=current_subframe)
 
+        if self.mesh_cache is not None:
+            print('Mesh cache: {0} hits, {1} misses'.format(self.mesh_cache.hits, self.mesh_cache.misses))
+
         print('Scene exported in ' + str(time.time() - profile_time))
 
     def create_default_camera(self, is_viewport_camera=False):
@@ -2236,59 +3248,6 @@ class ArmoryExporter:
                 return True
         return False
 
-    @staticmethod
-    def object_process_instancing(refs, scale_pos):
-        instanced_type = 0
-        instanced_data = None
-        for bobject in refs:
-            inst = bobject.arm_instanced
-            if inst != 'Off':
-                if inst == 'Loc':
-                    instanced_type = 1
-                    instanced_data = [0.0, 0.0, 0.0] # Include parent
-                elif inst == 'Loc + Rot':
-                    instanced_type = 2
-                    instanced_data = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-                elif inst == 'Loc + Scale':
-                    instanced_type = 3
-                    instanced_data = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
-                elif inst == 'Loc + Rot + Scale':
-                    instanced_type = 4
-                    instanced_data = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
-
-                for child in bobject.children:
-                    if not child.arm_export or child.hide_render:
-                        continue
-                    if 'Loc' in inst:
-                        loc = child.matrix_local.to_translation() # Without parent matrix
-                        instanced_data.append(loc.x / scale_pos)
-                        instanced_data.append(loc.y / scale_pos)
-                        instanced_data.append(loc.z / scale_pos)
-                    if 'Rot' in inst:
-                        rot = child.matrix_local.to_euler()
-                        instanced_data.append(rot.x)
-                        instanced_data.append(rot.y)
-                        instanced_data.append(rot.z)
-                    if 'Scale' in inst:
-                        scale = child.matrix_local.to_scale()
-                        instanced_data.append(scale.x)
-                        instanced_data.append(scale.y)
-                        instanced_data.append(scale.z)
-                break
-
-            # Instance render collections with same children?
-            # elif bobject.instance_type == 'GROUP' and bobject.instance_collection is not None:
-            #     instanced_type = 1
-            #     instanced_data = []
-            #     for child in bpy.data.collections[bobject.instance_collection].objects:
-            #         loc = child.matrix_local.to_translation()
-            #         instanced_data.append(loc.x)
-            #         instanced_data.append(loc.y)
-            #         instanced_data.append(loc.z)
-            #     break
-
-        return instanced_type, instanced_data
-
     def post_export_object(self, bobject: bpy.types.Object, o, type):
         # Export traits
         self.export_traits(bobject, o)
@@ -0,0 +1,147 @@
+# Keyframe reduction and compact track encoding for exported actions
+# All tracks of an action share one key set, the runtime steps through
+# frames of the first track and indexes the others with it
+import numpy as np
+
+# Bone track encoding, decoded by armory.data.AnimationDecoder
+ENCODING_TRS16 = 'trs16'
+
+def reduce_keys(values, tolerance):
+    """Returns indices of the keys to keep so that linear interpolation
+    between them reproduces values (frames, channels) within tolerance.
+    First and last keys are always kept."""
+    values = np.asarray(values, dtype=np.float64)
+    num_frames = len(values)
+    if num_frames <= 2 or tolerance <= 0.0:
+        return np.arange(num_frames)
+    values = values.reshape(num_frames, -1)
+    keep = np.zeros(num_frames, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, num_frames - 1)]
+    while len(stack) > 0:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        t = (np.arange(a + 1, b) - a) / (b - a)
+        interp = values[a] + t[:, None] * (values[b] - values[a])
+        error = np.abs(values[a + 1:b] - interp).max(axis=1)
+        i = int(np.argmax(error))
+        if error[i] > tolerance:
+            split = a + 1 + i
+            keep[split] = True
+            stack.append((a, split))
+            stack.append((split, b))
+    return np.nonzero(keep)[0]
+
+def decompose_matrices(matrices):
+    """Splits row-major (n, 4, 4) matrices into translation, rotation
+    quaternion (x, y, z, w) and scale."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    loc = matrices[:, :3, 3]
+    basis = matrices[:, :3, :3]
+    scale = np.linalg.norm(basis, axis=1) # Column lengths
+    flip = np.linalg.det(basis) < 0
+    scale[flip, 0] *= -1.0
+    rot = basis / np.where(scale == 0.0, 1.0, scale)[:, None, :]
+
+    r = rot
+    trace = r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2]
+    case = np.argmax(np.stack((trace, r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]), axis=1), axis=1)
+    quat = np.empty((len(r), 4))
+    for c, (i, j, k) in enumerate(((None, None, None), (0, 1, 2), (1, 2, 0), (2, 0, 1))):
+        m = case == c
+        if not m.any():
+            continue
+        rm = r[m]
+        if c == 0:
+            s = np.sqrt(np.maximum(1.0 + trace[m], 1e-12)) * 2.0
+            quat[m, 3] = 0.25 * s
+            quat[m, 0] = (rm[:, 2, 1] - rm[:, 1, 2]) / s
+            quat[m, 1] = (rm[:, 0, 2] - rm[:, 2, 0]) / s
+            quat[m, 2] = (rm[:, 1, 0] - rm[:, 0, 1]) / s
+        else:
+            s = np.sqrt(np.maximum(1.0 + rm[:, i, i] - rm[:, j, j] - rm[:, k, k], 1e-12)) * 2.0
+            quat[m, 3] = (rm[:, k, j] - rm[:, j, k]) / s
+            quat[m, i] = 0.25 * s
+            quat[m, j] = (rm[:, j, i] + rm[:, i, j]) / s
+            quat[m, k] = (rm[:, k, i] + rm[:, i, k]) / s
+    quat /= np.linalg.norm(quat, axis=1)[:, None]
+    return loc, quat, scale
+
+def compose_matrices(loc, quat, scale):
+    """Inverse of decompose_matrices(), T * R * S."""
+    x, y, z, w = quat[:, 0], quat[:, 1], quat[:, 2], quat[:, 3]
+    out = np.zeros((len(loc), 4, 4))
+    out[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    out[:, 0, 1] = 2.0 * (x * y - w * z)
+    out[:, 0, 2] = 2.0 * (x * z + w * y)
+    out[:, 1, 0] = 2.0 * (x * y + w * z)
+    out[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    out[:, 1, 2] = 2.0 * (y * z - w * x)
+    out[:, 2, 0] = 2.0 * (x * z - w * y)
+    out[:, 2, 1] = 2.0 * (y * z + w * x)
+    out[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    out[:, :3, :3] *= scale[:, None, :]
+    out[:, :3, 3] = loc
+    out[:, 3, 3] = 1.0
+    return out
+
+def make_continuous(quat):
+    # Keep consecutive quaternions in the same hemisphere for interpolation
+    dots = np.einsum('ij,ij->i', quat[1:], quat[:-1])
+    signs = np.concatenate(([1.0], np.cumprod(np.where(dots < 0.0, -1.0, 1.0))))
+    return quat * signs[:, None]
+
+def quantize_range(values):
+    """Quantizes (n, channels) values to int16 around the per-channel
+    center, returns the values, center and extent."""
+    lo = values.min(axis=0)
+    hi = values.max(axis=0)
+    center = (lo + hi) * 0.5
+    extent = (hi - lo) * 0.5
+    q = np.round((values - center) / np.where(extent > 0.0, extent, 1.0) * 32767)
+    return np.array(q.reshape(-1), dtype='<i2'), np.array(center, dtype='<f4'), np.array(extent, dtype='<f4')
+
+def reduce_object_tracks(tracks, tolerance):
+    """Drops keys of scalar tracks sharing the same frames."""
+    if len(tracks) == 0 or tolerance <= 0.0:
+        return
+    values = np.stack([np.asarray(track['values'], dtype=np.float64) for track in tracks], axis=1)
+    keep = reduce_keys(values, tolerance)
+    for track in tracks:
+        track['frames'] = np.array(np.asarray(track['frames'])[keep], dtype='<i4')
+        track['values'] = np.array(np.asarray(track['values'])[keep], dtype='<f4')
+
+def compress_bone_tracks(tracks, tolerance, compact):
+    """Reduces keys of the matrix tracks of one action, then encodes
+    each track as quantized translation, rotation and scale streams when
+    compact is set. Tracks with shear keep their matrices."""
+    if len(tracks) == 0 or (tolerance <= 0.0 and not compact):
+        return
+    channels = []
+    decomposed = []
+    for track in tracks:
+        matrices = np.asarray(track['values'], dtype=np.float64).reshape(-1, 4, 4)
+        loc, quat, scale = decompose_matrices(matrices)
+        quat = make_continuous(quat)
+        error = np.abs(compose_matrices(loc, quat, scale) - matrices).max(initial=0.0)
+        if error > 1e-4 * max(1.0, np.abs(matrices).max(initial=0.0)):
+            decomposed.append(None)
+            channels.append(matrices.reshape(len(matrices), -1))
+        else:
+            decomposed.append((loc, quat, scale))
+            channels.append(np.concatenate((loc, quat, scale), axis=1))
+
+    keep = reduce_keys(np.concatenate(channels, axis=1), tolerance)
+    frames = np.array(np.asarray(tracks[0]['frames'])[keep], dtype='<i4')
+    for track, parts in zip(tracks, decomposed):
+        track['frames'] = frames
+        if not compact or parts is None:
+            track['values'] = np.array(np.asarray(track['values']).reshape(-1, 16)[keep].reshape(-1), dtype='<f4')
+            continue
+        loc, quat, scale = (p[keep] for p in parts)
+        track['encoding'] = ENCODING_TRS16
+        track['translation'], track['translation_center'], track['translation_extent'] = quantize_range(loc)
+        track['rotation'] = np.array(np.round(quat.reshape(-1) * 32767), dtype='<i2')
+        track['scale'], track['scale_center'], track['scale_extent'] = quantize_range(scale)
+        del track['values']
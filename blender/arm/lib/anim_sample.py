@@ -0,0 +1,116 @@
+# Batched animation sampling, evaluates whole frame ranges at once
+# Keyframe evaluation follows Blender's fcurve_eval_keyframes() for
+# constant, linear and bezier interpolation
+import numpy as np
+
+# Keyframe.interpolation enum values
+IPO_CONSTANT = 0
+IPO_LINEAR = 1
+IPO_BEZIER = 2
+
+def _correct_bezier_handles(p1, h1, h2, p2):
+    # Handles can not exceed the adjacent keyframe time, prevents looping
+    h1 = h1.copy()
+    h2 = h2.copy()
+    span = p2[:, 0] - p1[:, 0]
+    for p, h in ((p1, h1), (p2, h2)):
+        d = p - h
+        length = np.abs(d[:, 0])
+        over = length > span
+        fac = np.divide(span, length, out=np.ones_like(span), where=over)
+        h[over] = p[over] - fac[over, None] * d[over]
+    return h1, h2
+
+def _eval_bezier(p1, h1, h2, p2, x):
+    """Finds curve parameter t for each x by bisection, the handles are
+    corrected so x(t) is monotonic."""
+    h1, h2 = _correct_bezier_handles(p1, h1, h2, p2)
+    lo = np.zeros(len(x))
+    hi = np.ones(len(x))
+    def bezier(t, c):
+        s = 1.0 - t
+        return s * s * s * p1[:, c] + 3.0 * s * s * t * h1[:, c] + 3.0 * s * t * t * h2[:, c] + t * t * t * p2[:, c]
+    for _ in range(32):
+        t = (lo + hi) * 0.5
+        below = bezier(t, 0) < x
+        lo = np.where(below, t, lo)
+        hi = np.where(below, hi, t)
+    return bezier((lo + hi) * 0.5, 1)
+
+def eval_keyframes(co, handle_left, handle_right, ipo, extrapolate_linear, frames):
+    """Evaluates a keyframed curve at all frames. co and handles are
+    (k, 2) arrays of (frame, value), ipo holds interpolation per key."""
+    co = np.asarray(co, dtype=np.float64).reshape(-1, 2)
+    handle_left = np.asarray(handle_left, dtype=np.float64).reshape(-1, 2)
+    handle_right = np.asarray(handle_right, dtype=np.float64).reshape(-1, 2)
+    ipo = np.asarray(ipo)
+    frames = np.asarray(frames, dtype=np.float64)
+    num_keys = len(co)
+    out = np.empty(len(frames), dtype=np.float64)
+
+    before = frames <= co[0, 0]
+    after = frames >= co[-1, 0]
+    inside = ~(before | after)
+
+    # Extrapolation
+    for mask, key, neighbor, handle in ((before, 0, 1, handle_left), (after, num_keys - 1, num_keys - 2, handle_right)):
+        if not mask.any():
+            continue
+        value = co[key, 1]
+        slope = 0.0
+        if extrapolate_linear and ipo[key] != IPO_CONSTANT:
+            if ipo[key] == IPO_LINEAR:
+                if num_keys > 1 and co[neighbor, 0] != co[key, 0]:
+                    slope = (co[neighbor, 1] - co[key, 1]) / (co[neighbor, 0] - co[key, 0])
+            elif co[key, 0] != handle[key, 0]:
+                slope = (co[key, 1] - handle[key, 1]) / (co[key, 0] - handle[key, 0])
+        out[mask] = value + slope * (frames[mask] - co[key, 0])
+
+    if inside.any():
+        x = frames[inside]
+        seg = np.clip(np.searchsorted(co[:, 0], x, side='right') - 1, 0, num_keys - 2)
+        p1 = co[seg]
+        p2 = co[seg + 1]
+        seg_ipo = ipo[seg]
+        values = np.empty(len(x), dtype=np.float64)
+
+        const = seg_ipo == IPO_CONSTANT
+        values[const] = p1[const, 1]
+
+        lin = seg_ipo == IPO_LINEAR
+        span = p2[lin, 0] - p1[lin, 0]
+        fac = np.divide(x[lin] - p1[lin, 0], span, out=np.zeros_like(span), where=span != 0)
+        values[lin] = p1[lin, 1] + fac * (p2[lin, 1] - p1[lin, 1])
+
+        bez = seg_ipo == IPO_BEZIER
+        if bez.any():
+            values[bez] = _eval_bezier(p1[bez], handle_right[seg[bez]], handle_left[seg[bez] + 1], p2[bez], x[bez])
+
+        # Keys exactly on a frame keep their value
+        on_key = x == p1[:, 0]
+        values[on_key] = p1[on_key, 1]
+        out[inside] = values
+
+    return out
+
+def relative_bone_matrices(matrices, parents):
+    """Converts (frames, bones, 4, 4) armature space matrices to parent
+    relative ones, parents holds the parent index of each bone or -1.
+    Returns the relative matrices and a (frames, bones) mask of singular
+    parent matrices that were left untouched."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    parents = np.asarray(parents)
+    out = matrices.copy()
+    has_parent = parents >= 0
+    if not has_parent.any():
+        return out, np.zeros(matrices.shape[:2], dtype=bool)
+
+    parent_mats = matrices[:, parents[has_parent]]
+    singular = np.abs(np.linalg.det(parent_mats)) < 1e-12
+    safe = np.where(singular[..., None, None], np.eye(4), parent_mats)
+    out[:, has_parent] = np.linalg.inv(safe) @ matrices[:, has_parent]
+
+    mask = np.zeros(matrices.shape[:2], dtype=bool)
+    mask[:, has_parent] = singular
+    out[mask] = matrices[mask]
+    return out, mask
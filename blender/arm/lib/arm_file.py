@@ -0,0 +1,39 @@
+# Writes exported data as armpack, LZ4 compressed armpack, indexed
+# containers or JSON
+# Does not depend on bpy, so it can be used from worker processes
+import json
+
+import numpy as np
+
+import arm.lib.armindex
+import arm.lib.armpack
+import arm.lib.lz4
+
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return json.JSONEncoder.default(self, obj)
+
+def output_path(filepath, minimize=True, indexed=False):
+    """Returns the path write() stores filepath at."""
+    if not minimize and not indexed and not filepath.endswith('.lz4'):
+        return filepath.split('.arm')[0] + '.json'
+    return filepath
+
+def write(filepath, output, minimize=True, indexed=False, executor=None):
+    """Returns the path of the written file. LZ4 blocks are compressed
+    through the executor when one is given."""
+    filepath = output_path(filepath, minimize, indexed)
+    if indexed:
+        arm.lib.armindex.pack_to_file(output, filepath)
+    elif filepath.endswith('.lz4'):
+        with open(filepath, 'wb') as f:
+            f.write(arm.lib.lz4.compress(arm.lib.armpack.packb(output), executor=executor))
+    else:
+        if minimize:
+            arm.lib.armpack.pack_to_file(output, filepath)
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(output, f, sort_keys=True, indent=4, cls=NumpyEncoder)
+    return filepath
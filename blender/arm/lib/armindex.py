@@ -0,0 +1,89 @@
+# Indexed container for the single data file
+# Datablocks of the lazy sections are packed separately, so the runtime can
+# decode each of them on demand instead of decoding the whole scene.
+# Layout, little endian:
+#   0   magic b"ARMI"
+#   4   uint32 version
+#   8   uint32 size of the table of contents
+#   12  uint32 reserved
+#   16  table of contents, armpack
+#   payloads, each starting at a multiple of alignment bytes after the
+#   table of contents
+# The table of contents holds
+#   'blocks': [type, name, offset, size] of each armpack datablock, the
+#             first one is the scene holding everything but the lazy sections
+#   'arrays': [type, offset, count] of each typed array
+# Typed arrays of the datablocks are replaced by {'_array': index} and
+# stored as raw buffers. Offsets are relative to the first payload.
+# Read by armory.data.IndexedData
+import struct
+
+import numpy as np
+
+import arm.lib.armpack as armpack
+
+magic = b"ARMI"
+version = 1
+alignment = 16
+lazy_sections = ('mesh_datas', 'material_datas', 'shader_datas', 'skeleton_datas')
+
+_array_types = {
+    np.dtype('<f4'): ('f32', '<f4'),
+    np.dtype('<i4'): ('i32', '<i4'),
+    np.dtype('<i2'): ('i16', '<i2'),
+    np.dtype('<u2'): ('u16', '<u2'),
+    np.dtype('<f2'): ('u16', '<f2'), # Float16, stored as uint16 bits like in armpack
+    np.dtype('i1'): ('i8', 'i1'),
+    np.dtype('u1'): ('u8', 'u1'),
+}
+
+class _Payloads:
+    def __init__(self):
+        self.buffers = []
+        self.size = 0
+        self.arrays = []
+
+    def add(self, buffer):
+        """Returns the offset of the appended buffer."""
+        offset = self.size
+        self.buffers.append(buffer)
+        self.size += len(buffer)
+        pad = -self.size % alignment
+        if pad > 0:
+            self.buffers.append(bytes(pad))
+            self.size += pad
+        return offset
+
+    def extract(self, obj):
+        """Returns obj with its typed arrays moved to the payloads."""
+        if isinstance(obj, np.ndarray) and obj.dtype in _array_types:
+            name, dtype = _array_types[obj.dtype]
+            values = np.ascontiguousarray(obj.reshape(-1), dtype=dtype)
+            self.arrays.append([name, self.add(memoryview(values).cast('B')), len(values)])
+            return {'_array': len(self.arrays) - 1}
+        if isinstance(obj, dict):
+            return {k: self.extract(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)) and len(obj) > 0 and isinstance(obj[0], (dict, list, tuple, np.ndarray)):
+            return [self.extract(e) for e in obj]
+        return obj
+
+def pack_to_file(obj, filepath, sections=lazy_sections):
+    """Writes the scene obj as an indexed container, the datablocks of the
+    given sections are stored one by one."""
+    payloads = _Payloads()
+    blocks = []
+    scene = {k: ([] if k in sections else v) for k, v in obj.items()}
+    data = armpack.packb(payloads.extract(scene))
+    blocks.append(['scene', '', payloads.add(data), len(data)])
+    for section in sections:
+        for datablock in obj.get(section, []):
+            data = armpack.packb(payloads.extract(datablock))
+            blocks.append([section, datablock['name'], payloads.add(data), len(data)])
+
+    toc = armpack.packb({'blocks': blocks, 'arrays': payloads.arrays})
+    with open(filepath, 'wb') as fp:
+        fp.write(magic + struct.pack('<III', version, len(toc), 0))
+        fp.write(toc)
+        fp.write(bytes(-len(toc) % alignment))
+        for buffer in payloads.buffers:
+            fp.write(buffer)
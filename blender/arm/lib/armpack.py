@@ -20,10 +20,36 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 #
-import struct
+import array
 import io
+import mmap
+import os
+import struct
+import sys
+
 import numpy as np
 
+import arm.lib.lz4
+
+_typed_array_dtypes = {
+    np.dtype('<f4'): '<f4', np.dtype('>f4'): '<f4', # Float32
+    np.dtype('<i4'): '<i4', np.dtype('>i4'): '<i4', # Int32
+    np.dtype('<i2'): '<i2', np.dtype('>i2'): '<i2', # Int16
+}
+_typed_array_markers = {'<f4': b"\xca", '<i4': b"\xd2", '<i2': b"\xd1"}
+
+def _to_array(typecode, obj):
+    # Converts a homogeneous list in one call, raises on mixed types
+    # like struct.pack does
+    ar = array.array(typecode, obj)
+    if sys.byteorder == 'big':
+        ar.byteswap()
+    return ar
+
+def _write_buffer(obj, fp):
+    # Hand the buffer to the file without an intermediate bytes copy
+    fp.write(memoryview(obj).cast('B'))
+
 def _pack_integer(obj, fp):
     if obj < 0:
         if obj >= -32:
@@ -87,6 +113,10 @@ def _pack_binary(obj, fp):
         raise Exception("huge binary string")
 
 def _pack_array(obj, fp):
+    # Typed arrays are written flat
+    if isinstance(obj, np.ndarray) and obj.ndim > 1 and obj.dtype in _typed_array_dtypes:
+        obj = obj.reshape(-1)
+
     if len(obj) <= 15:
         fp.write(struct.pack("B", 0x90 | len(obj)))
     elif len(obj) <= 2**16 - 1:
@@ -96,29 +126,21 @@ def _pack_array(obj, fp):
     else:
         raise Exception("huge array")
 
-    if len(obj) > 0 and isinstance(obj[0], float):
+    # Typed arrays, written straight from the array buffer
+    if isinstance(obj, np.ndarray) and obj.dtype in _typed_array_dtypes:
+        if len(obj) > 0:
+            dtype = _typed_array_dtypes[obj.dtype]
+            fp.write(_typed_array_markers[dtype])
+            _write_buffer(np.ascontiguousarray(obj, dtype=dtype), fp)
+    elif len(obj) > 0 and isinstance(obj[0], float):
         fp.write(b"\xca")
-        for e in obj:
-            fp.write(struct.pack("<f", e))
+        _write_buffer(_to_array('f', obj), fp)
     elif len(obj) > 0 and isinstance(obj[0], bool):
         for e in obj:
             pack(e, fp)
     elif len(obj) > 0 and isinstance(obj[0], int):
         fp.write(b"\xd2")
-        for e in obj:
-            fp.write(struct.pack("<i", e))
-    # Float32
-    elif len(obj) > 0 and isinstance(obj[0], np.float32):
-        fp.write(b"\xca")
-        fp.write(obj.tobytes())
-    # Int32
-    elif len(obj) > 0 and isinstance(obj[0], np.int32):
-        fp.write(b"\xd2")
-        fp.write(obj.tobytes())
-    # Int16
-    elif len(obj) > 0 and isinstance(obj[0], np.int16):
-        fp.write(b"\xd1")
-        fp.write(obj.tobytes())
+        _write_buffer(_to_array('i', obj), fp)
     # Regular
     else:
         for e in obj:
@@ -162,3 +184,115 @@ def packb(obj):
     fp = io.BytesIO()
     pack(obj, fp)
     return fp.getvalue()
+
+def pack_to_file(obj, filepath):
+    """Streams obj to the given file, without building it in memory
+    first."""
+    with open(filepath, 'wb') as fp:
+        pack(obj, fp)
+
+# Reader
+# Typed arrays are returned as read-only NumPy views over the input buffer
+_typed_array_marker_dtypes = {0xca: np.dtype('<f4'), 0xd2: np.dtype('<i4'), 0xd1: np.dtype('<i2')}
+_fixed_formats = {
+    0xca: ('<f', 4), 0xcb: ('<d', 8),
+    0xcc: ('B', 1), 0xcd: ('<H', 2), 0xce: ('<I', 4), 0xcf: ('<Q', 8),
+    0xd0: ('b', 1), 0xd1: ('<h', 2), 0xd2: ('<i', 4), 0xd3: ('<q', 8),
+}
+# Marker -> size format of strings, binaries, arrays and maps
+_length_formats = {
+    0xd9: ('B', 1), 0xda: ('<H', 2), 0xdb: ('<I', 4),
+    0xc4: ('B', 1), 0xc5: ('<H', 2), 0xc6: ('<I', 4),
+    0xdc: ('<H', 2), 0xdd: ('<I', 4),
+    0xde: ('<H', 2), 0xdf: ('<I', 4),
+}
+
+class _Reader:
+    def __init__(self, buf):
+        self.buf = buf
+        self.view = memoryview(buf).cast('B')
+        self.pos = 0
+
+    def read(self, size):
+        if self.pos + size > len(self.view):
+            raise Exception("unexpected end of data")
+        data = self.view[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def read_format(self, fmt, size):
+        return struct.unpack_from(fmt, self.read(size))[0]
+
+    def read_length(self, marker):
+        return self.read_format(*_length_formats[marker])
+
+    def read_string(self, length):
+        return str(self.read(length), 'utf-8')
+
+    def read_array(self, length):
+        if length > 0 and self.pos < len(self.view):
+            dtype = _typed_array_marker_dtypes.get(self.view[self.pos])
+            if dtype is not None:
+                self.pos += 1
+                offset = self.pos
+                self.read(length * dtype.itemsize)
+                return np.frombuffer(self.buf, dtype=dtype, count=length, offset=offset)
+        return [self.unpack() for _ in range(length)]
+
+    def read_map(self, length):
+        obj = {}
+        for _ in range(length):
+            key = self.unpack()
+            obj[key] = self.unpack()
+        return obj
+
+    def unpack(self):
+        marker = self.read(1)[0]
+        if marker <= 0x7f:
+            return marker
+        if marker >= 0xe0:
+            return marker - 0x100
+        if 0xa0 <= marker <= 0xbf:
+            return self.read_string(marker & 0x1f)
+        if 0x90 <= marker <= 0x9f:
+            return self.read_array(marker & 0x0f)
+        if 0x80 <= marker <= 0x8f:
+            return self.read_map(marker & 0x0f)
+        if marker == 0xc0:
+            return None
+        if marker == 0xc2:
+            return False
+        if marker == 0xc3:
+            return True
+        if marker in _fixed_formats:
+            return self.read_format(*_fixed_formats[marker])
+        if marker in (0xd9, 0xda, 0xdb):
+            return self.read_string(self.read_length(marker))
+        if marker in (0xc4, 0xc5, 0xc6):
+            return bytes(self.read(self.read_length(marker)))
+        if marker in (0xdc, 0xdd):
+            return self.read_array(self.read_length(marker))
+        if marker in (0xde, 0xdf):
+            return self.read_map(self.read_length(marker))
+        raise Exception("unsupported marker: 0x%02x" % marker)
+
+def unpackb(buf):
+    """Decodes armpack data from a bytes-like object. Typed arrays are
+    NumPy views over buf, so buf is kept alive by them."""
+    reader = _Reader(buf)
+    obj = reader.unpack()
+    if reader.pos != len(reader.view):
+        raise Exception("trailing data after object")
+    return obj
+
+def unpack_file(filepath):
+    """Decodes the given armpack file. The file is memory mapped and typed
+    arrays are views over the mapping, LZ4 compressed files are
+    decompressed first."""
+    if filepath.endswith('.lz4'):
+        with open(filepath, 'rb') as f:
+            return unpackb(arm.lib.lz4.decompress(f.read()))
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise Exception("empty file")
+        return unpackb(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,74 @@
+# Content deduplicated asset archive of published builds
+# Each unique file content is stored once, files with equal content share
+# a payload. Layout, little endian:
+#   0   magic b"ARMA"
+#   4   uint32 version
+#   8   uint32 size of the index
+#   12  uint32 number of payloads
+#   16  index, armpack {'files': {name: payload}, 'payloads': [[offset, size]]}
+#   payloads, each starting at a multiple of alignment bytes after the
+#   index, offsets are relative to the first payload
+# Read by armory.data.AssetArchive
+import hashlib
+import os
+import struct
+
+import arm.lib.armpack as armpack
+
+magic = b"ARMA"
+version = 1
+alignment = 16
+# Loaded through kha.Blob, images are loaded by kha from their own files
+data_extensions = ('.arm', '.json', '.lz4')
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.digest()
+
+def write(paths, filepath):
+    """Archives the given files under their file names, which is how
+    the runtime looks them up. Returns the archived paths, the number of
+    unique payloads and the saved bytes. Names shared by files of
+    different content are not archived at all, so the archive never
+    shadows one of them with the other."""
+    files = {}
+    payloads = []
+    digests = {}
+    names = {}
+    for path in paths:
+        names.setdefault(os.path.basename(path), {})[path] = file_digest(path)
+    archived = []
+    saved = 0
+    offset = 0
+    for path in paths:
+        name = os.path.basename(path)
+        digest = names[name][path]
+        if len(set(names[name].values())) > 1:
+            continue
+        archived.append(path)
+        if name in files:
+            continue
+        index = digests.get(digest)
+        size = os.path.getsize(path)
+        if index is None:
+            index = len(payloads)
+            digests[digest] = index
+            payloads.append((path, offset, size))
+            offset += size + (-size % alignment)
+        else:
+            saved += size
+        files[name] = index
+
+    index_data = armpack.packb({'files': files, 'payloads': [[offset, size] for _, offset, size in payloads]})
+    with open(filepath, 'wb') as fp:
+        fp.write(magic + struct.pack('<III', version, len(index_data), len(payloads)))
+        fp.write(index_data)
+        fp.write(bytes(-len(index_data) % alignment))
+        for path, _, size in payloads:
+            with open(path, 'rb') as f:
+                fp.write(f.read())
+            fp.write(bytes(-size % alignment))
+    return archived, len(payloads), saved
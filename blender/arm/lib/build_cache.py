@@ -0,0 +1,67 @@
+# Content hash manifest of exported files
+# Lets the exporter skip re-encoding files whose inputs did not change,
+# across sessions and Blender restarts
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Bump when the encoded output changes for the same inputs
+CACHE_VERSION = 7
+
+class BuildCache:
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == CACHE_VERSION:
+                    self.entries = manifest['entries']
+            except (ValueError, KeyError):
+                pass # Corrupted manifest, rebuild
+
+    def is_cached(self, filepath, digest):
+        """Returns True if filepath exists and was written from inputs
+        with the given digest, counts the lookup."""
+        entry = self.entries.get(os.path.basename(filepath))
+        if entry is not None and entry['digest'] == digest and os.path.isfile(filepath):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def store(self, filepath, digest, meta=None):
+        """Records the digest of a written file, meta holds results of
+        the encoding that are needed again when the file is cached."""
+        self.entries[os.path.basename(filepath)] = {'digest': digest, 'meta': meta}
+
+    def get_meta(self, filepath):
+        return self.entries[os.path.basename(filepath)]['meta']
+
+    def save(self):
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f, sort_keys=True, indent=4)
+
+class Hasher:
+    """Accumulates a content hash from NumPy buffers and plain values."""
+
+    def __init__(self):
+        self.h = hashlib.blake2b(digest_size=16)
+
+    def update_array(self, ar):
+        ar = np.ascontiguousarray(ar)
+        self.h.update(str(ar.dtype).encode('utf-8'))
+        self.h.update(memoryview(ar).cast('B'))
+
+    def update_value(self, value):
+        # repr() of nested tuples, lists and floats is deterministic
+        self.h.update(repr(value).encode('utf-8'))
+
+    def hexdigest(self):
+        return self.h.hexdigest()
@@ -0,0 +1,60 @@
+# Compact index buffer encoding
+# Each index is stored as the zigzag encoded delta to the previous index,
+# written as a LEB128 varint. After vertex fetch reordering neighbouring
+# indices are close, so most indices take a single byte.
+# Decoded by armory.data.MeshDecoder
+import numpy as np
+
+def narrow(indices, vertex_count):
+    """Returns indices as 16-bit when all vertices are addressable,
+    otherwise as 32-bit."""
+    return np.array(indices, dtype='<u2' if vertex_count <= 65536 else '<i4')
+
+def encode(indices):
+    """Returns the varint bytes of the index array."""
+    v = np.asarray(indices, dtype=np.int64).reshape(-1)
+    d = np.diff(v, prepend=0)
+    z = (d << 1) ^ (d >> 63)
+    # Bytes per value, 7 bits each
+    nbytes = np.ones(len(z), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += z >= (1 << (7 * k))
+    offsets = np.cumsum(nbytes) - nbytes
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max(initial=0))):
+        mask = nbytes > k
+        byte = (z[mask] >> (7 * k)) & 0x7f
+        byte |= np.where(nbytes[mask] > k + 1, 0x80, 0)
+        out[offsets[mask] + k] = byte
+    return out.tobytes()
+
+def decode(data, dtype='<i4'):
+    """Decodes varint bytes back to the index array."""
+    b = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    if len(b) == 0:
+        return np.zeros(0, dtype=dtype)
+    ends = b < 0x80
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    pos = np.arange(len(b)) - np.repeat(starts, np.diff(np.append(starts, len(b))))
+    z = np.add.reduceat((b & 0x7f) << (7 * pos), starts)
+    d = (z >> 1) ^ -(z & 1)
+    return np.array(np.cumsum(d), dtype=dtype)
+
+def pack_index_array(ia, vertex_count, narrow_indices, compact):
+    """Stores the values of index array ia as 32-bit, in the narrowest
+    type with narrow_indices, or as varint bytes when compact is set.
+    16-bit indices are stored as the bits of an Int16 array, which the
+    armpack reader of iron decodes."""
+    if narrow_indices:
+        values = narrow(ia['values'], vertex_count)
+    else:
+        values = np.array(ia['values'], dtype='<i4')
+    short = values.dtype == np.dtype('<u2')
+    if short:
+        ia['data'] = 'ushort'
+    if compact:
+        ia['encoding'] = 'varint'
+        ia['count'] = len(values)
+        ia['values'] = encode(values)
+    else:
+        ia['values'] = values.view('<i2') if short else values
@@ -0,0 +1,113 @@
+# Instance transforms for instanced rendering
+# Vertex shaders apply instances as spos = mirot * spos * iscl + ipos,
+# see arm.material.make_inst. mirot is Ry(irot.y) * Rz(irot.z) * Rx(irot.x),
+# so rotations are decomposed in that order rather than Blender's XYZ euler
+import numpy as np
+
+# Instanced types of mesh data
+INSTANCED_TYPES = {'Loc': 1, 'Loc + Rot': 2, 'Loc + Scale': 3, 'Loc + Rot + Scale': 4}
+
+def rotation_matrices(rot):
+    """Builds the shader rotation matrices of (n, 3) instance angles."""
+    sx, sy, sz = np.sin(rot[:, 0]), np.sin(rot[:, 1]), np.sin(rot[:, 2])
+    cx, cy, cz = np.cos(rot[:, 0]), np.cos(rot[:, 1]), np.cos(rot[:, 2])
+    m = np.empty((len(rot), 3, 3))
+    m[:, 0, 0] = cy * cz
+    m[:, 0, 1] = sy * sx - cy * sz * cx
+    m[:, 0, 2] = cy * sz * sx + sy * cx
+    m[:, 1, 0] = sz
+    m[:, 1, 1] = cz * cx
+    m[:, 1, 2] = -cz * sx
+    m[:, 2, 0] = -sy * cz
+    m[:, 2, 1] = sy * sz * cx + cy * sx
+    m[:, 2, 2] = -sy * sz * sx + cy * cx
+    return m
+
+def decompose(matrices):
+    """Splits (n, 4, 4) row-major object space matrices into instance
+    location, rotation and scale. Also returns the largest error of the
+    decomposition, which is non-zero for shear and non-uniformly scaled
+    rotations the shader can not express."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    loc = matrices[:, :3, 3]
+    basis = matrices[:, :3, :3]
+    # Shader scales after rotating, take scale along the parent axes
+    scale = np.linalg.norm(basis, axis=2)
+    rot_m = basis / np.where(scale == 0.0, 1.0, scale)[:, :, None]
+
+    m10 = np.clip(rot_m[:, 1, 0], -1.0, 1.0)
+    rot = np.empty((len(matrices), 3))
+    gimbal = np.abs(m10) > 1.0 - 1e-9
+    rot[:, 0] = np.where(gimbal, 0.0, np.arctan2(-rot_m[:, 1, 2], rot_m[:, 1, 1]))
+    rot[:, 1] = np.where(gimbal, np.arctan2(rot_m[:, 0, 2], rot_m[:, 2, 2]), np.arctan2(-rot_m[:, 2, 0], rot_m[:, 0, 0]))
+    rot[:, 2] = np.where(gimbal, np.sign(m10) * np.pi / 2, np.arcsin(m10))
+
+    rebuilt = rotation_matrices(rot) * scale[:, :, None]
+    error = float(np.abs(rebuilt - basis).max(initial=0.0))
+    return loc, rot, scale, error
+
+def instancing_mode(rot, scale, eps=1e-5):
+    """Smallest instanced type that expresses the transforms."""
+    has_rot = bool((np.abs(rot) > eps).any())
+    has_scale = bool((np.abs(scale - 1.0) > eps).any())
+    if has_rot and has_scale:
+        return 'Loc + Rot + Scale'
+    if has_rot:
+        return 'Loc + Rot'
+    if has_scale:
+        return 'Loc + Scale'
+    return 'Loc'
+
+def merge_modes(mode1, mode2):
+    has_rot = 'Rot' in mode1 or 'Rot' in mode2
+    has_scale = 'Scale' in mode1 or 'Scale' in mode2
+    return instancing_mode(np.array([1.0 if has_rot else 0.0]), np.array([2.0 if has_scale else 1.0]))
+
+def instanced_data(mode, loc, rot, scale, scale_pos):
+    """Interleaves the per-instance attributes of the instanced type,
+    locations are in packed position units."""
+    parts = [np.asarray(loc) / scale_pos]
+    if 'Rot' in mode:
+        parts.append(rot)
+    if 'Scale' in mode:
+        parts.append(scale)
+    return np.array(np.concatenate(parts, axis=1).reshape(-1), dtype='<f4')
+
+def unify_modes(modes, materials):
+    """Widens the instanced types of groups sharing a material, as a
+    material has one set of shader inputs. materials holds the material
+    tuple of each group."""
+    modes = list(modes)
+    changed = True
+    while changed:
+        changed = False
+        mat_modes = {}
+        for mode, mats in zip(modes, materials):
+            for mat in mats:
+                mat_modes[mat] = merge_modes(mat_modes.get(mat, 'Loc'), mode)
+        for i, mats in enumerate(materials):
+            mode = modes[i]
+            for mat in mats:
+                mode = merge_modes(mode, mat_modes[mat])
+            if mode != modes[i]:
+                modes[i] = mode
+                changed = True
+    return modes
+
+def instance_dimensions(dim, loc, scale):
+    """Dimensions of a box around the origin enclosing all instances of
+    a mesh with dimensions dim."""
+    radius = float(np.max(scale)) * float(np.linalg.norm(dim)) / 2
+    return [float(d) for d in (np.abs(loc).max(axis=0) + radius) * 2]
+
+def partition(loc, cell_size):
+    """Bins instance locations into cubic cells of cell_size. Returns the
+    instance indices of each cell, starting with the cell of the first
+    instance."""
+    cells = np.floor(np.asarray(loc) / cell_size).astype(np.int64)
+    _, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(inverse[order])) + 1)
+    groups.insert(0, groups.pop(inverse[0]))
+    return groups
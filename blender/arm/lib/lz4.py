@@ -0,0 +1,230 @@
+# LZ4 frame compression, pure Python
+# Format: https://github.com/lz4/lz4/blob/dev/doc/lz4_Frame_format.md
+#         https://github.com/lz4/lz4/blob/dev/doc/lz4_Block_format.md
+# Blocks are compressed independently, so they can be encoded in parallel
+# Encoding runs at about 8 MB/s per process on exported mesh data, so
+# large scenes are compressed block by block in the encode worker pool
+import struct
+
+MAGIC = 0x184D2204
+BLOCK_SIZE = 4 * 1024 * 1024 # Max block size id 7
+MIN_MATCH = 4
+LAST_LITERALS = 5 # The last 5 bytes of a block are always literals
+MF_LIMIT = 12 # The last match must start at least 12 bytes before block end
+MAX_OFFSET = 65535
+SKIP_TRIGGER = 6 # Search step grows by one every 2^6 misses, like the reference encoder
+
+_PRIME32_1 = 2654435761
+_PRIME32_2 = 2246822519
+_PRIME32_3 = 3266489917
+_PRIME32_4 = 668265263
+_PRIME32_5 = 374761393
+
+def _rotl32(x, r):
+    return ((x << r) | (x >> (32 - r))) & 0xFFFFFFFF
+
+def xxh32(data, seed=0):
+    """xxHash32, used for the frame header checksum."""
+    n = len(data)
+    i = 0
+    if n >= 16:
+        v1 = (seed + _PRIME32_1 + _PRIME32_2) & 0xFFFFFFFF
+        v2 = (seed + _PRIME32_2) & 0xFFFFFFFF
+        v3 = seed & 0xFFFFFFFF
+        v4 = (seed - _PRIME32_1) & 0xFFFFFFFF
+        while i <= n - 16:
+            a, b, c, d = struct.unpack_from('<IIII', data, i)
+            v1 = (_rotl32((v1 + a * _PRIME32_2) & 0xFFFFFFFF, 13) * _PRIME32_1) & 0xFFFFFFFF
+            v2 = (_rotl32((v2 + b * _PRIME32_2) & 0xFFFFFFFF, 13) * _PRIME32_1) & 0xFFFFFFFF
+            v3 = (_rotl32((v3 + c * _PRIME32_2) & 0xFFFFFFFF, 13) * _PRIME32_1) & 0xFFFFFFFF
+            v4 = (_rotl32((v4 + d * _PRIME32_2) & 0xFFFFFFFF, 13) * _PRIME32_1) & 0xFFFFFFFF
+            i += 16
+        h = (_rotl32(v1, 1) + _rotl32(v2, 7) + _rotl32(v3, 12) + _rotl32(v4, 18)) & 0xFFFFFFFF
+    else:
+        h = (seed + _PRIME32_5) & 0xFFFFFFFF
+    h = (h + n) & 0xFFFFFFFF
+    while i <= n - 4:
+        h = (h + struct.unpack_from('<I', data, i)[0] * _PRIME32_3) & 0xFFFFFFFF
+        h = (_rotl32(h, 17) * _PRIME32_4) & 0xFFFFFFFF
+        i += 4
+    while i < n:
+        h = (h + data[i] * _PRIME32_5) & 0xFFFFFFFF
+        h = (_rotl32(h, 11) * _PRIME32_1) & 0xFFFFFFFF
+        i += 1
+    h ^= h >> 15
+    h = (h * _PRIME32_2) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * _PRIME32_3) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h
+
+def _write_length(out, length):
+    # Lengths of 15 and more continue in 255 byte steps
+    while length >= 255:
+        out.append(255)
+        length -= 255
+    out.append(length)
+
+def _write_sequence(out, src, anchor, pos, offset, match_len):
+    lit_len = pos - anchor
+    token_lit = min(lit_len, 15)
+    token_match = -1 if match_len == 0 else min(match_len - MIN_MATCH, 15)
+    out.append((token_lit << 4) | max(token_match, 0))
+    if lit_len >= 15:
+        _write_length(out, lit_len - 15)
+    out += src[anchor:pos]
+    if match_len > 0:
+        out += struct.pack('<H', offset)
+        if match_len - MIN_MATCH >= 15:
+            _write_length(out, match_len - MIN_MATCH - 15)
+
+def compress_block(src):
+    """Compresses one block, greedy matching against the last
+    occurrence of each 4 byte sequence. The search step grows while no
+    match is found, so incompressible data is skipped quickly."""
+    src = bytes(src)
+    n = len(src)
+    out = bytearray()
+    anchor = 0
+    pos = 0
+    limit = n - MF_LIMIT
+    match_end_limit = n - LAST_LITERALS
+    table = {}
+    misses = 1 << SKIP_TRIGGER
+    while pos < limit:
+        seq = src[pos:pos + MIN_MATCH]
+        ref = table.get(seq)
+        table[seq] = pos
+        if ref is None or pos - ref > MAX_OFFSET:
+            pos += misses >> SKIP_TRIGGER
+            misses += 1
+            continue
+        misses = 1 << SKIP_TRIGGER
+
+        # Extend the match, 8 bytes at a time first
+        match_len = MIN_MATCH
+        max_len = match_end_limit - pos
+        while match_len + 8 <= max_len and src[ref + match_len:ref + match_len + 8] == src[pos + match_len:pos + match_len + 8]:
+            match_len += 8
+        while match_len < max_len and src[ref + match_len] == src[pos + match_len]:
+            match_len += 1
+
+        _write_sequence(out, src, anchor, pos, pos - ref, match_len)
+        pos += match_len
+        anchor = pos
+
+    # Last literals
+    _write_sequence(out, src, anchor, n, 0, 0)
+    return bytes(out)
+
+def decompress_block(src, max_size=BLOCK_SIZE, out=None):
+    """Decodes one block. Blocks of linked frames are appended to the
+    previous output, which matches may reference."""
+    if out is None:
+        out = bytearray()
+    out_start = len(out)
+    n = len(src)
+    i = 0
+    while i < n:
+        token = src[i]
+        i += 1
+        lit_len = token >> 4
+        if lit_len == 15:
+            while True:
+                b = src[i]
+                i += 1
+                lit_len += b
+                if b != 255:
+                    break
+        out += src[i:i + lit_len]
+        i += lit_len
+        if i >= n: # Last sequence has no match
+            break
+        offset = src[i] | (src[i + 1] << 8)
+        i += 2
+        if offset == 0 or offset > len(out):
+            raise Exception("lz4: invalid match offset")
+        match_len = token & 0x0F
+        if match_len == 15:
+            while True:
+                b = src[i]
+                i += 1
+                match_len += b
+                if b != 255:
+                    break
+        match_len += MIN_MATCH
+        start = len(out) - offset
+        if match_len <= offset:
+            out += out[start:start + match_len]
+        else: # Overlapping copy repeats the last offset bytes
+            while match_len > 0:
+                chunk = out[start:start + min(offset, match_len)]
+                out += chunk
+                match_len -= len(chunk)
+        if len(out) - out_start > max_size:
+            raise Exception("lz4: block exceeds maximum size")
+    return out
+
+def _encode_block(block):
+    # Store incompressible blocks raw, flagged by the high bit
+    compressed = compress_block(block)
+    if len(compressed) >= len(block):
+        return struct.pack('<I', len(block) | 0x80000000) + block
+    return struct.pack('<I', len(compressed)) + compressed
+
+def compress(data, block_size=BLOCK_SIZE, executor=None):
+    """Returns data as an LZ4 frame of independent blocks. Blocks are
+    encoded through executor.map() when a concurrent.futures executor
+    is given."""
+    data = bytes(data)
+    flg = (1 << 6) | (1 << 5) | (1 << 3) # Version 01, independent blocks, content size
+    bd = 7 << 4 # 4 MB max block size
+    descriptor = struct.pack('<BBQ', flg, bd, len(data))
+    header = struct.pack('<I', MAGIC) + descriptor + bytes([(xxh32(descriptor) >> 8) & 0xFF])
+
+    blocks = [data[i:i + block_size] for i in range(0, len(data), block_size)]
+    if executor is not None and len(blocks) > 1:
+        encoded = executor.map(_encode_block, blocks)
+    else:
+        encoded = map(_encode_block, blocks)
+    return header + b''.join(encoded) + struct.pack('<I', 0)
+
+def decompress(data):
+    """Decodes an LZ4 frame."""
+    data = memoryview(data)
+    magic, flg, bd = struct.unpack_from('<IBB', data, 0)
+    if magic != MAGIC:
+        raise Exception("lz4: not an LZ4 frame")
+    if flg >> 6 != 1:
+        raise Exception("lz4: unsupported frame version")
+    pos = 6
+    if flg & (1 << 3): # Content size
+        pos += 8
+    if flg & 1: # Dictionary id
+        pos += 4
+    if data[pos] != (xxh32(bytes(data[4:pos])) >> 8) & 0xFF:
+        raise Exception("lz4: header checksum mismatch")
+    pos += 1
+    independent = flg & (1 << 5)
+    has_block_checksum = flg & (1 << 4)
+    max_size = 1 << (8 + 2 * ((bd >> 4) & 7))
+
+    out = bytearray()
+    while True:
+        size = struct.unpack_from('<I', data, pos)[0]
+        pos += 4
+        if size == 0: # End mark
+            break
+        raw = size & 0x80000000
+        size &= 0x7FFFFFFF
+        block = data[pos:pos + size]
+        if raw:
+            out += block
+        elif independent:
+            out += decompress_block(bytes(block), max_size)
+        else:
+            decompress_block(bytes(block), max_size, out)
+        pos += size
+        if has_block_checksum:
+            pos += 4
+    return bytes(out)
@@ -0,0 +1,173 @@
+# Second phase of mesh export, runs in worker processes without bpy
+# The exporter extracts raw float buffers on the main thread:
+#   pos, nor - (n, 3) float32
+#   tex, tex1 - (n, 2) float32 or None
+#   col, tang - (n, 3) float32 or None, tang is True to calculate tangents here
+#   morph - (n, 2) float32 morph target delta ranges, optional
+#   vat - (n, 2) float32 vertex animation texels, optional
+# Encoding quantizes vertex data, optimizes buffers and writes the mesh file,
+# see arm.lib.quantize for the vertex formats
+import numpy as np
+
+import arm.lib.arm_file as arm_file
+import arm.lib.index_codec as index_codec
+import arm.lib.meshlets as meshlets
+import arm.lib.meshopt as meshopt
+import arm.lib.quantize as quantize
+import arm.lib.simplify as simplify
+import arm.lib.skinning as skinning
+
+def calc_tangents(pos, nor, uv, ias):
+    num_verts = len(pos)
+    pos = np.asarray(pos, dtype=np.float64)
+    uv = np.asarray(uv, dtype=np.float64)
+    tangents = np.zeros((num_verts, 3), dtype=np.float64)
+    for ar in ias:
+        tris = np.asarray(ar['values']).reshape(-1, 3)
+        delta_pos1 = pos[tris[:, 1]] - pos[tris[:, 0]]
+        delta_pos2 = pos[tris[:, 2]] - pos[tris[:, 0]]
+        delta_uv1 = uv[tris[:, 1]] - uv[tris[:, 0]]
+        delta_uv2 = uv[tris[:, 2]] - uv[tris[:, 0]]
+        d = delta_uv1[:, 0] * delta_uv2[:, 1] - delta_uv1[:, 1] * delta_uv2[:, 0]
+        r = np.divide(1.0, d, out=np.ones_like(d), where=d != 0)
+        tangent = (delta_pos1 * delta_uv2[:, 1:2] - delta_pos2 * delta_uv1[:, 1:2]) * r[:, None]
+        for i in range(3):
+            np.add.at(tangents, tris[:, i], tangent)
+    # Orthogonalize
+    n = np.asarray(nor, dtype=np.float64)
+    v = tangents - n * np.einsum('ij,ij->i', n, tangents)[:, None]
+    length = np.linalg.norm(v, axis=1)
+    np.divide(v, length[:, None], out=v, where=length[:, None] != 0)
+    return v
+
+def generate_lods(o, raw, levels, ratio):
+    """Adds simplified index arrays of each LOD level to mesh o, each
+    level keeps ratio of the triangles of the previous one."""
+    ias = o['index_arrays']
+    tris = np.concatenate([np.asarray(ia['values']).reshape(-1, 3) for ia in ias])
+    labels = np.repeat(np.arange(len(ias)), [len(ia['values']) // 3 for ia in ias])
+    # Texture coordinates and colors must not be stretched across seams
+    attribs = [raw[attrib] for attrib in ('tex', 'tex1', 'col') if raw[attrib] is not None]
+    attribs = np.concatenate(attribs, axis=1) if len(attribs) > 0 else None
+    targets = [int(len(tris) * ratio ** (level + 1)) for level in range(levels)]
+
+    o['lods'] = []
+    num_tris = len(tris)
+    for lod_tris, ids, error in simplify.lod_chain(raw['pos'], tris, targets, attribs):
+        # No further reduction
+        if len(lod_tris) >= num_tris:
+            break
+        num_tris = len(lod_tris)
+        lod_ias = []
+        for i, ia in enumerate(ias):
+            values = lod_tris[labels[ids] == i].reshape(-1)
+            if len(values) > 0:
+                lod_ias.append({'values': np.array(values, dtype='<i4'), 'material': ia['material']})
+        o['lods'].append({'index_arrays': lod_ias, 'error': error})
+
+def encode_mesh(o, raw, optimize=False, lod=None, profile=quantize.DEFAULT_PROFILE, narrow_indices=False, compact_indices=False, meshlet_threshold=None, bone_palette=None):
+    """Fills vertex arrays of mesh o from the raw buffers, quantized
+    with the (pos, nor, tex, col) profile. Vertex buffers are reordered
+    for fetch locality, index arrays are reordered for the vertex cache
+    with optimize. lod holds the levels and ratio
+    of LODs to generate. Skinned meshes are split into index arrays using
+    at most bone_palette bones each. Index arrays with at least meshlet_threshold
+    triangles are split into meshlets. Index arrays are narrowed to
+    16-bit when possible with narrow_indices and varint encoded with
+    compact_indices. Returns
+    the ACMR before and after optimization, None without optimize, the largest quantization
+    error of each attribute and the original material slot of each slot
+    of the bone palette split, None if the mesh was not split."""
+    pos_option, nor_option, _, _ = profile
+    formats = quantize.vertex_formats(profile)
+    pos = raw['pos']
+    nor = raw['nor']
+    scale_pos = o['scale_pos']
+    errors = {}
+
+    o['vertex_arrays'] = []
+    values, errors['pos'] = quantize.pack_positions(pos, nor, scale_pos, pos_option, nor_option)
+    o['vertex_arrays'].append({ 'attrib': 'pos', 'values': values, 'data': formats['pos'] })
+    if nor_option == 'Oct8':
+        errors['nor'] = quantize.angle_error(nor, quantize.oct8_encode(nor)[1])
+    else:
+        values, errors['nor'] = quantize.pack_directions(nor, nor_option, split_z=True)
+        o['vertex_arrays'].append({ 'attrib': 'nor', 'values': values, 'data': formats['nor'] })
+
+    has_tex = raw['tex'] is not None
+    has_tex1 = has_tex and raw['tex1'] is not None
+    has_col = raw['col'] is not None
+    has_tang = has_tex and raw['tang'] is not None
+    if has_tex:
+        # Scale for packed coords
+        scale_tex = 1.0
+        maxdim = max(1.0, float(np.abs(raw['tex']).max(initial=0.0)))
+        if has_tex1:
+            maxdim = max(maxdim, float(np.abs(raw['tex1']).max(initial=0.0)))
+        if maxdim > 1:
+            o['scale_tex'] = maxdim
+            scale_tex = maxdim
+        t0data = np.array(raw['tex'], dtype='<f4')
+        t0data[:, 1] = 1.0 - t0data[:, 1] # Reverse Y
+        values, errors['tex'] = quantize.pack_uvs(t0data, scale_tex)
+        o['vertex_arrays'].append({ 'attrib': 'tex', 'values': values, 'data': formats['tex'] })
+        if has_tex1:
+            t1data = np.array(raw['tex1'], dtype='<f4')
+            t1data[:, 1] = 1.0 - t1data[:, 1]
+            values, errors['tex1'] = quantize.pack_uvs(t1data, scale_tex)
+            o['vertex_arrays'].append({ 'attrib': 'tex1', 'values': values, 'data': formats['tex1'] })
+    if has_col:
+        values, errors['col'] = quantize.pack_colors(raw['col'])
+        o['vertex_arrays'].append({ 'attrib': 'col', 'values': values, 'data': formats['col'], 'padding': 1 })
+    if has_tang:
+        if raw['tang'] is True:
+            tangdata = calc_tangents(pos, nor, t0data, o['index_arrays'])
+        else:
+            tangdata = raw['tang']
+        values, errors['tang'] = quantize.pack_directions(tangdata, nor_option)
+        va = { 'attrib': 'tang', 'values': values, 'data': formats['tang'] }
+        if nor_option == 'Short':
+            va['padding'] = 1
+        o['vertex_arrays'].append(va)
+    if raw.get('morph') is not None:
+        values = np.array(raw['morph'], dtype='<f4').reshape(-1)
+        o['vertex_arrays'].append({ 'attrib': 'morph', 'values': values, 'data': 'float2' })
+    if raw.get('vat') is not None:
+        values = np.array(raw['vat'], dtype='<f4').reshape(-1)
+        o['vertex_arrays'].append({ 'attrib': 'vat', 'values': values, 'data': 'float2' })
+
+    if lod is not None:
+        generate_lods(o, raw, lod['levels'], lod['ratio'])
+
+    material_slots = None
+    if bone_palette is not None and 'skin' in o:
+        material_slots = skinning.split_palettes(o, bone_palette)
+
+    # Reorder for vertex fetch, and for post-transform vertex cache when optimizing
+    acmr = meshopt.optimize_mesh(o, vertex_cache=optimize)
+
+    # Bounds of the rendered, quantized positions
+    if meshlet_threshold is not None:
+        pos = quantize.unpack_positions(o['vertex_arrays'][0], scale_pos)
+        for ia in o['index_arrays']:
+            if len(ia['values']) // 3 >= meshlet_threshold:
+                ia['meshlets'] = meshlets.build(ia['values'], pos)
+
+    vertex_count = meshopt.get_vertex_count(o)
+    for ia in o['index_arrays'] + [ia for lod in o.get('lods', []) for ia in lod['index_arrays']]:
+        index_codec.pack_index_array(ia, vertex_count, narrow_indices, compact_indices)
+    return acmr, errors, material_slots
+
+def encode_job(job):
+    """Worker entry point. Encodes job['mesh'] and writes it to
+    job['filepath'], or returns the mesh when there is no file. Returns
+    the mesh, the written path and the encoding stats: ACMR change,
+    errors of the generated LOD levels, quantization errors and material
+    slots of the bone palette split."""
+    o = job['mesh']
+    acmr, quant_errors, material_slots = encode_mesh(o, job['raw'], job.get('optimize', False), job.get('lod'), job.get('profile', quantize.DEFAULT_PROFILE), job.get('narrow_indices', False), job.get('compact_indices', False), job.get('meshlets'), job.get('bone_palette'))
+    stats = {'acmr': acmr, 'lod_errors': [lod['error'] for lod in o.get('lods', [])], 'quant_errors': quant_errors, 'material_slots': material_slots}
+    if job['filepath'] is None:
+        return o, None, stats
+    filepath = arm_file.write(job['filepath'], {'mesh_datas': [o]}, job['minimize'])
+    return None, filepath, stats
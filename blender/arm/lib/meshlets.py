@@ -0,0 +1,80 @@
+# Splits index arrays into meshlets for cluster culling
+# Meshlets are contiguous triangle ranges of an index array, so culled
+# meshes can draw the surviving ranges of the existing index buffer.
+# Triangles are scanned in index order, which after vertex cache
+# optimization keeps meshlets compact.
+# Culled by armory.renderpath.MeshletCulling
+import numpy as np
+
+max_vertices = 64
+max_triangles = 124
+
+def split(indices, max_vertices=max_vertices, max_triangles=max_triangles):
+    """Returns the first triangle of each meshlet, a meshlet ends when
+    the next triangle would exceed either limit."""
+    tris = np.asarray(indices).reshape(-1, 3).tolist()
+    starts = [0]
+    stamp = {}
+    meshlet = 0
+    num_verts = 0
+    num_tris = 0
+    for t, tri in enumerate(tris):
+        new_verts = sum(1 for v in set(tri) if stamp.get(v) != meshlet)
+        if num_verts + new_verts > max_vertices or num_tris + 1 > max_triangles:
+            meshlet += 1
+            starts.append(t)
+            num_verts = len(set(tri))
+            num_tris = 0
+        else:
+            num_verts += new_verts
+        for v in tri:
+            stamp[v] = meshlet
+        num_tris += 1
+    return np.array(starts, dtype=np.int64)
+
+def bounds(pos, tris, starts):
+    """Bounding sphere and normal cone of each meshlet. The sphere is
+    centered on the box of the meshlet vertices. The cone cutoff is the
+    sine of the largest angle between a triangle normal and the axis,
+    1 when the triangles face too many directions to cull."""
+    count = len(starts)
+    labels = np.repeat(np.arange(count), np.diff(np.append(starts, len(tris))))
+    corners = pos[tris].reshape(-1, 3)
+    corner_labels = np.repeat(labels, 3)
+
+    lo = np.full((count, 3), np.inf)
+    hi = np.full((count, 3), -np.inf)
+    np.minimum.at(lo, corner_labels, corners)
+    np.maximum.at(hi, corner_labels, corners)
+    center = (lo + hi) / 2
+    radius = np.zeros(count)
+    np.maximum.at(radius, corner_labels, np.linalg.norm(corners - center[corner_labels], axis=1))
+
+    p0 = pos[tris[:, 0]]
+    normals = np.cross(pos[tris[:, 1]] - p0, pos[tris[:, 2]] - p0)
+    length = np.linalg.norm(normals, axis=1)
+    valid = length > 0.0
+    normals[valid] /= length[valid, None]
+    axis = np.zeros((count, 3))
+    np.add.at(axis, labels[valid], normals[valid])
+    axis_length = np.linalg.norm(axis, axis=1)
+    axis /= np.where(axis_length == 0.0, 1.0, axis_length)[:, None]
+
+    min_dot = np.ones(count)
+    np.minimum.at(min_dot, labels[valid], np.einsum('ij,ij->i', normals[valid], axis[labels[valid]]))
+    cutoff = np.where(min_dot > 0.1, np.sqrt(np.maximum(1.0 - min_dot ** 2, 0.0)), 1.0)
+    return np.concatenate((center, radius[:, None]), axis=1), np.concatenate((axis, cutoff[:, None]), axis=1)
+
+def build(indices, pos):
+    """Meshlets of an index array, pos holds the object space vertex
+    positions. Returns the index ranges as (start, count) pairs, bounding
+    spheres as (x, y, z, radius) and normal cones as (x, y, z, cutoff)."""
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    starts = split(tris)
+    spheres, cones = bounds(np.asarray(pos, dtype=np.float64), tris, starts)
+    ranges = np.stack((starts * 3, np.diff(np.append(starts, len(tris))) * 3), axis=1)
+    return {
+        'ranges': np.array(ranges.reshape(-1), dtype='<i4'),
+        'bounds': np.array(spheres.reshape(-1), dtype='<f4'),
+        'cones': np.array(cones.reshape(-1), dtype='<f4')
+    }
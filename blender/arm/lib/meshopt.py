@@ -0,0 +1,169 @@
+# Index and vertex buffer optimizations for exported meshes
+# Vertex cache ordering implements Tipsify:
+# Sander, Nehab, Barczak - Fast Triangle Reordering for Vertex Locality and Reduced Overdraw
+# http://gfx.cs.princeton.edu/pubs/Sander_2007_%3ETR/tipsy.pdf
+import numpy as np
+
+import arm.lib.quantize as quantize
+
+# Post-transform cache size the index order is tuned for
+cache_size = 16
+
+def calc_acmr(indices, vertex_count, cache_size=cache_size):
+    """Average cache miss ratio - transformed vertices per triangle,
+    simulated with a FIFO cache."""
+    indices = np.asarray(indices).reshape(-1)
+    num_tris = len(indices) // 3
+    if num_tris == 0:
+        return 0.0
+    timestamps = [-cache_size - 1] * vertex_count
+    time = 0
+    misses = 0
+    for v in indices.tolist():
+        if time - timestamps[v] > cache_size:
+            timestamps[v] = time
+            time += 1
+            misses += 1
+    return misses / num_tris
+
+def optimize_vertex_cache(indices, vertex_count, cache_size=cache_size):
+    """Returns triangles of the index list reordered for post-transform
+    vertex cache locality."""
+    indices = np.asarray(indices).reshape(-1)
+    num_tris = len(indices) // 3
+    if num_tris == 0:
+        return indices.copy()
+
+    # Vertex -> triangle adjacency
+    counts = np.bincount(indices, minlength=vertex_count)
+    offsets = np.concatenate(([0], np.cumsum(counts))).tolist()
+    adjacency = (np.argsort(indices, kind='stable') // 3).tolist()
+    live = counts.tolist()
+    tris = indices.tolist()
+
+    timestamps = [0] * vertex_count
+    emitted = [False] * num_tris
+    dead_end = []
+    out = []
+    time = cache_size + 1
+    cursor = 0
+    fan = tris[0]
+    while fan >= 0:
+        candidates = []
+        for k in range(offsets[fan], offsets[fan + 1]):
+            t = adjacency[k]
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            for v in tris[t * 3:t * 3 + 3]:
+                out.append(v)
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - timestamps[v] > cache_size:
+                    timestamps[v] = time
+                    time += 1
+
+        # Prefer 1-ring vertices that will still be in cache after fanning
+        fan = -1
+        best = -1
+        for v in candidates:
+            if live[v] > 0:
+                p = 0
+                if time - timestamps[v] + 2 * live[v] <= cache_size:
+                    p = time - timestamps[v]
+                if p > best:
+                    best = p
+                    fan = v
+        # Dead-end, pick most recent vertex with live triangles
+        while fan == -1 and len(dead_end) > 0:
+            v = dead_end.pop()
+            if live[v] > 0:
+                fan = v
+        # Take next vertex in input order
+        while fan == -1 and cursor < vertex_count:
+            if live[cursor] > 0:
+                fan = cursor
+            cursor += 1
+
+    return np.array(out, dtype=indices.dtype)
+
+def optimize_vertex_fetch(index_arrays, vertex_count):
+    """Orders vertices by first use across all index lists. Returns the
+    new -> old vertex order and the old -> new index remap, unused
+    vertices are kept at the end."""
+    indices = np.concatenate([np.asarray(ia).reshape(-1) for ia in index_arrays])
+    _, first = np.unique(indices, return_index=True)
+    used = indices[np.sort(first)]
+    unused = np.setdiff1d(np.arange(vertex_count), used)
+    order = np.concatenate((used, unused)).astype('<i4')
+    remap = np.empty(vertex_count, dtype='<i4')
+    remap[order] = np.arange(vertex_count, dtype='<i4')
+    return order, remap
+
+def remap_skin(oskin, order):
+    """Reorders per-vertex bone influences, stored as counts plus packed
+    index and weight lists."""
+    counts = np.asarray(oskin['bone_count_array'])
+    starts = np.cumsum(counts) - counts
+    new_counts = counts[order]
+    new_starts = starts[order]
+    total = int(new_counts.sum())
+    gather = np.repeat(new_starts - (np.cumsum(new_counts) - new_counts), new_counts) + np.arange(total)
+    oskin['bone_count_array'] = np.array(new_counts, dtype=counts.dtype)
+    oskin['bone_index_array'] = np.asarray(oskin['bone_index_array'])[gather]
+    oskin['bone_weight_array'] = np.asarray(oskin['bone_weight_array'])[gather]
+
+def get_vertex_count(out_mesh):
+    pos = out_mesh['vertex_arrays'][0]
+    return len(pos['values']) // quantize.COMPONENTS[pos['data']]
+
+def reorder_vertices(out_mesh):
+    """Reorders the vertex buffers by first use. LOD levels are visited
+    from the coarsest, so each level uses a prefix of the vertex buffer,
+    stored as its vertex_count."""
+    vertex_count = get_vertex_count(out_mesh)
+    lods = out_mesh.get('lods', [])
+    index_arrays = [ia for lod in reversed(lods) for ia in lod['index_arrays']] + out_mesh['index_arrays']
+    order, remap = optimize_vertex_fetch([ia['values'] for ia in index_arrays], vertex_count)
+    for ia in index_arrays:
+        ia['values'] = np.array(remap[ia['values']], dtype='<i4')
+    for va in out_mesh['vertex_arrays']:
+        values = np.asarray(va['values'])
+        stride = len(values) // vertex_count
+        va['values'] = values.reshape(vertex_count, stride)[order].reshape(-1)
+    if 'skin' in out_mesh:
+        remap_skin(out_mesh['skin'], order)
+    for lod in lods:
+        lod['vertex_count'] = int(max((int(ia['values'].max(initial=-1)) for ia in lod['index_arrays']), default=-1)) + 1
+
+def optimize_mesh(out_mesh, vertex_cache=True, cache_size=cache_size):
+    """Reorders triangles of each index array for the vertex cache when
+    vertex_cache is set, then reorders the vertex buffers for fetch
+    locality. Returns the ACMR before and after the optimization, None
+    without vertex cache ordering."""
+    vertex_count = get_vertex_count(out_mesh)
+    index_arrays = out_mesh['index_arrays']
+    num_tris = sum(len(ia['values']) // 3 for ia in index_arrays)
+    if vertex_count == 0 or num_tris == 0:
+        return (0.0, 0.0) if vertex_cache else None
+    # Triangle reordering walks each triangle, fetch reordering is vectorized
+    if not vertex_cache:
+        reorder_vertices(out_mesh)
+        return None
+
+    acmr_before = 0.0
+    acmr_after = 0.0
+    for ia in index_arrays:
+        values = np.asarray(ia['values'])
+        weight = (len(values) // 3) / num_tris
+        acmr_before += calc_acmr(values, vertex_count, cache_size) * weight
+        values = optimize_vertex_cache(values, vertex_count, cache_size)
+        acmr_after += calc_acmr(values, vertex_count, cache_size) * weight
+        ia['values'] = values
+    for lod in out_mesh.get('lods', []):
+        for ia in lod['index_arrays']:
+            ia['values'] = optimize_vertex_cache(ia['values'], vertex_count, cache_size)
+
+    reorder_vertices(out_mesh)
+    return acmr_before, acmr_after
@@ -0,0 +1,42 @@
+# Sparse morph targets of shape keys
+# Only vertices moved by a shape key store a delta. Deltas are sorted by
+# vertex and written to an RGBA float texture as two texels each,
+# (position delta, key index) and (normal delta, 0). Vertices carry the
+# (start, count) of their deltas as the morph attribute, the vertex shader
+# adds the deltas scaled by the key weights, see
+# arm.material.make_skin.morph_pos and armory.data.MorphTarget
+import numpy as np
+
+# Size of the key weight uniform array
+max_keys = 32
+max_width = 4096
+
+def sparse_deltas(base_pos, base_nor, key_pos, key_nor, threshold=1e-6):
+    """Returns the vertex, key, position delta and normal delta of each
+    stored delta, sorted by vertex. key_pos and key_nor are (k, n, 3)
+    arrays, the base arrays are (n, 3) or (k, n, 3) for keys relative to
+    different shapes."""
+    dpos = np.asarray(key_pos, dtype=np.float64) - base_pos
+    dnor = np.asarray(key_nor, dtype=np.float64) - base_nor
+    moved = (np.abs(dpos).max(axis=2, initial=0.0) > threshold) | (np.abs(dnor).max(axis=2, initial=0.0) > threshold)
+    key, vertex = np.nonzero(moved)
+    order = np.lexsort((key, vertex))
+    key, vertex = key[order], vertex[order]
+    return vertex, key, dpos[key, vertex], dnor[key, vertex]
+
+def pack(vertex_count, vertex, key, dpos, dnor):
+    """Returns the (start, count) delta range of each vertex and the
+    texture holding the deltas, rows are max_width texels at most."""
+    count = len(vertex)
+    counts = np.bincount(vertex, minlength=vertex_count)
+    ranges = np.stack((np.cumsum(counts) - counts, counts), axis=1)
+    width = 2
+    while width < min(count * 2, max_width):
+        width *= 2
+    height = max(1, -(-count * 2 // width))
+    texels = np.zeros((height * width, 4), dtype='<f4')
+    texels[0:count * 2:2, :3] = dpos
+    texels[0:count * 2:2, 3] = key
+    texels[1:count * 2:2, :3] = dnor
+    texture = {'values': texels.reshape(-1), 'width': width, 'height': height}
+    return np.array(ranges, dtype='<f4'), texture
@@ -0,0 +1,66 @@
+# Build profiling, records nested timing spans and written asset sizes
+# Output is Chrome trace JSON, open it in chrome://tracing or ui.perfetto.dev
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+enabled = False
+events = []
+bytes_written = 0
+_start = 0.0
+
+def reset(enable):
+    global enabled, events, bytes_written, _start
+    enabled = enable
+    events = []
+    bytes_written = 0
+    _start = time.perf_counter()
+
+def _timestamp():
+    # Microseconds since reset()
+    return (time.perf_counter() - _start) * 1000000
+
+def begin(name, category='build'):
+    """Opens a span that is closed by end(), for spans that do not fit
+    into a with block."""
+    if not enabled:
+        return None
+    return {'name': name, 'cat': category, 'ph': 'X', 'ts': _timestamp(), 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': {}}
+
+def end(event):
+    if event is None:
+        return
+    event['dur'] = _timestamp() - event['ts']
+    events.append(event)
+
+@contextmanager
+def span(name, category='build'):
+    """Times the with block. Yields a dict for extra arguments shown
+    with the span."""
+    event = begin(name, category)
+    try:
+        yield event['args'] if event is not None else {}
+    finally:
+        end(event)
+
+def record_asset(filepath):
+    """Records the size of a written file."""
+    global bytes_written
+    if not enabled or not os.path.isfile(filepath):
+        return
+    size = os.path.getsize(filepath)
+    bytes_written += size
+    events.append({'name': os.path.basename(filepath), 'cat': 'asset', 'ph': 'i', 's': 't', 'ts': _timestamp(), 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': {'bytes': size}})
+
+def save(filepath):
+    if not enabled:
+        return
+    trace = {
+        'traceEvents': sorted(events, key=lambda e: e['ts']),
+        'displayTimeUnit': 'ms',
+        'otherData': {'bytes_written': bytes_written}
+    }
+    with open(filepath, 'w') as f:
+        json.dump(trace, f)
@@ -0,0 +1,164 @@
+# Vertex attribute quantization
+# Each attribute is packed in the format of its quantization profile,
+# the error of the packing is measured on the decoded values. Profiles
+# only use the float and short normalized formats iron reads, 'Oct8'
+# normals take the otherwise unused w lane of the positions instead of
+# a normal vertex array
+import numpy as np
+
+# Profile options of each attribute, ordered by increasing precision
+PROFILE_OPTIONS = {
+    'pos': ('Short', 'Float'),
+    'nor': ('Oct8', 'Oct16', 'Short'),
+    'tex': ('Short',),
+    'col': ('Short',),
+}
+DEFAULT_PROFILE = ('Short', 'Short', 'Short', 'Short')
+
+# Components of the vertex element data types
+COMPONENTS = {
+    'float1': 1, 'float2': 2, 'float3': 3, 'float4': 4,
+    'short2norm': 2, 'short4norm': 4,
+}
+
+def vertex_formats(profile):
+    """Vertex element data type of each attribute for the
+    (pos, nor, tex, col) profile. 'Short' normals keep n.z in pos.w,
+    octahedral normals and tangents are two components. 'Oct8' normals
+    are packed into pos.w and have no format."""
+    pos, nor, _, _ = profile
+    formats = {}
+    if pos == 'Float':
+        formats['pos'] = 'float3' if nor == 'Oct16' else 'float4'
+    else:
+        formats['pos'] = 'short4norm'
+    formats['nor'] = None if nor == 'Oct8' else 'short2norm'
+    formats['tang'] = 'short4norm' if nor == 'Short' else 'short2norm'
+    formats['tex'] = formats['tex1'] = 'short2norm'
+    formats['col'] = 'short4norm'
+    return formats
+
+def merge_profiles(profile1, profile2):
+    """Most precise option of each attribute."""
+    return tuple(max(a, b, key=options.index) for a, b, options in zip(profile1, profile2, PROFILE_OPTIONS.values()))
+
+def unify_profiles(profiles, materials):
+    """Widens the profiles of meshes sharing a material, as a material
+    has one vertex layout. materials holds the material tuple of each
+    mesh."""
+    profiles = list(profiles)
+    changed = True
+    while changed:
+        changed = False
+        mat_profiles = {}
+        for profile, mats in zip(profiles, materials):
+            for mat in mats:
+                mat_profiles[mat] = merge_profiles(mat_profiles.get(mat, profile), profile)
+        for i, mats in enumerate(materials):
+            profile = profiles[i]
+            for mat in mats:
+                profile = merge_profiles(profile, mat_profiles[mat])
+            if profile != profiles[i]:
+                profiles[i] = profile
+                changed = True
+    return profiles
+
+def snorm(values):
+    scale = 2 ** 15 - 1
+    q = np.clip(np.round(np.asarray(values, dtype=np.float64) * scale), -scale, scale)
+    return q.astype('<i2'), q / scale
+
+def oct_encode(v):
+    """Maps (n, 3) unit vectors to the octahedron, as decoded by getNor()
+    in std/gbuffer.glsl."""
+    v = np.asarray(v, dtype=np.float64)
+    e = v[:, :2] / np.maximum(np.abs(v).sum(axis=1), 1e-12)[:, None]
+    lower = v[:, 2] < 0.0
+    sign = np.where(e[lower] >= 0.0, 1.0, -1.0)
+    e[lower] = (1.0 - np.abs(e[lower][:, ::-1])) * sign
+    return e
+
+def oct_decode(e):
+    e = np.asarray(e, dtype=np.float64)
+    v = np.empty((len(e), 3))
+    v[:, 2] = 1.0 - np.abs(e).sum(axis=1)
+    v[:, :2] = e
+    lower = v[:, 2] < 0.0
+    sign = np.where(e[lower] >= 0.0, 1.0, -1.0)
+    v[lower, :2] = (1.0 - np.abs(e[lower][:, ::-1])) * sign
+    return v / np.maximum(np.linalg.norm(v, axis=1), 1e-12)[:, None]
+
+def oct8_encode(v):
+    """Packs (n, 3) unit vectors into one value per vector, two octahedral
+    components of 255 levels each. The value q.x * 256 + q.y - 32767 is
+    stored as a 16-bit normalized lane and decoded by
+    ShaderContext.nor_attrib(). Returns the values in [-1, 1] and the
+    decoded vectors."""
+    q = np.round((oct_encode(v) * 0.5 + 0.5) * 254.0)
+    values = (q[:, 0] * 256.0 + q[:, 1] - 32767.0) / 32767.0
+    return values, oct_decode(q / 127.0 - 1.0)
+
+def angle_error(v, decoded):
+    """Largest angle in degrees between the directions, zero vectors
+    are skipped."""
+    v = np.asarray(v, dtype=np.float64)
+    length = np.linalg.norm(v, axis=1)
+    valid = length > 1e-6
+    v = v[valid] / length[valid, None]
+    decoded = decoded[valid] / np.maximum(np.linalg.norm(decoded[valid], axis=1), 1e-12)[:, None]
+    dots = np.clip(np.einsum('ij,ij->i', v, decoded), -1.0, 1.0)
+    return float(np.degrees(np.arccos(dots)).max(initial=0.0))
+
+def abs_error(values, decoded):
+    return float(np.abs(np.asarray(values, dtype=np.float64) - decoded).max(initial=0.0))
+
+def pack_positions(pos, nor, scale_pos, option, nor_option):
+    """Packs positions in units of scale_pos, the w component holds n.z
+    for 'Short' normals, the packed normal for 'Oct8' normals and is
+    dropped from float positions otherwise. Returns the values and error
+    in object units."""
+    data = np.zeros((len(pos), 4))
+    data[:, :3] = np.asarray(pos, dtype=np.float64) / scale_pos
+    if nor_option == 'Short':
+        data[:, 3] = nor[:, 2]
+    elif nor_option == 'Oct8':
+        data[:, 3], _ = oct8_encode(nor)
+    elif option == 'Float':
+        data = data[:, :3]
+    if option == 'Float':
+        values = np.array(data, dtype='<f4')
+        decoded = values[:, :3].astype(np.float64)
+    else:
+        values, decoded = snorm(data)
+        decoded = decoded[:, :3]
+    return values.reshape(-1), abs_error(pos, decoded * scale_pos)
+
+def unpack_positions(va, scale_pos):
+    """Object space positions of a packed position vertex array."""
+    values = np.asarray(va['values']).reshape(-1, COMPONENTS[va['data']])[:, :3].astype(np.float64)
+    if va['data'] == 'short4norm':
+        values /= 32767
+    return values * scale_pos
+
+def pack_directions(v, option, split_z=False):
+    """Packs unit vectors. Octahedral options store two components, 'Short'
+    stores xyz, or only xy for normals with z in the position w when
+    split_z is set. Tangents of 'Oct8' normals are 16-bit octahedral.
+    Returns the values and angle error."""
+    v = np.asarray(v, dtype=np.float64)
+    if option == 'Short':
+        values, decoded = snorm(v)
+        if split_z:
+            values = values[:, :2]
+    else:
+        values, decoded = snorm(oct_encode(v))
+        decoded = oct_decode(decoded)
+    return values.reshape(-1), angle_error(v, decoded)
+
+def pack_uvs(uv, scale_tex):
+    values, decoded = snorm(np.asarray(uv, dtype=np.float64) / scale_tex)
+    return values.reshape(-1), abs_error(uv, decoded * scale_tex)
+
+def pack_colors(col):
+    values, decoded = snorm(np.clip(col, -1.0, 1.0))
+    return values.reshape(-1), abs_error(col, decoded)
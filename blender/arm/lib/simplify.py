@@ -0,0 +1,162 @@
+# Quadric error mesh simplification for LOD generation
+# Garland, Heckbert - Surface Simplification Using Quadric Error Metrics
+# https://www.cs.cmu.edu/~garland/Papers/quadrics.pdf
+# Edges are collapsed into one of their vertices, so that simplified levels
+# index the vertex buffer of the source mesh. Collapses are applied in
+# batches of independent edges to keep the work in NumPy.
+import numpy as np
+
+def quadrics(pos, tris, count):
+    """Sums the plane quadrics of the triangles around each vertex.
+    Returns the quadrics and the number of planes in each."""
+    p0 = pos[tris[:, 0]]
+    n = np.cross(pos[tris[:, 1]] - p0, pos[tris[:, 2]] - p0)
+    length = np.linalg.norm(n, axis=1)
+    n = n / np.where(length == 0.0, 1.0, length)[:, None]
+    planes = np.concatenate((n, -np.einsum('ij,ij->i', n, p0)[:, None]), axis=1)
+    k = (planes[:, :, None] * planes[:, None, :]).reshape(-1, 16)
+    q = np.zeros((count, 16))
+    for c in range(3):
+        for i in range(16):
+            q[:, i] += np.bincount(tris[:, c], weights=k[:, i], minlength=count)
+    weights = sum(np.bincount(tris[:, c], minlength=count) for c in range(3)).astype(np.float64)
+    return q.reshape(-1, 4, 4), weights
+
+def find_locked(wtris, wid, tris, attribs, count):
+    """Vertices on borders, non-manifold edges and attribute seams, these
+    are not collapsed to keep outlines and texture mapping intact."""
+    locked = np.zeros(count, dtype=bool)
+    edges = np.sort(np.concatenate((wtris[:, [0, 1]], wtris[:, [1, 2]], wtris[:, [2, 0]])), axis=1)
+    edges, edge_counts = np.unique(edges, axis=0, return_counts=True)
+    locked[edges[edge_counts != 2].reshape(-1)] = True
+    if attribs is not None:
+        _, aid = np.unique(attribs, axis=0, return_inverse=True)
+        used = np.unique(tris)
+        pairs = np.unique(np.stack((wid[used], aid.reshape(-1)[used]), axis=1), axis=0)
+        locked |= np.bincount(pairs[:, 0], minlength=count) > 1
+    return locked
+
+def normals(pos, tris):
+    p0 = pos[tris[:, 0]]
+    return np.cross(pos[tris[:, 1]] - p0, pos[tris[:, 2]] - p0)
+
+def collapse_pass(wpos, wtris, q, weights, locked, budget):
+    """Selects up to budget independent edge collapses in order of
+    quadric error. Returns the vertex remap and the largest error, as
+    mean squared distance to the planes of the merged vertices."""
+    count = len(wpos)
+    edges = np.concatenate((wtris[:, [0, 1]], wtris[:, [1, 2]], wtris[:, [2, 0]],
+                            wtris[:, [1, 0]], wtris[:, [2, 1]], wtris[:, [0, 2]]))
+    edges = np.unique(edges, axis=0)
+    edges = edges[~locked[edges[:, 0]]]
+    remap = np.arange(count)
+    if len(edges) == 0:
+        return remap, 0.0
+
+    v = np.concatenate((wpos[edges[:, 1]], np.ones((len(edges), 1))), axis=1)
+    cost = np.maximum(np.einsum('ni,nij,nj->n', v, q[edges[:, 0]] + q[edges[:, 1]], v), 0.0)
+    cost /= np.maximum(weights[edges[:, 0]] + weights[edges[:, 1]], 1.0)
+    order = np.argsort(cost, kind='stable')
+
+    # Vertex -> triangle adjacency
+    corners = wtris.reshape(-1)
+    tri_order = np.argsort(corners, kind='stable')
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(corners, minlength=count)))).tolist()
+    adjacency = (tri_order // 3).tolist()
+    tri_list = wtris.tolist()
+
+    # Collapses touching the triangles of another collapse are skipped
+    frozen = [False] * count
+    accepted = []
+    src_list = edges[:, 0].tolist()
+    for e in order.tolist():
+        a = src_list[e]
+        if frozen[a]:
+            continue
+        accepted.append(e)
+        for k in range(offsets[a], offsets[a + 1]):
+            for w in tri_list[adjacency[k]]:
+                frozen[w] = True
+        if len(accepted) >= budget:
+            break
+
+    accepted = np.array(accepted, dtype=np.int64)
+    remap[edges[accepted, 0]] = edges[accepted, 1]
+
+    # Undo collapses that flip triangles
+    new_tris = remap[wtris]
+    changed = np.any(new_tris != wtris, axis=1)
+    changed &= (new_tris[:, 0] != new_tris[:, 1]) & (new_tris[:, 1] != new_tris[:, 2]) & (new_tris[:, 2] != new_tris[:, 0])
+    if np.any(changed):
+        before = normals(wpos, wtris[changed])
+        after = normals(wpos, new_tris[changed])
+        flipped = np.einsum('ij,ij->i', before, after) <= 0.0
+        sources = wtris[changed][flipped]
+        sources = sources[remap[sources] != sources]
+        remap[sources] = sources
+        accepted = accepted[remap[edges[accepted, 0]] != edges[accepted, 0]]
+
+    error = float(cost[accepted].max(initial=0.0))
+    return remap, error
+
+def lod_chain(pos, tris, targets, attribs=None):
+    """Simplifies the (m, 3) triangles towards each of the decreasing
+    target triangle counts. Returns for each level the triangles, indexing
+    the same vertices, the indices of the source triangles they come from
+    and the geometric error."""
+    pos = np.asarray(pos, dtype=np.float64)
+    tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+    _, wid = np.unique(pos, axis=0, return_inverse=True)
+    wid = wid.reshape(-1)
+    count = int(wid.max(initial=-1)) + 1
+    wpos = np.zeros((count, 3))
+    wpos[wid] = pos
+    # First vertex at each position, used for corners moved to it
+    first = np.zeros(count, dtype=np.int64)
+    first[wid[::-1]] = np.arange(len(pos))[::-1]
+
+    wtris = wid[tris]
+    ids = np.arange(len(tris))
+    valid = (wtris[:, 0] != wtris[:, 1]) & (wtris[:, 1] != wtris[:, 2]) & (wtris[:, 2] != wtris[:, 0])
+    wtris = wtris[valid]
+    ids = ids[valid]
+    locked = find_locked(wtris, wid, tris, attribs, count)
+    q, weights = quadrics(wpos, wtris, count)
+
+    levels = []
+    error = 0.0
+    for target in targets:
+        while len(wtris) > target:
+            # An interior collapse removes two triangles
+            remap, pass_error = collapse_pass(wpos, wtris, q, weights, locked, max(1, (len(wtris) - target) // 2))
+            collapsed = np.flatnonzero(remap != np.arange(count))
+            if len(collapsed) == 0:
+                break
+            np.add.at(q, remap[collapsed], q[collapsed])
+            np.add.at(weights, remap[collapsed], weights[collapsed])
+            error = max(error, pass_error)
+            wtris = remap[wtris]
+            valid = (wtris[:, 0] != wtris[:, 1]) & (wtris[:, 1] != wtris[:, 2]) & (wtris[:, 2] != wtris[:, 0])
+            wtris = wtris[valid]
+            ids = ids[valid]
+
+        # Keep source vertices where the position did not change
+        out = tris[ids]
+        moved = wid[out] != wtris
+        out[moved] = first[wtris[moved]]
+        levels.append((out, ids, float(np.sqrt(error))))
+    return levels
+
+def screen_sizes(errors, size, pixel_error, screen_height=1080):
+    """Screen sizes below which a level with the given geometric error
+    stays within pixel_error pixels, for an object of the given size."""
+    sizes = []
+    prev = 1.0
+    for error in errors:
+        if error <= 0.0 or size <= 0.0:
+            s = prev
+        else:
+            s = min(prev, pixel_error * size / (error * screen_height))
+        sizes.append(s)
+        prev = s
+    return sizes
@@ -0,0 +1,161 @@
+# Per-vertex bone influences of skinned meshes
+# Vertex group weights are extracted once per vertex and reduced to the
+# strongest influences here, exported vertices (loops or deduplicated
+# vertices) then gather them through their vertex index.
+# Meshes using more bones than fit the skinning uniforms are split into
+# index arrays with their own bone palette, bone indices of the vertices
+# then index the palette. Palettes are bound by armory.data.BonePalette
+import numpy as np
+
+max_influences = 4
+# Bones a single triangle can use
+min_palette_size = 3 * max_influences
+
+def influences(counts, groups, weights, group_remap, max_influences=max_influences):
+    """Returns the bone count, bone indices and normalized weights of each
+    vertex. counts holds the number of vertex groups of each vertex, groups
+    and weights the flat group memberships, group_remap maps vertex groups
+    to bones or -1. Only the strongest max_influences bones are kept."""
+    num_verts = len(counts)
+    owner = np.repeat(np.arange(num_verts), counts)
+    remap = np.append(np.asarray(group_remap, dtype=np.int64), -1)
+    bone = remap[np.asarray(groups, dtype=np.int64)] if len(groups) > 0 else np.zeros(0, dtype=np.int64)
+    weight = np.asarray(weights, dtype=np.float64)
+    valid = bone >= 0
+    owner, bone, weight = owner[valid], bone[valid], weight[valid]
+
+    # Strongest first within each vertex
+    order = np.lexsort((-bone, -weight, owner))
+    owner, bone, weight = owner[order], bone[order], weight[order]
+    first = np.searchsorted(owner, np.arange(num_verts))
+    rank = np.arange(len(owner)) - first[owner]
+    keep = rank < max_influences
+    owner, bone, weight, rank = owner[keep], bone[keep], weight[keep], rank[keep]
+
+    bone_counts = np.bincount(owner, minlength=num_verts)
+    total = np.bincount(owner, weights=weight, minlength=num_verts)
+    weight = weight / np.where(total == 0.0, 1.0, total)[owner]
+
+    bone_indices = np.zeros((num_verts, max_influences), dtype=np.int64)
+    bone_weights = np.zeros((num_verts, max_influences), dtype=np.float64)
+    bone_indices[owner, rank] = bone
+    bone_weights[owner, rank] = weight
+    return bone_counts, bone_indices, bone_weights
+
+def gather(bone_counts, bone_indices, bone_weights, vertex_map):
+    """Returns the bone count, index and weight arrays of the exported
+    vertices, vertex_map holds the source vertex of each. Index and weight
+    arrays only hold the used influences, weights are scaled to shorts."""
+    vertex_map = np.asarray(vertex_map, dtype=np.int64)
+    counts = bone_counts[vertex_map]
+    used = np.arange(bone_indices.shape[1]) < counts[:, None]
+    return (np.array(counts, dtype='<i2'),
+            np.array(bone_indices[vertex_map][used], dtype='<i2'),
+            np.array(bone_weights[vertex_map][used] * 32767, dtype='<i2'))
+
+def unpack(oskin):
+    """Returns the bone counts of the skin together with the bone indices
+    and weights padded to max_influences per vertex."""
+    counts = np.asarray(oskin['bone_count_array'], dtype=np.int64)
+    used = np.arange(max_influences) < counts[:, None]
+    bone_indices = np.full((len(counts), max_influences), -1, dtype=np.int64)
+    bone_weights = np.zeros((len(counts), max_influences), dtype=np.int64)
+    bone_indices[used] = oskin['bone_index_array']
+    bone_weights[used] = oskin['bone_weight_array']
+    return counts, bone_indices, bone_weights
+
+def partition(tris, bone_indices, bone_weights, palette_size):
+    """Groups triangles so that each group uses at most palette_size
+    bones. Triangles are visited by their strongest bone, so triangles
+    deformed by the same bones share a group, and added to the first
+    group with room. Returns the group of each
+    triangle and the sorted bones of each group."""
+    corner_bones = bone_indices[tris].reshape(len(tris), -1)
+    corner_weights = bone_weights[tris].reshape(len(tris), -1)
+    strongest = corner_bones[np.arange(len(tris)), np.argmax(corner_weights, axis=1)] if len(tris) > 0 else np.zeros(0, dtype=np.int64)
+
+    labels = np.empty(len(tris), dtype=np.int64)
+    palettes = [set()]
+    for t in np.argsort(strongest, kind='stable').tolist():
+        bones = set(corner_bones[t].tolist())
+        bones.discard(-1)
+        # Latest group first, then the first earlier group with room
+        for p in [len(palettes) - 1] + list(range(len(palettes) - 1)):
+            if len(palettes[p] | bones) <= palette_size:
+                break
+        else:
+            p = len(palettes)
+            palettes.append(set())
+        palettes[p] |= bones
+        labels[t] = p
+    return labels, [np.array(sorted(palette), dtype=np.int64) for palette in palettes]
+
+def split_palettes(o, palette_size):
+    """Splits the index arrays of skinned mesh o, including LOD levels,
+    into arrays whose vertices use at most palette_size bones, stored as
+    their bone_palette. Vertices shared by several palettes are
+    duplicated. Each array gets its own material slot, so the palette of
+    a draw is known from its slot. Returns the original slot of each
+    new slot."""
+    palette_size = max(palette_size, min_palette_size)
+    oskin = o['skin']
+    counts, bone_indices, bone_weights = unpack(oskin)
+    vertex_count = len(counts)
+
+    # Palettes are numbered across all index arrays of the mesh
+    levels = [o] + o.get('lods', [])
+    parts = []
+    palettes = []
+    for level in levels:
+        for ia in level['index_arrays']:
+            tris = np.asarray(ia['values'], dtype=np.int64).reshape(-1, 3)
+            labels, ia_palettes = partition(tris, bone_indices, bone_weights, palette_size)
+            parts.append((level, ia, tris, labels + len(palettes), range(len(palettes), len(palettes) + len(ia_palettes))))
+            palettes += ia_palettes
+    num_palettes = max(len(palettes), 1)
+
+    # One vertex for each used vertex and palette pair
+    corners = np.concatenate([tris.reshape(-1) for _, _, tris, _, _ in parts] + [np.zeros(0, dtype=np.int64)])
+    corner_labels = np.concatenate([np.repeat(labels, 3) for _, _, _, labels, _ in parts] + [np.zeros(0, dtype=np.int64)])
+    keys, inverse = np.unique(corners * num_palettes + corner_labels, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    source = keys // num_palettes
+    palette_of = keys % num_palettes
+
+    for va in o['vertex_arrays']:
+        values = np.asarray(va['values'])
+        stride = len(values) // vertex_count
+        va['values'] = values.reshape(vertex_count, stride)[source].reshape(-1)
+
+    # Bone indices of each vertex point into its palette
+    local = bone_indices[source]
+    for p, palette in enumerate(palettes):
+        rows = np.flatnonzero(palette_of == p)
+        bones = local[rows]
+        used = bones >= 0
+        bones[used] = np.searchsorted(palette, bones[used])
+        local[rows] = bones
+    new_counts = counts[source]
+    used = np.arange(max_influences) < new_counts[:, None]
+    oskin['bone_count_array'] = np.array(new_counts, dtype='<i2')
+    oskin['bone_index_array'] = np.array(local[used], dtype='<i2')
+    oskin['bone_weight_array'] = np.array(bone_weights[source][used], dtype='<i2')
+
+    for level in levels:
+        level['index_arrays'] = []
+    slots = []
+    offset = 0
+    for level, ia, tris, labels, ia_palettes in parts:
+        new_tris = inverse[offset:offset + tris.size].reshape(-1, 3)
+        offset += tris.size
+        for p in ia_palettes:
+            mask = labels == p
+            if not mask.any():
+                continue
+            part = dict(ia)
+            part['values'] = np.array(new_tris[mask].reshape(-1), dtype='<i4')
+            part['bone_palette'] = np.array(palettes[p], dtype='<i2')
+            part['material'] = len(slots)
+            slots.append(int(ia['material']))
+            level['index_arrays'].append(part)
+    return slots
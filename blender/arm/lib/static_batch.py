@@ -0,0 +1,45 @@
+# Merges static meshes into batches sharing a material
+# Works on the raw per-loop buffers extracted by the exporter (see
+# arm.lib.mesh_encode), merged batches are encoded like any other mesh
+import numpy as np
+
+def layout(raw):
+    """Vertex attributes present in the raw buffers, only meshes with the
+    same layout can be merged."""
+    return tuple(raw[attrib] is not None for attrib in ('tex', 'tex1', 'col', 'tang'))
+
+def transform(raw, matrix):
+    """Returns the raw buffers in the space of the 4x4 row-major matrix."""
+    m = np.asarray(matrix, dtype=np.float64)
+    m3 = m[:3, :3]
+    out = dict(raw)
+    out['pos'] = raw['pos'] @ m3.T + m[:3, 3]
+    nor = raw['nor'] @ np.linalg.inv(m3)
+    out['nor'] = nor / np.maximum(np.linalg.norm(nor, axis=1), 1e-12)[:, None]
+    if raw['tang'] is not None:
+        tang = raw['tang'] @ m3.T
+        out['tang'] = tang / np.maximum(np.linalg.norm(tang, axis=1), 1e-12)[:, None]
+    return out
+
+def merge(parts):
+    """Merges (raw, indices, flip) parts of one layout. Only vertices
+    referenced by indices are kept, flip reverses the winding of parts
+    with mirroring transforms. Returns the merged raw buffers and
+    indices."""
+    merged = {attrib: [] for attrib in ('pos', 'nor', 'tex', 'tex1', 'col', 'tang')}
+    indices = []
+    offset = 0
+    for raw, part_indices, flip in parts:
+        used, remap = np.unique(part_indices, return_inverse=True)
+        tris = remap.reshape(-1, 3)
+        if flip:
+            tris = tris[:, ::-1]
+        indices.append(tris.reshape(-1) + offset)
+        offset += len(used)
+        for attrib, values in merged.items():
+            if raw[attrib] is not None:
+                values.append(raw[attrib][used])
+    out = {}
+    for attrib, values in merged.items():
+        out[attrib] = np.array(np.concatenate(values), dtype='<f4') if len(values) > 0 else None
+    return out, np.array(np.concatenate(indices), dtype='<i4')
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Makes the arm package importable without Blender
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
@@ -0,0 +1,13 @@
+import numpy as np
+
+import arm.lib.armpack as armpack
+
+def test_typed_array_round_trip():
+    values = np.arange(-8, 8, dtype='<i2')
+    out = armpack.unpackb(armpack.packb({'a': values}))
+    assert np.array_equal(out['a'], values)
+
+def test_multidimensional_array_is_flattened():
+    values = np.arange(6, dtype='<f4').reshape(3, 2)
+    out = armpack.unpackb(armpack.packb({'a': values}))
+    assert np.array_equal(out['a'], values.reshape(-1))
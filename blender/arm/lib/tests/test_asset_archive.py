@@ -0,0 +1,33 @@
+import struct
+
+import arm.lib.armpack as armpack
+import arm.lib.asset_archive as asset_archive
+
+def read_index(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    size = struct.unpack_from('<I', data, 8)[0]
+    return armpack.unpackb(data[16:16 + size])
+
+def test_equal_contents_share_a_payload(tmp_path):
+    paths = []
+    for name in ('a.arm', 'b.arm'):
+        path = tmp_path / name
+        path.write_bytes(b'same')
+        paths.append(str(path))
+    archive = str(tmp_path / 'assets.arp')
+    archived, payloads, saved = asset_archive.write(paths, archive)
+    assert archived == paths and payloads == 1 and saved == 4
+    assert read_index(archive)['files'] == {'a.arm': 0, 'b.arm': 0}
+
+def test_different_contents_with_same_name_are_not_archived(tmp_path):
+    paths = []
+    for i, folder in enumerate(('x', 'y')):
+        (tmp_path / folder).mkdir()
+        path = tmp_path / folder / 'a.arm'
+        path.write_bytes(bytes([i]))
+        paths.append(str(path))
+    archive = str(tmp_path / 'assets.arp')
+    archived, payloads, _ = asset_archive.write(paths, archive)
+    assert archived == [] and payloads == 0
+    assert read_index(archive)['files'] == {}
@@ -0,0 +1,58 @@
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+import arm.lib.armpack as armpack
+import arm.lib.lz4 as lz4
+
+def scene_data():
+    rng = np.random.default_rng(0)
+    grid = np.stack(np.meshgrid(np.arange(64), np.arange(64), indexing='ij'), -1).reshape(-1, 2)
+    pos = np.zeros((len(grid), 4), dtype='<i2')
+    pos[:, :2] = grid * 512
+    return {
+        'name': 'Scene',
+        'mesh_datas': [{
+            'name': 'Grid',
+            'vertex_arrays': [
+                {'attrib': 'pos', 'values': pos.reshape(-1), 'data': 'short4norm'},
+                {'attrib': 'nor', 'values': np.tile(np.array([0, 32767], dtype='<i2'), len(grid)), 'data': 'short2norm'},
+            ],
+            'index_arrays': [{'material': 0, 'values': np.arange(len(grid) * 3, dtype='<i4') % len(grid)}],
+        }],
+        'objects': [{'name': 'Object' + str(i), 'transform': {'values': rng.random(16).astype('<f4')}} for i in range(100)],
+    }
+
+def test_roundtrip_armpack():
+    data = armpack.packb(scene_data())
+    compressed = lz4.compress(data)
+    assert len(compressed) < len(data)
+    assert lz4.decompress(compressed) == data
+
+def test_roundtrip_blocks():
+    data = armpack.packb(scene_data())
+    compressed = lz4.compress(data, block_size=4096)
+    assert lz4.decompress(compressed) == data
+
+def test_roundtrip_executor():
+    data = armpack.packb(scene_data())
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        compressed = lz4.compress(data, block_size=4096, executor=executor)
+    assert compressed == lz4.compress(data, block_size=4096)
+    assert lz4.decompress(compressed) == data
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'abc',
+    b'a' * 100000, # Overlapping matches
+    np.random.default_rng(1).bytes(100000), # Stored raw
+])
+def test_roundtrip_edge_cases(data):
+    assert lz4.decompress(lz4.compress(data)) == data
+
+def test_header_checksum():
+    compressed = bytearray(lz4.compress(b'armory' * 100))
+    compressed[14] ^= 0xFF
+    with pytest.raises(Exception):
+        lz4.decompress(bytes(compressed))
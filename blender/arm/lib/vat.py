@@ -0,0 +1,43 @@
+# Vertex animation textures
+# The deformed positions and normals of every frame of an action are baked
+# to two textures. A frame takes rows of max_width texels at most, frames
+# are stacked vertically. Positions are stored as half floats in units of
+# the mesh scale_pos, normals as unsigned normalized bytes. Texels are
+# stored as Int32 arrays holding their bytes, which the armpack reader of
+# iron decodes. Vertices carry their texel (x, row) as the vat attribute, see
+# arm.material.make_skin.vat_pos and armory.data.VertexAnimation
+import numpy as np
+
+max_width = 4096
+max_height = 16384
+
+def layout(vertex_count):
+    """Returns the texture width and the number of rows of one frame."""
+    width = max(1, min(vertex_count, max_width))
+    return width, max(1, -(-vertex_count // width))
+
+def coords(vertex_count):
+    """Returns the (x, row) texel of each vertex within a frame."""
+    width, _ = layout(vertex_count)
+    v = np.arange(vertex_count)
+    return np.array(np.stack((v % width, v // width), axis=1), dtype='<f4')
+
+def pack(pos, nor, scale_pos):
+    """Quantizes the (frames, n, 3) position and normal arrays of the
+    baked frames. Returns the textures and the largest position error."""
+    frames, vertex_count, _ = pos.shape
+    width, rows = layout(vertex_count)
+    positions = np.zeros((frames, rows * width, 4), dtype='<f2')
+    positions[:, :vertex_count, :3] = pos / scale_pos
+    positions[:, :vertex_count, 3] = 1.0
+    normals = np.zeros((frames, rows * width, 4), dtype='u1')
+    normals[:, :vertex_count, :3] = np.round((np.clip(nor, -1.0, 1.0) * 0.5 + 0.5) * 255)
+    error = float(np.abs(positions[:, :vertex_count, :3].astype(np.float64) * scale_pos - pos).max(initial=0.0))
+    texture = {
+        'positions': positions.reshape(-1).view('<i4'),
+        'normals': normals.reshape(-1).view('<i4'),
+        'width': width,
+        'rows': rows,
+        'frames': frames
+    }
+    return texture, error
@@ -18,11 +18,13 @@ import arm.make_state as state
 import arm.assets as assets
 import arm.log as log
 import arm.lib.make_datas
+import arm.lib.profiler as profiler
 import arm.lib.server
 from arm.exporter import ArmoryExporter
 
 scripts_mtime = 0 # Monitor source changes
 profile_time = 0
+compile_profile_event = None
 
 def run_proc(cmd, done):
     def fn(p, done):
@@ -90,9 +92,12 @@ def export_data(fp, sdk_path):
 
     # Build node trees
     ArmoryExporter.import_traits = []
-    make_logic.build()
-    make_world.build()
-    make_renderpath.build()
+    with profiler.span('make_logic.build'):
+        make_logic.build()
+    with profiler.span('make_world.build'):
+        make_world.build()
+    with profiler.span('make_renderpath.build'):
+        make_renderpath.build()
 
     # Export scene data
     assets.embedded_data = sorted(list(set(assets.embedded_data)))
@@ -117,9 +122,10 @@ def export_data(fp, sdk_path):
 
     for scene in bpy.data.scenes:
         if scene.arm_export:
-            ext = '.lz4' if ArmoryExporter.compress_enabled else '.arm'
+            ext = '.lz4' if ArmoryExporter.compress_enabled and not arm.utils.use_indexed_data() else '.arm'
             asset_path = build_dir + '/compiled/Assets/' + arm.utils.safestr(scene.name) + ext
-            ArmoryExporter.export_scene(bpy.context, asset_path, scene=scene, depsgraph=depsgraph)
+            with profiler.span('Export scene ' + scene.name):
+                ArmoryExporter.export_scene(bpy.context, asset_path, scene=scene, depsgraph=depsgraph)
             if ArmoryExporter.export_physics:
                 physics_found = True
             if ArmoryExporter.export_navigation:
@@ -176,10 +182,11 @@ def export_data(fp, sdk_path):
             if not os.path.exists(raw_shaders_path + '/' + ref):
                 continue
             assets.shader_passes_assets[ref] = []
-            if ref.startswith('compositor_pass'):
-                compile_shader_pass(res, raw_shaders_path, ref, defs + cdefs, make_variants=has_config)
-            else:
-                compile_shader_pass(res, raw_shaders_path, ref, defs, make_variants=has_config)
+            with profiler.span('Shader pass ' + ref, 'shader'):
+                if ref.startswith('compositor_pass'):
+                    compile_shader_pass(res, raw_shaders_path, ref, defs + cdefs, make_variants=has_config)
+                else:
+                    compile_shader_pass(res, raw_shaders_path, ref, defs, make_variants=has_config)
         arm.utils.write_arm(shaders_path + '/shader_datas.arm', res)
     for ref in assets.shader_passes:
         for s in assets.shader_passes_assets[ref]:
@@ -206,7 +213,8 @@ def export_data(fp, sdk_path):
     # Write khafile.js
     enable_dce = state.is_publish and wrd.arm_dce
     import_logic = not state.is_publish and arm.utils.logic_editor_space() != None
-    write_data.write_khafilejs(state.is_play, export_physics, export_navigation, export_ui, state.is_publish, enable_dce, ArmoryExporter.import_traits, import_logic)
+    with profiler.span('write_khafilejs'):
+        write_data.write_khafilejs(state.is_play, export_physics, export_navigation, export_ui, state.is_publish, enable_dce, ArmoryExporter.import_traits, import_logic)
 
     # Write Main.hx - depends on write_khafilejs for writing number of assets
     scene_name = arm.utils.get_project_scene_name()
@@ -298,11 +306,15 @@ def compile(assets_only=False):
         print("Using project from " + arm.utils.get_fp())
         print("Running: ", cmd)
 
+    global compile_profile_event
+    compile_profile_event = profiler.begin('Compile ' + ' '.join(cmd[2:]))
     state.proc_build = run_proc(cmd, assets_done if compilation_server else build_done)
 
 def build(target, is_play=False, is_publish=False, is_export=False):
     global profile_time
     profile_time = time.time()
+    profiler.reset(bpy.data.worlds['Arm'].arm_profile_build)
+    build_profile_event = profiler.begin('Build')
 
     state.target = target
     state.is_play = is_play
@@ -360,7 +372,8 @@ def build(target, is_play=False, is_publish=False, is_export=False):
                 f.write(text.as_string())
 
     # Export data
-    export_data(fp, sdk_path)
+    with profiler.span('Export data'):
+        export_data(fp, sdk_path)
 
     if state.target == 'html5':
         w, h = arm.utils.get_render_resolution(arm.utils.get_active_scene())
@@ -371,26 +384,41 @@ def build(target, is_play=False, is_publish=False, is_export=False):
             for fn in glob.iglob(os.path.join('include', '**'), recursive=False):
                 shutil.copy(fn, arm.utils.build_dir() + dest + os.path.basename(fn))
 
+    profiler.end(build_profile_event)
+    save_profile()
+
+def save_profile():
+    # Chrome trace of the last build, includes compilation once it is done
+    if profiler.enabled:
+        profiler.save(arm.utils.get_fp_build() + '/build_trace.json')
+
 def play_done():
     state.proc_play = None
     state.redraw_ui = True
     log.clear()
 
 def assets_done():
+    global compile_profile_event
+    profiler.end(compile_profile_event)
+    compile_profile_event = None
     if state.proc_build == None:
+        save_profile()
         return
     result = state.proc_build.poll()
     if result == 0:
         # Connect to the compilation server
         os.chdir(arm.utils.build_dir() + '/debug/')
         cmd = [arm.utils.get_haxe_path(), '--connect', '6000', 'project-krom.hxml']
+        compile_profile_event = profiler.begin('Compile ' + ' '.join(cmd[1:]))
         state.proc_build = run_proc(cmd, compilation_server_done)
     else:
+        save_profile()
         state.proc_build = None
         state.redraw_ui = True
         log.print_info('Build failed, check console')
 
 def compilation_server_done():
+    global compile_profile_event
     if state.proc_build == None:
         return
     result = state.proc_build.poll()
@@ -401,12 +429,19 @@ def compilation_server_done():
         os.rename('krom/krom.js.temp', 'krom/krom.js')
         build_done()
     else:
+        profiler.end(compile_profile_event)
+        compile_profile_event = None
+        save_profile()
         state.proc_build = None
         state.redraw_ui = True
         log.print_info('Build failed, check console')
 
 def build_done():
+    global compile_profile_event
     print('Finished in ' + str(time.time() - profile_time))
+    profiler.end(compile_profile_event)
+    compile_profile_event = None
+    save_profile()
     if log.num_warnings > 0:
         print(f'{log.num_warnings} warnings occurred during compilation!')
     if state.proc_build is None:
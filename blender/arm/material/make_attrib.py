@@ -35,6 +35,10 @@ def write_norpos(con_mesh, vert, declare=False, write_nor=True):
     if declare:
         prep = 'vec3 '
     vert.write_pre = True
+    if con_mesh.is_elem('morph'):
+        make_skin.morph_pos(vert)
+    if con_mesh.is_elem('vat'):
+        make_skin.vat_pos(con_mesh, vert)
     is_bone = con_mesh.is_elem('bone')
     if is_bone:
         make_skin.skin_pos(vert)
@@ -42,7 +46,7 @@ def write_norpos(con_mesh, vert, declare=False, write_nor=True):
         if is_bone:
             make_skin.skin_nor(vert, prep)
         else:
-            vert.write(prep + 'wnormal = normalize(N * vec3(nor.xy, pos.w));')
+            vert.write(prep + 'wnormal = normalize(N * ' + vert.nor_attrib() + ');')
     if con_mesh.is_elem('ipos'):
         make_inst.inst_pos(con_mesh, vert)
     vert.write_pre = False
@@ -34,6 +34,12 @@ def make(context_id, rpasses, shadowmap=False):
         frag.write('float dotNV;')
         frag.write('float opacity;')
 
+    if con_depth.is_elem('morph'):
+        make_skin.morph_pos(vert)
+
+    if con_depth.is_elem('vat'):
+        make_skin.vat_pos(con_depth, vert)
+
     if con_depth.is_elem('bone'):
         make_skin.skin_pos(vert)
 
@@ -48,7 +54,7 @@ def make(context_id, rpasses, shadowmap=False):
         if rpdat.arm_rp_displacement == 'Vertex':
             frag.ins = vert.outs
             vert.add_uniform('mat3 N', '_normalMatrix')
-            vert.write('vec3 wnormal = normalize(N * vec3(nor.xy, pos.w));')
+            vert.write('vec3 wnormal = normalize(N * ' + vert.nor_attrib() + ');')
             cycles.parse(mat_state.nodes, con_depth, vert, frag, geom, tesc, tese, parse_surface=False, parse_opacity=parse_opacity)
             if con_depth.is_elem('tex'):
                 vert.add_out('vec2 texCoord') ## vs only, remove out
@@ -78,7 +84,7 @@ def make(context_id, rpasses, shadowmap=False):
 
             vert.add_out('vec3 wnormal')
             vert.add_uniform('mat3 N', '_normalMatrix')
-            vert.write('wnormal = normalize(N * vec3(nor.xy, pos.w));')
+            vert.write('wnormal = normalize(N * ' + vert.nor_attrib() + ');')
             
             make_tess.tesc_levels(tesc, rpdat.arm_tess_shadows_inner, rpdat.arm_tess_shadows_outer)
             make_tess.interpolate(tese, 'wposition', 3)
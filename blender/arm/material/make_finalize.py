@@ -90,7 +90,7 @@ def make(con_mesh):
         con_mesh.add_elem('tang', 'short4norm')
         vert.add_out('vec3 wtangent')
         vert.write_pre = True
-        vert.write('wtangent = normalize(N * tang.xyz);')
+        vert.write('wtangent = normalize(N * ' + vert.tang_attrib() + ');')
         vert.write_pre = False
 
     if tese != None:
@@ -99,7 +99,7 @@ def make(con_mesh):
         elif tese.contains('wtangent') and not tese.contains('vec3 wtangent'):
             vert.add_out('vec3 wtangent')
             vert.write_pre = True
-            vert.write('wtangent = normalize(N * tang.xyz);')
+            vert.write('wtangent = normalize(N * ' + vert.tang_attrib() + ');')
             vert.write_pre = False
             make_tess.interpolate(tese, 'wtangent', 3, declare_out=False)
 
@@ -111,7 +111,7 @@ def make(con_mesh):
 
     if frag.contains('nAttr'):
         vert.add_out('vec3 nAttr')
-        vert.write_attrib('nAttr = vec3(nor.xy, pos.w);')
+        vert.write_attrib('nAttr = ' + vert.nor_attrib() + ';')
 
     wrd = bpy.data.worlds['Arm']
     if '_Legacy' in wrd.world_defs:
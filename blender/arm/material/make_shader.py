@@ -49,14 +49,26 @@ def build(material, mat_users, mat_armusers):
                 global_elems.append({'name': 'bone', 'data': 'short4norm'})
                 global_elems.append({'name': 'weight', 'data': 'short4norm'})
             # Instancing
-            if bo.arm_instanced != 'Off' or material.arm_particle_flag:
+            instanced = arm.exporter.ArmoryExporter.get_instancing_mode(bo)
+            if instanced == 'Off':
+                instanced = material.arm_instanced_flag
+            if instanced != 'Off' or material.arm_particle_flag:
                 global_elems.append({'name': 'ipos', 'data': 'float3'})
-                if bo.arm_instanced == 'Loc + Rot' or bo.arm_instanced == 'Loc + Rot + Scale':
+                if instanced == 'Loc + Rot' or instanced == 'Loc + Rot + Scale':
                     global_elems.append({'name': 'irot', 'data': 'float3'})
-                if bo.arm_instanced == 'Loc + Scale' or bo.arm_instanced == 'Loc + Rot + Scale':
+                if instanced == 'Loc + Scale' or instanced == 'Loc + Rot + Scale':
                     global_elems.append({'name': 'iscl', 'data': 'float3'})
                 
+    # GPU morph targets
+    if arm.exporter.ArmoryExporter.has_morph_target(material):
+        global_elems.append({'name': 'morph', 'data': 'float2'})
+
+    # Vertex animation textures
+    if arm.exporter.ArmoryExporter.has_vertex_animation(material):
+        global_elems.append({'name': 'vat', 'data': 'float2'})
+
     mat_state.data.global_elems = global_elems
+    mat_state.data.vertex_profile = arm.exporter.ArmoryExporter.get_vertex_profile(material)
 
     bind_constants = dict()
     bind_textures = dict()
@@ -1,11 +1,15 @@
 import arm.utils
+import arm.lib.morph as morph
+import arm.lib.vat as vat
 
 def skin_pos(vert):
     vert.add_include('compiled.inc')
 
     rpdat = arm.utils.get_rp()
     vert.add_include('std/skinning.glsl')
-    vert.add_uniform('vec4 skinBones[skinMaxBones * 2]', link='_skinBones', included=True)
+    # Meshes split into bone palettes get the bones of the drawn palette
+    link = '_skinPalette' if rpdat.arm_skin_palettes else '_skinBones'
+    vert.add_uniform('vec4 skinBones[skinMaxBones * 2]', link=link, included=True)
     vert.add_uniform('float posUnpack', link='_posUnpack')
     vert.write_attrib('vec4 skinA;')
     vert.write_attrib('vec4 skinB;')
@@ -17,4 +21,45 @@ def skin_pos(vert):
 
 def skin_nor(vert, prep):
     rpdat = arm.utils.get_rp()
-    vert.write(prep + 'wnormal = normalize(N * (vec3(nor.xy, pos.w) + 2.0 * cross(skinA.xyz, cross(skinA.xyz, vec3(nor.xy, pos.w)) + skinA.w * vec3(nor.xy, pos.w))));')
+    nor = vert.nor_attrib()
+    vert.write(prep + 'wnormal = normalize(N * (' + nor + ' + 2.0 * cross(skinA.xyz, cross(skinA.xyz, ' + nor + ') + skinA.w * ' + nor + ')));')
+
+def morph_pos(vert):
+    # Sparse shape key deltas, two texels each, see arm.lib.morph
+    vert.add_uniform('sampler2D morphDataTex', link='_morphDataTex')
+    vert.add_uniform('vec4 morphWeights[' + str(morph.max_keys // 4) + ']', link='_morphWeights')
+    vert.add_uniform('float posUnpack', link='_posUnpack')
+    vert.write_attrib('vec3 morphNor = ' + vert.nor_attrib() + ';')
+    vert.write_attrib('int morphWidth = textureSize(morphDataTex, 0).x;')
+    vert.write_attrib('for (int i = int(morph.x) * 2; i < int(morph.x + morph.y) * 2; i += 2) {')
+    vert.write_attrib('\tvec4 morphDelta = texelFetch(morphDataTex, ivec2(i % morphWidth, i / morphWidth), 0);')
+    vert.write_attrib('\tint key = int(morphDelta.w);')
+    vert.write_attrib('\tfloat morphWeight = morphWeights[key / 4][key % 4];')
+    vert.write_attrib('\tspos.xyz += morphDelta.xyz * morphWeight / posUnpack;')
+    vert.write_attrib('\tmorphNor += texelFetch(morphDataTex, ivec2(i % morphWidth + 1, i / morphWidth), 0).xyz * morphWeight;')
+    vert.write_attrib('}')
+    vert.write_attrib('morphNor = normalize(morphNor);')
+    vert.nor_var = 'morphNor'
+
+def vat_pos(con, vert):
+    # Baked vertex animation, two frames blended, see arm.lib.vat
+    vert.add_uniform('sampler2D vatPosTex', link='_vatPos')
+    vert.add_uniform('sampler2D vatNorTex', link='_vatNor')
+    vert.add_uniform('vec3 vatParams', link='_vatParams') # Frames, rows per frame, frame rate
+    vert.add_uniform('float vatTime', link='_vatTime')
+    vert.write_attrib('vec3 vatNor = ' + vert.nor_attrib() + ';')
+    # Meshes sharing the material without a baked animation have no texel
+    vert.write_attrib('if (vat.x >= 0.0) {')
+    if con.is_elem('ipos'):
+        # Instances play the animation from a frame hashed from their position
+        vert.write_attrib('\tfloat vatOffset = fract(sin(dot(ipos, vec3(12.9898, 78.233, 37.719))) * 43758.5453) * vatParams.x;')
+    else:
+        vert.write_attrib('\tfloat vatOffset = 0.0;')
+    vert.write_attrib('\tfloat vatFrame = mod(vatTime * vatParams.z + vatOffset, vatParams.x);')
+    vert.write_attrib('\tfloat vatNext = mod(floor(vatFrame) + 1.0, vatParams.x);')
+    vert.write_attrib('\tivec2 vatTexel0 = ivec2(vat.x, vat.y + floor(vatFrame) * vatParams.y);')
+    vert.write_attrib('\tivec2 vatTexel1 = ivec2(vat.x, vat.y + vatNext * vatParams.y);')
+    vert.write_attrib('\tspos.xyz = mix(texelFetch(vatPosTex, vatTexel0, 0).xyz, texelFetch(vatPosTex, vatTexel1, 0).xyz, fract(vatFrame));')
+    vert.write_attrib('\tvatNor = normalize(mix(texelFetch(vatNorTex, vatTexel0, 0).xyz, texelFetch(vatNorTex, vatTexel1, 0).xyz, fract(vatFrame)) * 2.0 - 1.0);')
+    vert.write_attrib('}')
+    vert.nor_var = 'vatNor'
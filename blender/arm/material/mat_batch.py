@@ -1,4 +1,5 @@
 import bpy
+import arm.exporter
 import arm.material.cycles as cycles
 import arm.material.make_shader as make_shader
 import arm.material.mat_state as mat_state
@@ -28,6 +29,9 @@ def get_signature(mat):
         sign += '1' if mat.arm_cast_shadow else '0'
         sign += '1' if mat.arm_overlay else '0'
         sign += '1' if mat.arm_cull_mode == 'Clockwise' else '0'
+        sign += ''.join(arm.exporter.ArmoryExporter.get_vertex_profile(mat))
+        sign += '1' if arm.exporter.ArmoryExporter.has_morph_target(mat) else '0'
+        sign += '1' if arm.exporter.ArmoryExporter.has_vertex_animation(mat) else '0'
         return sign
 
 def traverse_tree2(node, ar):
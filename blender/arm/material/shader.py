@@ -1,12 +1,14 @@
 import bpy
 import arm.utils
+import arm.lib.quantize as quantize
 
 class ShaderData:
 
     def __init__(self, material):
         self.material = material
         self.contexts = []
-        self.global_elems = [] # bone, weight, ipos, irot, iscl
+        self.global_elems = [] # bone, weight, ipos, irot, iscl, morph
+        self.vertex_profile = quantize.DEFAULT_PROFILE # Quantization of the mesh attributes
         self.sd = {}
         self.data = {}
         self.data['shader_datas'] = [self.sd]
@@ -15,7 +17,7 @@ class ShaderData:
         self.sd['contexts'] = []
 
     def add_context(self, props):
-        con = ShaderContext(self.material, self.sd, props)
+        con = ShaderContext(self.material, self.sd, props, self.vertex_profile)
         if con not in self.sd['contexts']:
             for elem in self.global_elems:
                 con.add_elem(elem['name'], elem['data'])
@@ -27,7 +29,7 @@ class ShaderData:
 
 class ShaderContext:
 
-    def __init__(self, material, shader_data, props):
+    def __init__(self, material, shader_data, props, vertex_profile=quantize.DEFAULT_PROFILE):
         self.vert = None
         self.frag = None
         self.geom = None
@@ -41,10 +43,15 @@ class ShaderContext:
         self.data['depth_write'] = props['depth_write']
         self.data['compare_mode'] = props['compare_mode']
         self.data['cull_mode'] = props['cull_mode']
+        # Quantized mesh attributes follow the vertex formats of the profile
+        self.vertex_formats = quantize.vertex_formats(vertex_profile)
+        self.oct_normals = vertex_profile[1] != 'Short' # Octahedral normals and tangents
+        self.packed_normals = vertex_profile[1] == 'Oct8' # Normals in pos.w
         if 'vertex_elements' in props:
-            self.data['vertex_elements'] = props['vertex_elements']
+            elems = [{'name': e['name'], 'data': self.get_elem_format(e['name'], e['data'])} for e in props['vertex_elements']]
         else:
-            self.data['vertex_elements'] = [{'name': 'pos', 'data': 'short4norm'}, {'name': 'nor', 'data': 'short2norm'}] # (p.xyz, n.z), (n.xy)
+            elems = [{'name': 'pos', 'data': self.vertex_formats['pos']}, {'name': 'nor', 'data': self.vertex_formats['nor']}] # (p.xyz, n.z), (n.xy)
+        self.data['vertex_elements'] = [e for e in elems if e['data'] is not None]
         if 'blend_source' in props:
             self.data['blend_source'] = props['blend_source']
         if 'blend_destination' in props:
@@ -71,15 +78,24 @@ class ShaderContext:
         self.data['constants'] = []
         self.constants = self.data['constants']
 
+    def get_elem_format(self, name, data):
+        # Float elements are not read from quantized mesh data
+        if data.startswith('short') and name in self.vertex_formats:
+            return self.vertex_formats[name]
+        return data
+
     def add_elem(self, name, data):
-        elem = { 'name': name, 'data': data }
+        elem = { 'name': name, 'data': self.get_elem_format(name, data) }
+        # Attributes packed into other elements
+        if elem['data'] is None:
+            return
         if elem not in self.data['vertex_elements']:
             self.data['vertex_elements'].append(elem)
             self.sort_vs()
 
     def sort_vs(self):
         vs = []
-        ar = ['pos', 'nor', 'tex', 'tex1', 'col', 'tang', 'bone', 'weight', 'ipos', 'irot', 'iscl']
+        ar = ['pos', 'nor', 'tex', 'tex1', 'col', 'tang', 'morph', 'vat', 'bone', 'weight', 'ipos', 'irot', 'iscl']
         for ename in ar:
             elem = self.get_elem(ename)
             if elem != None:
@@ -166,6 +182,7 @@ class Shader:
         self.main_attribs = ''
         self.header = ''
         self.write_pre = False
+        self.nor_var = None # Normal with morph targets or vertex animation applied
         self.write_normal = 0
         self.write_textures = 0
         self.tab = 1
@@ -181,6 +198,29 @@ class Shader:
     def add_include(self, s):
         self.includes.append(s)
 
+    def nor_attrib(self):
+        """Object space normal read from the vertex attributes."""
+        if self.nor_var is not None:
+            return self.nor_var
+        if self.context.packed_normals:
+            if not self.has_include('std/gbuffer.glsl'):
+                self.add_include('std/gbuffer.glsl')
+            # Two 8-bit octahedral components, see quantize.oct8_encode()
+            return 'getNor(vec2(ivec2(int(round(pos.w * 32767.0)) + 32767) >> ivec2(8, 0) & 255) / 127.0 - 1.0)'
+        if self.context.oct_normals:
+            if not self.has_include('std/gbuffer.glsl'):
+                self.add_include('std/gbuffer.glsl')
+            return 'getNor(nor.xy)'
+        return 'vec3(nor.xy, pos.w)'
+
+    def tang_attrib(self):
+        """Object space tangent read from the vertex attributes."""
+        if self.context.oct_normals:
+            if not self.has_include('std/gbuffer.glsl'):
+                self.add_include('std/gbuffer.glsl')
+            return 'getNor(tang.xy)'
+        return 'tang.xyz'
+
     def add_in(self, s):
         self.ins.append(s)
 
@@ -60,11 +60,24 @@ def init_properties():
     bpy.types.World.arm_optimize_data = BoolProperty(name="Optimize Data", description="Export more efficient geometry and shader data, prolongs build times", default=True, update=assets.invalidate_compiled_data)
     bpy.types.World.arm_deinterleaved_buffers = BoolProperty(name="Deinterleaved Buffers", description="Use deinterleaved vertex buffers", default=False, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_export_tangents = BoolProperty(name="Export Tangents", description="Precompute tangents for normal mapping, otherwise computed in shader", default=True, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_anim_tolerance = FloatProperty(name="Keyframe Tolerance", description="Drop animation keys that interpolation reproduces within this error, 0 exports every frame", default=0.0, min=0.0, precision=4, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_narrow_indices = BoolProperty(name="16-bit Indices", description="Store index buffers of binary mesh files as 16-bit values when all vertices are addressable, widened when loading", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_compact_indices = BoolProperty(name="Compact Indices", description="Store index buffers of binary mesh files as varint encoded deltas, decoded when loading", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_meshlets = BoolProperty(name="Meshlets", description="Split index buffers of dense meshes into meshlets with bounds and normal cones for cluster culling", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_meshlet_threshold = IntProperty(name="Meshlet Threshold", description="Minimum number of triangles in an index buffer to split it into meshlets", default=4096, min=1, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_anim_compact = BoolProperty(name="Compact Bone Tracks", description="Store bone animation as quantized translation, rotation and scale instead of matrices", default=False, update=assets.invalidate_compiled_data)
     bpy.types.World.arm_batch_meshes = BoolProperty(name="Batch Meshes", description="Group meshes by materials to speed up rendering", default=False, update=assets.invalidate_compiler_cache)
+    bpy.types.World.arm_auto_instancing = BoolProperty(name="Auto Instancing", description="Draw static objects sharing a mesh and materials as one instanced object", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_auto_instancing_threshold = IntProperty(name="Instancing Threshold", description="Minimum number of objects sharing a mesh to instance them", default=4, min=2, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_gpu_instancing = BoolProperty(name="GPU Instancing", description="Draw instances of collections and geometry nodes with instanced rendering instead of exporting an object per instance", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_instance_cell_size = FloatProperty(name="Instance Cell Size", description="Split instanced meshes into cells of this size in object space, so off-screen cells are culled. 0 keeps all instances in one object", default=0.0, min=0.0, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_static_batching = BoolProperty(name="Static Batching", description="Merge meshes of static objects sharing a material into combined meshes", default=False, update=assets.invalidate_compiled_data)
+    bpy.types.World.arm_static_batch_cell_size = FloatProperty(name="Batch Cell Size", description="Size of the spatial cells batches are split into, so that they are still culled. 0 merges each material into one batch", default=32.0, min=0.0, update=assets.invalidate_compiled_data)
     bpy.types.World.arm_batch_materials = BoolProperty(name="Batch Materials", description="Marge similar materials into single pipeline state", default=False, update=assets.invalidate_shader_cache)
     bpy.types.World.arm_stream_scene = BoolProperty(name="Stream Scene", description="Stream scene content", default=False, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_lod_gen_levels = IntProperty(name="Levels", description="Number of levels to generate", default=3, min=1)
     bpy.types.World.arm_lod_gen_ratio = FloatProperty(name="Decimate Ratio", description="Decimate ratio", default=0.8)
+    bpy.types.World.arm_lod_gen_pixel_error = FloatProperty(name="Pixel Error", description="Simplification error in pixels at 1080p at which exported LOD levels switch to a more detailed level", default=1.0, min=0.01)
     bpy.types.World.arm_cache_build = BoolProperty(name="Cache Build", description="Cache build files to speed up compilation", default=True)
     bpy.types.World.arm_live_patch = BoolProperty(name="Live Patch", description="Live patching for Krom", default=False)
     bpy.types.World.arm_play_camera = EnumProperty(
@@ -72,6 +85,7 @@ def init_properties():
                ('Viewport', 'Viewport', 'Viewport')],
         name="Camera", description="Viewport camera", default='Scene', update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_debug_console = BoolProperty(name="Debug Console", description="Show inspector in player and enable debug draw.\nRequires that Zui is not disabled", default=False, update=assets.invalidate_shader_cache)
+    bpy.types.World.arm_profile_build = BoolProperty(name="Profile Build", description="Write a Chrome trace of build timings and written asset sizes to build_trace.json in the build directory", default=False)
     bpy.types.World.arm_verbose_output = BoolProperty(name="Verbose Output", description="Print additional information to the console during compilation", default=False)
     bpy.types.World.arm_runtime = EnumProperty(
         items=[('Krom', 'Krom', 'Krom'),
@@ -81,7 +95,10 @@ def init_properties():
     bpy.types.World.arm_vsync = BoolProperty(name="VSync", description="Vertical Synchronization", default=True, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_dce = BoolProperty(name="DCE", description="Enable dead code elimination for publish builds", default=True, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_asset_compression = BoolProperty(name="Asset Compression", description="Enable scene data compression", default=False, update=assets.invalidate_compiler_cache)
+    bpy.types.World.arm_asset_archive = BoolProperty(name="Asset Archive", description="Pack data assets of published builds into a single archive, storing identical files once", default=False, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_single_data_file = BoolProperty(name="Single Data File", description="Pack exported meshes and materials into single file", default=False, update=assets.invalidate_compiler_cache)
+    bpy.types.World.arm_indexed_data = BoolProperty(name="Indexed Data", description="Write the single data file as an indexed container, so that datablocks are only decoded when used. The scene file is not compressed", default=False, update=assets.invalidate_compiler_cache)
+    bpy.types.World.arm_export_workers = IntProperty(name="Export Workers", description="Number of processes encoding meshes in parallel, 0 to use all cores", default=0, min=0)
     bpy.types.World.arm_write_config = BoolProperty(name="Write Config", description="Allow this project to be configured at runtime via a JSON file", default=False, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_compiler_inline = BoolProperty(name="Compiler Inline", description="Favor speed over size", default=True, update=assets.invalidate_compiler_cache)
     bpy.types.World.arm_winmode = EnumProperty(
@@ -107,6 +124,9 @@ def init_properties():
     bpy.types.Object.arm_export = BoolProperty(name="Export", description="Export object data", default=True)
     bpy.types.Object.arm_spawn = BoolProperty(name="Spawn", description="Auto-add this object when creating scene", default=True)
     bpy.types.Object.arm_mobile = BoolProperty(name="Mobile", description="Object moves during gameplay", default=False)
+    bpy.types.Object.arm_auto_instance = BoolProperty(name="Auto Instance", description="Allow drawing this object as an instance of another object with the same mesh", default=True, update=assets.invalidate_instance_cache)
+    bpy.types.Object.arm_static_batch = BoolProperty(name="Static Batch", description="Allow merging the mesh of this static object with other objects", default=True, update=assets.invalidate_mesh_cache)
+    bpy.types.Object.arm_vertex_animation = BoolProperty(name="Vertex Animation", description="Bake the armature action deforming this mesh to a vertex animation texture instead of skinning it, so it can be drawn as an instance", default=False, update=assets.invalidate_instance_cache)
     bpy.types.Object.arm_visible = BoolProperty(name="Visible", description="Render this object", default=True)
     bpy.types.Object.arm_soft_body_margin = FloatProperty(name="Soft Body Margin", description="Collision margin", default=0.04)
     bpy.types.Object.arm_rb_linear_factor = FloatVectorProperty(name="Linear Factor", size=3, description="Set to 0 to lock axis", default=[1,1,1])
@@ -133,6 +153,16 @@ def init_properties():
     bpy.types.Mesh.arm_cached = BoolProperty(name="Mesh Cached", description="No need to reexport mesh data", default=False)
     bpy.types.Mesh.arm_aabb = FloatVectorProperty(name="AABB", size=3, default=[0,0,0])
     bpy.types.Mesh.arm_dynamic_usage = BoolProperty(name="Dynamic Usage", description="Mesh data can change at runtime", default=False)
+    bpy.types.Mesh.arm_quant_pos = EnumProperty(
+        items=[('Short', 'Short', '16-bit normalized positions in the mesh bounds'),
+               ('Float', 'Float', '32-bit float positions, for large meshes')],
+        name="Position", description="Quantization of vertex positions", default='Short', update=assets.invalidate_mesh_data)
+    bpy.types.Mesh.arm_quant_nor = EnumProperty(
+        items=[('Short', 'Short', '16-bit normal components, z is stored in the position'),
+               ('Oct16', 'Octahedral 16-bit', '2x16-bit octahedral normals and tangents'),
+               ('Oct8', 'Octahedral 8-bit', '2x8-bit octahedral normals stored in the position, 2x16-bit octahedral tangents')],
+        name="Normal", description="Quantization of vertex normals and tangents", default='Short', update=assets.invalidate_mesh_data)
+    bpy.types.Mesh.arm_morph_target = BoolProperty(name="Morph Targets", description="Export shape keys as morph targets blended on the GPU", default=False, update=assets.invalidate_mesh_data)
     bpy.types.Curve.arm_cached = BoolProperty(name="Mesh Cached", description="No need to reexport curve data", default=False)
     bpy.types.Curve.arm_aabb = FloatVectorProperty(name="AABB", size=3, default=[0,0,0])
     bpy.types.Curve.arm_dynamic_usage = BoolProperty(name="Dynamic Data Usage", description="Curve data can change at runtime", default=False)
@@ -182,6 +212,13 @@ def init_properties():
         name="Billboard", default='off', description="Track camera", update=assets.invalidate_shader_cache)
     bpy.types.Material.arm_tilesheet_flag = BoolProperty(name="Tilesheet Flag", description="This material is used for tilesheet", default=False)
     bpy.types.Material.arm_particle_flag = BoolProperty(name="Particle Flag", description="This material is used for particles", default=False)
+    bpy.types.Material.arm_instanced_flag = EnumProperty(
+        items = [('Off', 'Off', 'Off'),
+                 ('Loc', 'Loc', 'Loc'),
+                 ('Loc + Rot', 'Loc + Rot', 'Loc + Rot'),
+                 ('Loc + Scale', 'Loc + Scale', 'Loc + Scale'),
+                 ('Loc + Rot + Scale', 'Loc + Rot + Scale', 'Loc + Rot + Scale')],
+        name="Instanced Flag", default='Off', description='This material is used for instanced collections and geometry nodes')
     bpy.types.Material.arm_particle_fade = BoolProperty(name="Particle Fade", description="Fade particles in and out", default=False)
     bpy.types.Material.arm_blending = BoolProperty(name="Blending", description="Enable additive blending", default=False)
     bpy.types.Material.arm_blending_source = EnumProperty(
@@ -145,6 +145,7 @@ def register():
     bpy.types.Mesh.arm_lodlist = CollectionProperty(type=ArmLodListItem)
     bpy.types.Mesh.arm_lodlist_index = IntProperty(name="Index for my_list", default=0)
     bpy.types.Mesh.arm_lod_material = BoolProperty(name="Material Lod", description="Use materials of lod objects", default=False)
+    bpy.types.Mesh.arm_lod_auto = BoolProperty(name="Export Lod", description="Simplify the mesh into lod levels while exporting, levels share the vertex buffer of the mesh", default=False)
 
 def unregister():
     bpy.utils.unregister_class(ArmLodListItem)
@@ -496,6 +496,8 @@ class ArmRPListItem(bpy.types.PropertyGroup):
         name='Skinning', description='Enable skinning', default='On', update=assets.invalidate_shader_cache)
     arm_skin_max_bones_auto: BoolProperty(name="Auto Bones", description="Calculate amount of maximum bones based on armatures", default=True, update=assets.invalidate_compiled_data)
     arm_skin_max_bones: IntProperty(name="Max Bones", default=50, min=1, max=3000, update=assets.invalidate_shader_cache)
+    arm_skin_shared_skeletons: BoolProperty(name="Shared Skeletons", description="Write the bind data of each armature once and reference it from the skins of its meshes, resolved when scenes are loaded", default=False, update=assets.invalidate_compiled_data)
+    arm_skin_palettes: BoolProperty(name="Bone Palettes", description="Split meshes of armatures with more than Max Bones into parts that each use at most Max Bones", default=False, update=assets.invalidate_compiled_data)
     arm_particles: EnumProperty(
         items=[('On', 'On', 'On'),
                ('Off', 'Off', 'Off')],
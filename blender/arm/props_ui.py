@@ -37,6 +37,10 @@ class ARM_PT_ObjectPropsPanel(bpy.types.Panel):
 
         if obj.type == 'MESH':
             layout.prop(obj, 'arm_instanced')
+            layout.prop(obj, 'arm_auto_instance')
+            layout.prop(obj, 'arm_static_batch')
+            if obj.find_armature() is not None:
+                layout.prop(obj, 'arm_vertex_animation')
             wrd = bpy.data.worlds['Arm']
             layout.prop_search(obj, "arm_tilesheet", wrd, "arm_tilesheetlist", text="Tilesheet")
             if obj.arm_tilesheet != '':
@@ -129,6 +133,11 @@ class ARM_PT_DataPropsPanel(bpy.types.Panel):
             layout.prop(obj.data, 'arm_frustum_culling')
         elif obj.type == 'MESH' or obj.type == 'FONT' or obj.type == 'META':
             layout.prop(obj.data, 'arm_dynamic_usage')
+            if obj.type == 'MESH':
+                layout.label(text='Quantization')
+                layout.prop(obj.data, 'arm_quant_pos')
+                layout.prop(obj.data, 'arm_quant_nor')
+                layout.prop(obj.data, 'arm_morph_target')
             layout.operator("arm.invalidate_cache")
         elif obj.type == 'LIGHT':
             layout.prop(obj.data, 'arm_clip_start')
@@ -342,7 +351,11 @@ class ARM_PT_ArmoryExporterPanel(bpy.types.Panel):
         col.prop(wrd, 'arm_minify_js')
         col.prop(wrd, 'arm_optimize_data')
         col.prop(wrd, 'arm_asset_compression')
+        col.prop(wrd, 'arm_asset_archive')
         col.prop(wrd, 'arm_single_data_file')
+        if wrd.arm_single_data_file:
+            col.prop(wrd, 'arm_indexed_data')
+        col.prop(wrd, 'arm_export_workers')
 
 class ARM_PT_ArmoryProjectPanel(bpy.types.Panel):
     bl_label = "Armory Project"
@@ -375,15 +388,30 @@ class ARM_PT_ProjectFlagsPanel(bpy.types.Panel):
         row.enabled = wrd.arm_ui != 'Disabled'
         row.prop(wrd, 'arm_debug_console')
         layout.prop(wrd, 'arm_verbose_output')
+        layout.prop(wrd, 'arm_profile_build')
         layout.prop(wrd, 'arm_cache_build')
         layout.prop(wrd, 'arm_live_patch')
         layout.prop(wrd, 'arm_stream_scene')
         layout.prop(wrd, 'arm_batch_meshes')
+        layout.prop(wrd, 'arm_auto_instancing')
+        layout.prop(wrd, 'arm_auto_instancing_threshold')
+        layout.prop(wrd, 'arm_gpu_instancing')
+        layout.prop(wrd, 'arm_instance_cell_size')
+        layout.prop(wrd, 'arm_static_batching')
+        layout.prop(wrd, 'arm_static_batch_cell_size')
         layout.prop(wrd, 'arm_batch_materials')
         layout.prop(wrd, 'arm_write_config')
         layout.prop(wrd, 'arm_minimize')
         layout.prop(wrd, 'arm_deinterleaved_buffers')
         layout.prop(wrd, 'arm_export_tangents')
+        layout.prop(wrd, 'arm_narrow_indices')
+        layout.prop(wrd, 'arm_compact_indices')
+        layout.prop(wrd, 'arm_meshlets')
+        col = layout.column()
+        col.enabled = wrd.arm_meshlets
+        col.prop(wrd, 'arm_meshlet_threshold')
+        layout.prop(wrd, 'arm_anim_tolerance')
+        layout.prop(wrd, 'arm_anim_compact')
         layout.prop(wrd, 'arm_loadscreen')
         layout.prop(wrd, 'arm_texture_quality')
         layout.prop(wrd, 'arm_sound_quality')
@@ -716,8 +744,14 @@ class ARM_PT_RenderPathRendererPanel(bpy.types.Panel):
         row.enabled = rpdat.arm_skin == 'On'
         row.prop(rpdat, 'arm_skin_max_bones_auto')
         row = layout.row()
-        row.enabled = not rpdat.arm_skin_max_bones_auto
+        row.enabled = not rpdat.arm_skin_max_bones_auto or rpdat.arm_skin_palettes
         row.prop(rpdat, 'arm_skin_max_bones')
+        row = layout.row()
+        row.enabled = rpdat.arm_skin == 'On'
+        row.prop(rpdat, 'arm_skin_palettes')
+        row = layout.row()
+        row.enabled = rpdat.arm_skin == 'On'
+        row.prop(rpdat, 'arm_skin_shared_skeletons')
         layout.prop(rpdat, "rp_hdr")
         layout.prop(rpdat, "rp_stereo")
         layout.prop(rpdat, 'arm_culling')
@@ -1141,6 +1175,8 @@ class ARM_PT_LodPanel(bpy.types.Panel):
             wrd = bpy.data.worlds['Arm']
             layout.prop(wrd, 'arm_lod_gen_levels')
             layout.prop(wrd, 'arm_lod_gen_ratio')
+            layout.prop(mdata, 'arm_lod_auto')
+            layout.prop(wrd, 'arm_lod_gen_pixel_error')
 
 class ArmGenTerrainButton(bpy.types.Operator):
     '''Generate terrain sectors'''
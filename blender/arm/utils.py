@@ -5,32 +5,18 @@ import platform
 import subprocess
 import webbrowser
 
-import numpy as np
-
 import bpy
 
-import arm.lib.armpack
+import arm.lib.arm_file
+import arm.lib.profiler
 import arm.log as log
 import arm.make_state as state
 
 
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return json.JSONEncoder.default(self, obj)
-
-def write_arm(filepath, output):
-    if filepath.endswith('.lz4'):
-        pass
-    else:
-        if bpy.data.worlds['Arm'].arm_minimize:
-            with open(filepath, 'wb') as f:
-                f.write(arm.lib.armpack.packb(output))
-        else:
-            filepath_json = filepath.split('.arm')[0] + '.json'
-            with open(filepath_json, 'w') as f:
-                f.write(json.dumps(output, sort_keys=True, indent=4, cls=NumpyEncoder))
+def write_arm(filepath, output, indexed=False, executor=None):
+    with arm.lib.profiler.span('Write ' + os.path.basename(filepath), 'io'):
+        filepath = arm.lib.arm_file.write(filepath, output, bpy.data.worlds['Arm'].arm_minimize, indexed, executor)
+    arm.lib.profiler.record_asset(filepath)
 
 def unpack_image(image, path, file_format='JPEG'):
     print('Armory Info: Unpacking to ' + path)
@@ -662,9 +648,27 @@ def is_bone_animation_enabled(bobject):
     return False
 
 
+def use_indexed_data() -> bool:
+    """Returns whether the scene is written as an indexed container,
+    scene files are not compressed then."""
+    wrd = bpy.data.worlds['Arm']
+    return wrd.arm_single_data_file and wrd.arm_indexed_data and wrd.arm_minimize
+
+
 def export_bone_data(bobject: bpy.types.Object) -> bool:
     """Returns whether the bone data of the given object should be exported."""
-    return bobject.find_armature() and is_bone_animation_enabled(bobject) and get_rp().arm_skin == 'On'
+    return bobject.find_armature() and is_bone_animation_enabled(bobject) and get_rp().arm_skin == 'On' and get_vertex_animation_armature(bobject) is None
+
+
+def get_vertex_animation_armature(bobject: bpy.types.Object) -> bpy.types.Object:
+    """Returns the armature whose action is baked to a vertex animation
+    texture for the given object, or `None`."""
+    if bobject.type != 'MESH' or not bobject.arm_vertex_animation:
+        return None
+    armature = bobject.find_armature()
+    if armature is None or armature.animation_data is None or armature.animation_data.action is None:
+        return None
+    return armature
 
 
 def open_editor(hx_path=None):
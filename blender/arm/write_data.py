@@ -6,6 +6,8 @@ import json
 import stat
 import arm.utils
 import arm.assets as assets
+import arm.lib.asset_archive as asset_archive
+import arm.log as log
 import arm.make_state as state
 
 def add_armory_library(sdk_path, name, rel_path=False):
@@ -29,6 +31,29 @@ def add_assets(path, quality=1.0, use_data_dir=False, rel_path=False):
     s += '});\n'
     return s
 
+def write_asset_archive(references):
+    """Packs the exported data and the referenced data assets into a
+    content deduplicated archive. Returns the archive path and the
+    archived files, other files are added to the project as before."""
+    wrd = bpy.data.worlds['Arm']
+    build_dir = arm.utils.build_dir()
+    extensions = asset_archive.data_extensions
+
+    files = glob.glob(build_dir + '/compiled/Assets/**', recursive=True)
+    files += glob.glob(build_dir + '/compiled/Shaders/*.' + ('arm' if wrd.arm_minimize else 'json'))
+    files += references
+    files = [f.replace('\\', '/') for f in files if os.path.isfile(f) and f.lower().endswith(extensions)]
+
+    archive_dir = build_dir + '/compiled/Archive'
+    if not os.path.exists(archive_dir):
+        os.makedirs(archive_dir)
+    archive_path = archive_dir + '/assets.arp'
+    archived, payloads, saved = asset_archive.write(sorted(set(files)), archive_path)
+    for f in sorted(set(files) - set(archived)):
+        log.warn('Asset archive: ' + f + ' not archived, files of different content share its name')
+    print('Asset archive: {0} files, {1} unique payloads, {2} KB deduplicated'.format(len(archived), payloads, saved // 1024))
+    return archive_path, set(archived)
+
 def add_shaders(path, rel_path=False):
     if rel_path:
         path = os.path.relpath(path, arm.utils.get_fp())
@@ -184,6 +209,9 @@ project.addSources('Sources');
         if use_data_dir:
             assets.add_khafile_def('arm_data_dir')
 
+        shader_data_references = sorted(list(set(assets.shader_datas)))
+        asset_references = sorted(list(set(assets.assets)))
+
         ext = 'arm' if wrd.arm_minimize else 'json'
         assets_path = arm.utils.build_dir() + '/compiled/Assets/**'
         assets_path_sh = arm.utils.build_dir() + '/compiled/Shaders/*.' + ext
@@ -193,20 +221,32 @@ project.addSources('Sources');
         dest = ''
         if use_data_dir:
             dest += ', destination: "data/{name}"'
-        f.write('project.addAssets("' + assets_path + '", { notinlist: true ' + dest + '});\n')
-        f.write('project.addAssets("' + assets_path_sh + '", { notinlist: true ' + dest + '});\n')
 
-        shader_data_references = sorted(list(set(assets.shader_datas)))
+        archived = set()
+        if is_publish and wrd.arm_asset_archive:
+            assets.add_khafile_def('arm_asset_archive')
+            archive_path, archived = write_asset_archive([ref.replace('\\', '/').replace('//', '/') for ref in shader_data_references + asset_references])
+            f.write(add_assets(archive_path, use_data_dir=use_data_dir, rel_path=rel_path))
+            # Exported files that can not be archived
+            compiled = glob.glob(arm.utils.build_dir() + '/compiled/Assets/**', recursive=True)
+            compiled += glob.glob(arm.utils.build_dir() + '/compiled/Shaders/*.' + ext)
+            for file in sorted(compiled):
+                file = file.replace('\\', '/')
+                if os.path.isfile(file) and file not in archived:
+                    f.write(add_assets(file, use_data_dir=use_data_dir, rel_path=rel_path))
+        else:
+            f.write('project.addAssets("' + assets_path + '", { notinlist: true ' + dest + '});\n')
+            f.write('project.addAssets("' + assets_path_sh + '", { notinlist: true ' + dest + '});\n')
+
         for ref in shader_data_references:
             ref = ref.replace('\\', '/').replace('//', '/')
-            if '/compiled/' in ref: # Asset already included
+            if '/compiled/' in ref or ref in archived: # Asset already included
                 continue
             f.write(add_assets(ref, use_data_dir=use_data_dir, rel_path=rel_path))
 
-        asset_references = sorted(list(set(assets.assets)))
         for ref in asset_references:
             ref = ref.replace('\\', '/').replace('//', '/')
-            if '/compiled/' in ref: # Asset already included
+            if '/compiled/' in ref or ref in archived: # Asset already included
                 continue
             quality = 1.0
             s = ref.lower()
@@ -247,9 +287,26 @@ project.addSources('Sources');
         if wrd.arm_stream_scene:
             assets.add_khafile_def('arm_stream')
 
+        if wrd.arm_anim_compact:
+            assets.add_khafile_def('arm_anim_compact')
+
+        if wrd.arm_narrow_indices:
+            assets.add_khafile_def('arm_index_narrow')
+
+        if wrd.arm_compact_indices:
+            assets.add_khafile_def('arm_index_compact')
+
+        if wrd.arm_meshlets:
+            assets.add_khafile_def('arm_meshlets')
+
+        if arm.utils.use_indexed_data():
+            assets.add_khafile_def('arm_indexed_data')
+
         rpdat = arm.utils.get_rp()
         if rpdat.arm_skin != 'Off':
             assets.add_khafile_def('arm_skin')
+            if rpdat.arm_skin_palettes:
+                assets.add_khafile_def('arm_skin_palettes')
 
         if rpdat.arm_particles != 'Off':
             assets.add_khafile_def('arm_particles')
@@ -334,7 +391,7 @@ def write_config(resx, resy):
 def write_mainhx(scene_name, resx, resy, is_play, is_publish):
     wrd = bpy.data.worlds['Arm']
     rpdat = arm.utils.get_rp()
-    scene_ext = '.lz4' if (wrd.arm_asset_compression and is_publish) else ''
+    scene_ext = '.lz4' if (wrd.arm_asset_compression and is_publish and not arm.utils.use_indexed_data()) else ''
     if scene_ext == '' and not wrd.arm_minimize:
         scene_ext = '.json'
     winmode = get_winmode(wrd.arm_winmode)
@@ -365,8 +422,14 @@ class Main {
         f.write("""
     public static function main() {""")
         if rpdat.arm_skin != 'Off':
+            max_bones = rpdat.arm_skin_max_bones
+            if rpdat.arm_skin_palettes:
+                # Palettes are gathered from the bones of the whole armature
+                max_bones = max([len(armature.bones) for armature in bpy.data.armatures] + [max_bones])
+                f.write("""
+        armory.data.BonePalette.paletteBones = """ + str(rpdat.arm_skin_max_bones) + """;""")
             f.write("""
-        iron.object.BoneAnimation.skinMaxBones = """ + str(rpdat.arm_skin_max_bones) + """;""")
+        iron.object.BoneAnimation.skinMaxBones = """ + str(max_bones) + """;""")
         if rpdat.rp_shadowmap_cascades != '1':
             f.write("""
         iron.object.LightObject.cascadeCount = """ + str(rpdat.rp_shadowmap_cascades) + """;